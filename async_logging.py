@@ -0,0 +1,207 @@
+"""
+Асинхронный журнал с ограничением частоты сообщений.
+
+Запись в game_detector.log и в консоль выполняет фоновый поток
+(QueueListener): вызов logging.info в цикле обработки только кладет запись
+в ограниченную очередь. Если очередь переполнена, запись выбрасывается,
+а не задерживает кадр.
+
+Перед постановкой в очередь записи проходят фильтр частоты. Каждое место
+вызова (файл и строка) - отдельный тип сообщения со своим лимитом:
+можно пропускать только каждое N-е сообщение и не больше rate сообщений
+в секунду. Ограничиваются только INFO и DEBUG: предупреждения и ошибки
+проходят всегда. Число пропущенных сообщений дописывается к следующему
+пропущенному в журнал сообщению того же типа.
+
+ChangeLog позволяет писать позицию объекта только тогда, когда она
+сместилась больше чем на порог, а не на каждом кадре.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """Прореживание и ограничение частоты сообщений по месту вызова (только INFO и DEBUG)"""
+
+    def __init__(self, rate=10.0, burst=None, sample_every=1):
+        """
+        Args:
+            rate (float): Сообщений в секунду для одного места вызова (0 - без ограничения)
+            burst (int | None): Сколько сообщений подряд можно записать сразу (по умолчанию - rate)
+            sample_every (int): Записывать только каждое N-е сообщение места вызова
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.sample_every = max(1, sample_every)
+        # Место вызова -> [токены, время пополнения, всего сообщений, пропущено с последней записи]
+        self.sites = {}
+        self.lock = threading.Lock()
+        self.passed = 0
+        self.suppressed = 0
+
+    def filter(self, record):
+        # Предупреждения и ошибки не прореживаются
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None:
+                site = self.sites[key] = [self.burst, now, 0, 0]
+            site[2] += 1
+
+            allowed = (site[2] - 1) % self.sample_every == 0
+            if allowed and self.rate > 0:
+                site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate)
+                site[1] = now
+                allowed = site[0] >= 1.0
+                if allowed:
+                    site[0] -= 1.0
+            if not allowed:
+                site[3] += 1
+                self.suppressed += 1
+                return False
+
+            skipped, site[3] = site[3], 0
+            self.passed += 1
+
+        if skipped:
+            record.msg = f"{record.getMessage()} (пропущено похожих сообщений: {skipped})"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Постановка записей в очередь без ожидания: при переполнении запись выбрасывается"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging:
+    """Корневой журнал с записью в фоновом потоке"""
+
+    def __init__(self, filename="game_detector.log", level=logging.INFO, console=True,
+                 rate=10.0, sample_every=1, queue_size=10000):
+        """
+        Args:
+            filename (str | None): Файл журнала (перезаписывается при запуске)
+            level (int): Уровень корневого журнала
+            console (bool): Дублировать журнал в консоль
+            rate (float): Сообщений в секунду для одного места вызова (0 - без ограничения)
+            sample_every (int): Записывать только каждое N-е сообщение места вызова
+            queue_size (int): Глубина очереди записей
+        """
+        self.level = level
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.limiter = RateLimitFilter(rate=rate, sample_every=sample_every)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(self.limiter)
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        self.targets = []
+        if filename:
+            self.targets.append(logging.FileHandler(filename, mode='w', encoding='utf-8'))
+        if console:
+            self.targets.append(logging.StreamHandler())
+        for target in self.targets:
+            target.setFormatter(formatter)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.started = False
+
+    def start(self):
+        """Заменить обработчики корневого журнала очередью и запустить фоновую запись"""
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+        self.started = True
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Дописать оставшиеся записи и остановить фоновый поток"""
+        if not self.started:
+            return
+        self.started = False
+        self.listener.stop()
+        for target in self.targets:
+            target.close()
+        logging.getLogger().removeHandler(self.handler)
+
+    def stats(self):
+        """Счетчики записей"""
+        return {
+            "passed": self.limiter.passed,
+            "suppressed": self.limiter.suppressed,
+            "dropped": self.handler.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+    def format_stats(self):
+        """Счетчики записей одной строкой"""
+        stats = self.stats()
+        return (f"записано: {stats['passed'] - stats['dropped']}, пропущено по лимиту: {stats['suppressed']}, "
+                f"выброшено при переполнении очереди: {stats['dropped']}")
+
+
+def setup_logging(filename="game_detector.log", level=logging.INFO, console=True, rate=10.0, sample_every=1):
+    """
+    Настроить корневой журнал с асинхронной записью и лимитами частоты
+
+    Returns:
+        AsyncLogging: Запущенный журнал (stop() вызывается и при выходе из программы)
+    """
+    return AsyncLogging(filename, level, console, rate, sample_every).start()
+
+
+class ChangeLog:
+    """Решает, стоит ли писать в журнал значение, которое обычно меняется мало"""
+
+    def __init__(self, threshold=5, enabled=True):
+        """
+        Args:
+            threshold (float): Минимальное смещение позиции в пикселях для новой записи
+            enabled (bool): Писать только изменения (иначе - каждое значение)
+        """
+        self.threshold = threshold
+        self.enabled = enabled
+        self.last = {}
+
+    def moved(self, key, position):
+        """Сместилась ли позиция (x, y) больше чем на порог с последней записи"""
+        if not self.enabled:
+            return True
+        last = self.last.get(key)
+        if (last is not None and abs(position[0] - last[0]) <= self.threshold
+                and abs(position[1] - last[1]) <= self.threshold):
+            return False
+        self.last[key] = position
+        return True
+
+    def changed(self, key, value):
+        """Изменилось ли значение с последней записи"""
+        if not self.enabled:
+            return True
+        if key in self.last and self.last[key] == value:
+            return False
+        self.last[key] = value
+        return True
@@ -0,0 +1,315 @@
+"""
+Офлайн-анализ записанных сессий на всех ядрах.
+
+Видеофайл или папка с кадрами делится на отрезки, и каждый отрезок
+декодирует и обрабатывает отдельный процесс со своим детектором (цвета
+из color_config.json и режимы обнаружения - как у основного детектора).
+Внутри отрезка кадры идут подряд, поэтому слежение и инкрементальный
+просмотр работают как при живом захвате; на границе отрезка детектор
+начинает с полного просмотра.
+
+Отрезков больше, чем процессов, чтобы ядра не простаивали в конце.
+Результаты отрезков собираются в порядке кадров и записываются в один
+столбцовый файл .npz (по массиву NumPy на поле, рамки ловушек - отдельным
+массивом со смещениями по кадрам).
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+
+from async_logging import setup_logging
+from event_bus import EventBus
+from frame_source import FrameSource, ImageFolderFrameSource, VideoFrameSource
+from process_pool import SilentNotification
+
+
+def count_frames(video=None, images=None, pattern="*.png"):
+    """
+    Число кадров в видеофайле (по заголовку) или в папке с кадрами
+
+    Returns:
+        tuple: (число кадров, частота кадров видео или None)
+    """
+    if video:
+        capture = cv2.VideoCapture(video)
+        if not capture.isOpened():
+            raise IOError(f"Не удалось открыть видеофайл: {video}")
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or None
+        capture.release()
+        return frames, fps
+    return len(ImageFolderFrameSource(images, pattern=pattern).files), None
+
+
+def plan_segments(total, segments):
+    """
+    Разбить кадры [0, total) на отрезки почти равной длины
+
+    Returns:
+        list: Пары (первый кадр, кадр после последнего)
+    """
+    segments = max(1, min(segments, total))
+    bounds = np.linspace(0, total, segments + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+class SegmentColumns:
+    """Результаты кадров отрезка по столбцам"""
+
+    def __init__(self):
+        self.valid = []
+        self.player = []
+        self.target = []
+        self.in_trap = []
+        self.target_reached = []
+        self.trap_count = []
+        self.traps = []
+        self.detect_ms = []
+
+    def append(self, result):
+        """Добавить результат кадра (None - кадр не прочитался)"""
+        if result is None:
+            self.valid.append(False)
+            self.player.append((np.nan, np.nan))
+            self.target.append((np.nan, np.nan))
+            self.in_trap.append(False)
+            self.target_reached.append(False)
+            self.trap_count.append(0)
+            self.detect_ms.append(np.nan)
+            return
+        self.valid.append(True)
+        self.player.append(result.player_position or (np.nan, np.nan))
+        self.target.append(result.target_position or (np.nan, np.nan))
+        self.in_trap.append(result.is_in_trap)
+        self.target_reached.append(result.target_reached)
+        self.trap_count.append(len(result.trap_boxes))
+        if len(result.trap_boxes):
+            self.traps.append(np.asarray(result.trap_boxes, dtype=np.int32).reshape(-1, 4))
+        self.detect_ms.append(result.timings.get("detect_ms", np.nan))
+
+    def __len__(self):
+        return len(self.valid)
+
+    def arrays(self):
+        """Столбцы в виде массивов NumPy"""
+        return {
+            "valid": np.array(self.valid, dtype=bool),
+            "player": np.array(self.player, dtype=np.float32).reshape(-1, 2),
+            "target": np.array(self.target, dtype=np.float32).reshape(-1, 2),
+            "in_trap": np.array(self.in_trap, dtype=bool),
+            "target_reached": np.array(self.target_reached, dtype=bool),
+            "trap_count": np.array(self.trap_count, dtype=np.int32),
+            "traps": np.concatenate(self.traps) if self.traps else np.empty((0, 4), dtype=np.int32),
+            "detect_ms": np.array(self.detect_ms, dtype=np.float32),
+        }
+
+
+def init_worker():
+    """Журнал процесса-обработчика: только ошибки в stderr"""
+    # Настройки приходят из главного процесса, поэтому предупреждения детектора
+    # о файле конфигурации в каждом отрезке только засоряли бы вывод
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.ERROR)
+    # Параллелизм - на уровне процессов, внутренние потоки OpenCV только мешают друг другу
+    cv2.setNumThreads(1)
+
+
+def open_segment(video, images, pattern, start):
+    """Источник кадров, установленный на первый кадр отрезка"""
+    if video:
+        source = VideoFrameSource(video)
+        if start:
+            source.capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    else:
+        source = ImageFolderFrameSource(images, pattern=pattern)
+        source.index = start
+    return source
+
+
+def analyze_segment(task):
+    """
+    Обработать один отрезок (выполняется в процессе-обработчике)
+
+    Args:
+        task (dict): Источник (video/images/pattern), границы отрезка (start/stop,
+                     stop=None - до конца источника) и настройки детектора
+
+    Returns:
+        tuple: (первый кадр, столбцы отрезка, время обработки, процессорное время, pid)
+    """
+    from game_detector import GameDetector
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    detector = GameDetector(frame_source=FrameSource())
+    detector.notification = SilentNotification()
+    detector.events = EventBus()
+    detector.apply_settings(task["settings"])
+
+    columns = SegmentColumns()
+    source = open_segment(task["video"], task["images"], task["pattern"], task["start"])
+    stop = task["stop"]
+    try:
+        while stop is None or task["start"] + len(columns) < stop:
+            frame = source.read()
+            if frame is None:
+                if source.exhausted:
+                    break
+                columns.append(None)
+                continue
+            columns.append(detector.detect(frame, source.timestamp))
+    finally:
+        source.close()
+
+    return (task["start"], columns.arrays(), time.perf_counter() - wall_start,
+            time.process_time() - cpu_start, os.getpid())
+
+
+def merge_segments(parts):
+    """
+    Склеить столбцы отрезков в порядке кадров
+
+    Returns:
+        dict: Столбцы всех кадров; trap_offset - начало рамок кадра в traps
+    """
+    merged = {}
+    for name in parts[0][1]:
+        merged[name] = np.concatenate([columns[name] for _, columns in parts])
+    merged["frame_index"] = np.concatenate([start + np.arange(len(columns["valid"]))
+                                            for start, columns in parts]).astype(np.int64)
+    trap_count = merged["trap_count"]
+    merged["trap_offset"] = np.concatenate(([0], np.cumsum(trap_count)[:-1])).astype(np.int64)
+    return merged
+
+
+class BatchAnalyzer:
+    """Параллельная обработка видеофайла или папки с кадрами"""
+
+    def __init__(self, settings, workers=None, segments_per_worker=4):
+        """
+        Args:
+            settings (dict): Настройки детектора (GameDetector.settings())
+            workers (int | None): Число процессов (по умолчанию - по числу ядер)
+            segments_per_worker (int): Сколько отрезков приходится на процесс
+        """
+        self.settings = dict(settings)
+        self.settings["show_visualization"] = False
+        self.workers = workers or os.cpu_count() or 1
+        self.segments_per_worker = segments_per_worker
+        self.report = {}
+
+    def analyze(self, video=None, images=None, pattern="*.png"):
+        """
+        Обработать все кадры источника
+
+        Returns:
+            dict: Столбцы результатов всех кадров в порядке кадров
+        """
+        total, video_fps = count_frames(video, images, pattern)
+        if total <= 0:
+            raise ValueError("В источнике нет кадров")
+        segments = plan_segments(total, self.workers * self.segments_per_worker)
+        tasks = [{"video": video, "images": images, "pattern": pattern, "start": start,
+                  # Число кадров в заголовке видео бывает неточным: последний отрезок читается до конца
+                  "stop": None if index == len(segments) - 1 and video else stop,
+                  "settings": self.settings}
+                 for index, (start, stop) in enumerate(segments)]
+        logging.info(f"Анализ: {total} кадров, отрезков: {len(tasks)}, процессов: {self.workers}")
+
+        start_time = time.perf_counter()
+        parts = []
+        busy = {}
+        with multiprocessing.Pool(self.workers, initializer=init_worker) as pool:
+            for start, columns, wall, cpu, pid in pool.imap(analyze_segment, tasks):
+                parts.append((start, columns))
+                frames, seconds = busy.get(pid, (0, 0.0))
+                busy[pid] = (frames + len(columns["valid"]), seconds + wall)
+        elapsed = time.perf_counter() - start_time
+
+        merged = merge_segments(parts)
+        frames = len(merged["frame_index"])
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        self.report = {
+            "frames": frames,
+            "segments": len(tasks),
+            "workers": self.workers,
+            "elapsed": elapsed,
+            "fps": fps,
+            "fps_per_worker": fps / self.workers,
+            # Скорость одного процесса, пока он был занят (без простоя в конце)
+            "fps_per_busy_worker": {pid: count / seconds if seconds > 0 else 0.0
+                                    for pid, (count, seconds) in busy.items()},
+            "video_fps": video_fps,
+            "realtime": fps / video_fps if video_fps else None,
+            "unreadable": int((~merged["valid"]).sum()),
+        }
+        if video_fps:
+            merged["time_s"] = merged["frame_index"] / video_fps
+        return merged
+
+    def format_report(self):
+        """Итог анализа в несколько строк"""
+        report = self.report
+        busy = list(report["fps_per_busy_worker"].values())
+        lines = [
+            f"Кадров: {report['frames']} (не прочитано: {report['unreadable']}), отрезков: {report['segments']}",
+            f"Время: {report['elapsed']:.1f} с, {report['fps']:.1f} FPS, "
+            f"на процесс: {report['fps_per_worker']:.1f} FPS "
+            f"(процессов: {report['workers']}, занятый процесс: {np.mean(busy):.1f} FPS)",
+        ]
+        if report["realtime"]:
+            lines.append(f"Скорость: {report['realtime']:.1f}x реального времени (видео {report['video_fps']:.1f} FPS)")
+        return lines
+
+
+def save_columns(path, columns, source):
+    """Записать столбцы результатов в файл .npz"""
+    np.savez(path, source=np.array(source), **columns)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Параллельный анализ записанной сессии GameDetector")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--video", help="видеофайл")
+    group.add_argument("--images", help="папка с кадрами")
+    parser.add_argument("--pattern", default="*.png", help="маска имен файлов кадров в папке")
+    parser.add_argument("--config", default="color_config.json", help="файл цветовых диапазонов")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию - по числу ядер)")
+    parser.add_argument("--segments-per-worker", type=int, default=4,
+                        help="сколько отрезков приходится на процесс")
+    parser.add_argument("--color-engine", choices=("hsv", "rgb"), default="hsv",
+                        help="способ разметки цветов (см. game_detector.py)")
+    parser.add_argument("--tracking", action="store_true",
+                        help="слежение за объектами внутри отрезка")
+    parser.add_argument("--output", default="analysis.npz", help="файл результатов")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from game_detector import GameDetector
+
+    args = parse_args()
+    async_log = setup_logging(filename=None)
+
+    detector = GameDetector(frame_source=FrameSource())
+    detector.load_config(args.config)
+    detector.color_engine = args.color_engine
+    detector.tracking_enabled = args.tracking
+
+    analyzer = BatchAnalyzer(detector.settings(), workers=args.workers,
+                             segments_per_worker=args.segments_per_worker)
+    columns = analyzer.analyze(video=args.video, images=args.images, pattern=args.pattern)
+    save_columns(args.output, columns, args.video or args.images)
+    for line in analyzer.format_report():
+        print(line)
+    print(f"Результаты записаны в {args.output}")
+    async_log.stop()
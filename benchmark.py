@@ -0,0 +1,323 @@
+"""
+Воспроизводимый замер производительности обнаружения.
+
+Кадры создает синтетический генератор с известным числом персонажей, целей
+и ловушек (зерно генератора фиксировано), поэтому замеры на разных коммитах
+сравнимы между собой. Для каждого сценария (разрешение, число объектов,
+режим детектора) измеряются:
+
+- стадии полного просмотра по отдельности: захват (генератор вместо экрана),
+  перевод в HSV, разметка и маски классов, поиск пятен, проверки столкновений;
+- обнаружение целиком (GameDetector.detect в выбранном режиме) и отрисовка
+  визуализации;
+- FPS, задержки p50/p95/p99 по стадиям и пик памяти.
+
+Результаты пишутся в JSON вместе с версией кода и окружения; с --compare
+выводится сравнение с результатами предыдущего запуска.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_source import FrameSource, SyntheticFrameSource
+from process_pool import SilentNotification
+
+# Пик памяти процесса доступен через resource только в Unix
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+RESOLUTIONS = ("1280x720", "1920x1080", "2560x1440")
+
+# Режимы детектора: настройки поверх значений по умолчанию
+MODES = {
+    "full": {},
+    "rgb": {"color_engine": "rgb"},
+    "tracking": {"tracking_enabled": True},
+    "pyramid": {"pyramid_level": 1},
+    "incremental": {"incremental": True},
+}
+
+# Стадии в порядке обработки кадра
+STAGES = ("capture", "color", "masks", "blobs", "collision", "detect", "render")
+
+
+def latency_stats(samples):
+    """
+    Сводка задержек
+
+    Args:
+        samples (list): Длительности в секундах
+
+    Returns:
+        dict: Среднее, p50, p95, p99 и максимум в миллисекундах
+    """
+    if not samples:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    values = 1000.0 * np.asarray(samples)
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+def make_detector(frame_source, mode):
+    """Детектор для замеров: настройки режима, без уведомлений"""
+    from game_detector import GameDetector
+
+    detector = GameDetector(frame_source=frame_source)
+    detector.notification = SilentNotification()
+    for name, value in MODES[mode].items():
+        setattr(detector, name, value)
+    return detector
+
+
+def make_source(width, height, objects, frames, noise, seed):
+    players, targets, traps = objects
+    return SyntheticFrameSource(width=width, height=height, frames=frames, players=players,
+                                targets=targets, traps=traps, noise=noise, seed=seed)
+
+
+def run_scenario(width, height, objects, mode="full", frames=200, warmup=10, noise=0, seed=0):
+    """
+    Замерить один сценарий
+
+    Args:
+        width (int): Ширина кадра
+        height (int): Высота кадра
+        objects (tuple): Число персонажей, целей и ловушек
+        mode (str): Режим детектора из MODES
+        frames (int): Число замеряемых кадров
+        warmup (int): Число кадров прогрева (не входят в замер)
+        noise (int): Амплитуда шума фона генератора
+        seed (int): Зерно генератора
+
+    Returns:
+        dict: Задержки по стадиям, FPS, пик памяти и найденные объекты
+    """
+    source = make_source(width, height, objects, frames + warmup, noise, seed)
+    detector = make_detector(source, mode)
+    # Отдельный детектор для стадий, чтобы их разбор не менял состояние основного
+    stages = make_detector(FrameSource(), "full")
+    classifier = stages.classifier
+
+    samples = {stage: [] for stage in STAGES}
+    traps_found = []
+    players_found = 0
+    targets_found = 0
+    index = 0
+    while True:
+        start = time.perf_counter()
+        frame = source.read()
+        captured = time.perf_counter()
+        if frame is None:
+            break
+
+        # Стадии полного просмотра по отдельности (как в GameDetector.scan_full_frame)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        converted = time.perf_counter()
+        labels = stages.classify_frame(hsv)
+        masks = [classifier.mask(labels, name) for name in ("player", "target", "trap")]
+        masked = time.perf_counter()
+        stages.player_box = stages.find_largest_blob(masks[0], stages.min_blob_area)
+        stages.target_box = stages.find_largest_blob(masks[1], stages.min_blob_area)
+        trap_boxes = stages.find_blob_stats(masks[2], stages.min_blob_area)[1]
+        found = time.perf_counter()
+        stages.update_traps(trap_boxes)
+        if stages.player_box:
+            x, y, w, h = stages.player_box
+            stages.player_position = (x + w//2, y + h//2)
+        if stages.target_box:
+            x, y, w, h = stages.target_box
+            stages.target_position = (x + w//2, y + h//2)
+            stages.check_target_reached()
+        stages.check_trap_collision()
+        checked = time.perf_counter()
+
+        # Обнаружение целиком в выбранном режиме и отрисовка
+        result = detector.detect(frame)
+        detected = time.perf_counter()
+        detector.render(frame, result, draw_in_place=True)
+        rendered = time.perf_counter()
+
+        if index >= warmup:
+            for stage, duration in (("capture", captured - start), ("color", converted - captured),
+                                    ("masks", masked - converted), ("blobs", found - masked),
+                                    ("collision", checked - found), ("detect", detected - checked),
+                                    ("render", rendered - detected)):
+                samples[stage].append(duration)
+            players_found += result.player_box is not None
+            targets_found += result.target_box is not None
+            traps_found.append(len(result.trap_boxes))
+        index += 1
+    source.close()
+
+    # Кадр целиком: захват, обнаружение и отрисовка (разбор стадий сюда не входит)
+    end_to_end = [c + d + r for c, d, r in zip(samples["capture"], samples["detect"], samples["render"])]
+    measured = len(end_to_end)
+    total_time = sum(end_to_end)
+    players, targets, traps = objects
+    return {
+        "name": f"{width}x{height} p{players} t{targets} n{traps} {mode}",
+        "resolution": [width, height],
+        "objects": {"players": players, "targets": targets, "traps": traps},
+        "mode": mode,
+        "frames": measured,
+        "noise": noise,
+        "seed": seed,
+        "fps": measured / total_time if total_time > 0 else 0.0,
+        "detect_fps": measured / sum(samples["detect"]) if samples["detect"] else 0.0,
+        "end_to_end": latency_stats(end_to_end),
+        "stages": {stage: latency_stats(values) for stage, values in samples.items()},
+        "memory": memory_peak(width, height, objects, mode, noise, seed),
+        "found": {
+            "players": players_found / measured if measured else 0.0,
+            "targets": targets_found / measured if measured else 0.0,
+            "traps_mean": float(np.mean(traps_found)) if traps_found else 0.0,
+        },
+    }
+
+
+def memory_peak(width, height, objects, mode, noise, seed, frames=20):
+    """
+    Пик памяти на коротком отдельном прогоне (tracemalloc замедляет выделения,
+    поэтому не включается во время замера задержек)
+
+    Returns:
+        dict: Пик памяти numpy/Python за прогон и пик памяти процесса, МБ
+    """
+    source = make_source(width, height, objects, frames, noise, seed)
+    detector = make_detector(source, mode)
+    tracemalloc.start()
+    try:
+        for frame in source:
+            detector.render(frame, detector.detect(frame), draw_in_place=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        source.close()
+
+    memory = {"traced_peak_mb": peak / 2**20, "process_peak_mb": None}
+    if RESOURCE_AVAILABLE:
+        # ru_maxrss - пик процесса с момента запуска: в Linux в КБ, в macOS в байтах
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["process_peak_mb"] = rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+    return memory
+
+
+def environment():
+    """Версия кода и окружения для сравнения запусков"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def format_scenario(scenario):
+    """Результат сценария в виде текста"""
+    lines = [f"{scenario['name']}: {scenario['fps']:.1f} FPS "
+             f"(обнаружение {scenario['detect_fps']:.1f} FPS), кадр p50/p95/p99: "
+             f"{scenario['end_to_end']['p50_ms']:.2f}/{scenario['end_to_end']['p95_ms']:.2f}/"
+             f"{scenario['end_to_end']['p99_ms']:.2f} мс"]
+    for stage, stats in scenario["stages"].items():
+        lines.append(f"    {stage:<10} среднее {stats['mean_ms']:7.2f} мс, p50 {stats['p50_ms']:7.2f}, "
+                     f"p95 {stats['p95_ms']:7.2f}, p99 {stats['p99_ms']:7.2f}")
+    memory = scenario["memory"]
+    process_peak = memory["process_peak_mb"]
+    lines.append(f"    память: пик numpy/Python {memory['traced_peak_mb']:.1f} МБ"
+                 + (f", пик процесса {process_peak:.0f} МБ" if process_peak is not None else ""))
+    found = scenario["found"]
+    objects = scenario["objects"]
+    lines.append(f"    найдено: персонаж на {100 * found['players']:.0f}% кадров, "
+                 f"цель на {100 * found['targets']:.0f}%, ловушек в среднем "
+                 f"{found['traps_mean']:.1f} из {objects['traps']}")
+    return "\n".join(lines)
+
+
+def format_comparison(previous, current):
+    """Сравнение FPS и p95 с предыдущим запуском по совпадающим сценариям"""
+    old = {scenario["name"]: scenario for scenario in previous["scenarios"]}
+    lines = [f"Сравнение с {previous['environment'].get('commit')} ({previous['environment'].get('timestamp')}):"]
+    for scenario in current["scenarios"]:
+        before = old.get(scenario["name"])
+        if before is None:
+            lines.append(f"    {scenario['name']}: нет в предыдущем запуске")
+            continue
+        fps_change = scenario["fps"] / before["fps"] - 1.0 if before["fps"] else 0.0
+        lines.append(f"    {scenario['name']}: {before['fps']:.1f} -> {scenario['fps']:.1f} FPS "
+                     f"({100 * fps_change:+.1f}%), p95 {before['end_to_end']['p95_ms']:.2f} -> "
+                     f"{scenario['end_to_end']['p95_ms']:.2f} мс")
+    return "\n".join(lines)
+
+
+def parse_objects(text):
+    """Число персонажей, целей и ловушек в виде "1,1,3" """
+    values = tuple(int(v) for v in text.split(","))
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError("ожидается три числа: персонажи,цели,ловушки")
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер производительности обнаружения на синтетических кадрах")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS),
+                        help="разрешения ШИРИНАxВЫСОТА")
+    parser.add_argument("--objects", nargs="+", type=parse_objects, default=[(1, 1, 3), (1, 1, 50)],
+                        help="наборы объектов персонажи,цели,ловушки")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["full"],
+                        help="режимы детектора")
+    parser.add_argument("--frames", type=int, default=200, help="замеряемых кадров на сценарий")
+    parser.add_argument("--warmup", type=int, default=10, help="кадров прогрева на сценарий")
+    parser.add_argument("--noise", type=int, default=0, help="амплитуда шума фона")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    parser.add_argument("--output", default="benchmark.json", help="файл результатов JSON")
+    parser.add_argument("--compare", help="результаты предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    # Журнал по каждому кадру искажает замеры
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {"environment": environment(), "scenarios": []}
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        for objects in args.objects:
+            for mode in args.modes:
+                scenario = run_scenario(width, height, objects, mode, args.frames, args.warmup,
+                                        args.noise, args.seed)
+                report["scenarios"].append(scenario)
+                print(format_scenario(scenario))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(format_comparison(json.load(f), report))
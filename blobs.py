@@ -0,0 +1,83 @@
+"""
+Выделение пятен (связных областей) на масках классов.
+
+Вместо cv2.findContours с обходом контуров в Python маска размечается одним
+вызовом cv2.connectedComponentsWithStats, который сразу возвращает площадь и
+рамку каждой компоненты. Отбор по площади, поиск самого большого пятна и
+выборка рамок выполняются векторно над массивом статистики, поэтому время
+не зависит от числа мелких пятен шума.
+"""
+
+import cv2
+import numpy as np
+
+from color_lut import ScratchBuffers
+
+
+class BlobExtractor:
+    """Поиск пятен на бинарных масках через connected components"""
+
+    # Столбцы массива статистики OpenCV: x, y, ширина, высота, площадь
+    BOX_COLUMNS = slice(cv2.CC_STAT_LEFT, cv2.CC_STAT_HEIGHT + 1)
+
+    def __init__(self, connectivity=8):
+        """
+        Args:
+            connectivity (int): Связность пикселей (8 - как у внешних контуров findContours)
+        """
+        self.connectivity = connectivity
+        # Блочный алгоритм Грана заметно быстрее алгоритма по умолчанию на больших масках
+        # (для связности 4 OpenCV сам переходит на построчный алгоритм)
+        self.algorithm = cv2.CCL_GRANA
+        self.scratch = ScratchBuffers()
+
+    def stats(self, mask, min_area=100):
+        """
+        Найти все пятна маски с площадью больше min_area
+
+        Args:
+            mask (numpy.ndarray): Бинарная маска (uint8, ненулевые пиксели - объект)
+            min_area (float): Минимальная площадь пятна в пикселях
+
+        Returns:
+            tuple: Площади (N,) и рамки (N, 4) как (x, y, w, h) в виде массивов int32
+        """
+        # Разметка выполняется только внутри рамки всех ненулевых пикселей:
+        # на масках с несколькими объектами это малая часть кадра
+        x, y, w, h = cv2.boundingRect(mask)
+        if w == 0 or h == 0:
+            return np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.int32)
+
+        # Буфер меток переиспользуется между кадрами и областями разного размера
+        labels = self.scratch.get("labels", (h, w), np.int32)
+        count, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(
+            mask[y:y + h, x:x + w], self.connectivity, cv2.CV_32S, self.algorithm, labels=labels
+        )
+        # Нулевая компонента - фон
+        stats = stats[1:count]
+        keep = stats[:, cv2.CC_STAT_AREA] > min_area
+        boxes = stats[keep, self.BOX_COLUMNS]
+        boxes[:, 0] += x
+        boxes[:, 1] += y
+        return stats[keep, cv2.CC_STAT_AREA], boxes
+
+    def largest(self, mask, min_area=100):
+        """
+        Найти самое большое пятно маски
+
+        Returns:
+            tuple | None: Рамка (x, y, w, h) или None, если пятна с площадью больше min_area нет
+        """
+        return self.largest_box(*self.stats(mask, min_area))
+
+    @staticmethod
+    def largest_box(areas, boxes):
+        """Рамка пятна с наибольшей площадью из готовой статистики (или None)"""
+        if not len(areas):
+            return None
+        return tuple(int(value) for value in boxes[np.argmax(areas)])
+
+    def boxes(self, mask, min_area=100):
+        """Найти рамки (x, y, w, h) всех пятен маски с площадью больше min_area"""
+        _, boxes = self.stats(mask, min_area)
+        return [tuple(box) for box in boxes.tolist()]
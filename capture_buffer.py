@@ -0,0 +1,351 @@
+"""
+Кольцо предвыделенных буферов для захваченных кадров.
+
+Вместо выделения нового изображения на каждый кадр источник пишет пиксели
+в один из нескольких заранее созданных numpy-массивов размером с game_region.
+Потребители получают сами эти массивы (без копирования), поэтому кадр остается
+действительным, пока кольцо не сделает полный оборот - то есть еще slots - 1 чтений.
+Если кадр нужен дольше (конвейер с выбрасыванием кадров), потребитель
+удерживает его буфер (hold/release): кольцо пропускает удерживаемые буферы,
+а если заняты все - добавляет новый.
+Буферы пересоздаются только при изменении размера области захвата.
+
+SharedFrameRing размещает те же буферы в разделяемой памяти, чтобы кадр можно
+было передать процессу-обработчику по короткому описанию (имя блока, смещение)
+без копирования пикселей (см. process_pool.py).
+"""
+
+import logging
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# GDI-захват напрямую в буфер доступен только с pywin32
+try:
+    import ctypes
+    import win32con
+    import win32gui
+    import win32ui
+    GDI_AVAILABLE = True
+except ImportError:
+    GDI_AVAILABLE = False
+
+
+class FrameRingBuffer:
+    """Кольцо предвыделенных буферов кадров одинакового размера"""
+
+    def __init__(self, slots=3, channels=3, dtype=np.uint8):
+        """
+        Args:
+            slots (int): Количество буферов в кольце
+            channels (int): Количество каналов кадра
+            dtype: Тип элементов буфера
+        """
+        if slots < 1:
+            raise ValueError("Кольцо должно содержать хотя бы один буфер")
+        self.slots = slots
+        self.channels = channels
+        self.dtype = dtype
+        self.shape = None
+        self.buffers = []
+        self.index = -1
+        self.reallocations = 0
+        # Удерживаемые буферы: id буфера -> число владельцев
+        self.held = {}
+        self.lock = threading.Lock()
+
+    def resize(self, width, height):
+        """
+        Подготовить буферы под размер кадра
+
+        Буферы пересоздаются только если размер действительно изменился.
+
+        Returns:
+            bool: True, если буферы были пересозданы
+        """
+        shape = (int(height), int(width), self.channels)
+        if shape == self.shape:
+            return False
+
+        self.shape = shape
+        self.buffers = self._allocate(shape, self.slots)
+        self.index = -1
+        with self.lock:
+            # Кадры старого размера живут, пока на них ссылаются потребители
+            self.held = {}
+        self.reallocations += 1
+        logging.info(f"Буферы захвата пересозданы: {self.slots} x {width}x{height}")
+        return True
+
+    def ensure_slots(self, slots):
+        """
+        Увеличить кольцо до нужного числа буферов
+
+        Уже выданные буферы остаются действительными: новые добавляются к ним.
+        """
+        if slots <= self.slots:
+            return
+        if self.shape is not None:
+            self.buffers.extend(self._allocate(self.shape, slots - self.slots))
+        self.slots = slots
+
+    def _allocate(self, shape, count):
+        """Создать count буферов заданной формы"""
+        return [np.empty(shape, dtype=self.dtype) for _ in range(count)]
+
+    def resize_for_region(self, region):
+        """Подготовить буферы под регион (x, y, width, height)"""
+        return self.resize(region[2], region[3])
+
+    def next(self):
+        """Получить следующий буфер кольца для записи кадра (удерживаемые буферы пропускаются)"""
+        if self.shape is None:
+            raise RuntimeError("Размер буферов не задан: вызовите resize()")
+        with self.lock:
+            for _ in range(self.slots):
+                self.index = (self.index + 1) % self.slots
+                if id(self.buffers[self.index]) not in self.held:
+                    return self.buffers[self.index]
+            # Все буферы удерживаются стадиями обработки: добавляем еще один
+            self.buffers.extend(self._allocate(self.shape, 1))
+            self.slots += 1
+            self.index = self.slots - 1
+            logging.info(f"Все буферы захвата заняты, кольцо увеличено до {self.slots}")
+            return self.buffers[self.index]
+
+    def hold(self, frame):
+        """Удерживать буфер кадра: кольцо не выдаст его для записи до release"""
+        with self.lock:
+            self.held[id(frame)] = self.held.get(id(frame), 0) + 1
+
+    def release(self, frame):
+        """Отпустить буфер кадра, удерживаемый через hold"""
+        with self.lock:
+            count = self.held.pop(id(frame), 0) - 1
+            if count > 0:
+                self.held[id(frame)] = count
+
+    def next_like(self, frame):
+        """Получить следующий буфер под размер переданного кадра"""
+        self.resize(frame.shape[1], frame.shape[0])
+        return self.next()
+
+    def current(self):
+        """Последний выданный буфер (или None, если кадров еще не было)"""
+        if self.index < 0:
+            return None
+        return self.buffers[self.index]
+
+
+class SharedFrameRing(FrameRingBuffer):
+    """
+    Кольцо буферов кадров в разделяемой памяти
+
+    Буферы - это numpy-представления блоков multiprocessing.shared_memory.
+    Другой процесс один раз подключается к блоку по имени и читает кадр
+    по смещению (см. attach_frame) - пиксели не копируются и не сериализуются.
+    Блоки старого размера остаются доступными, пока их кадры могут еще
+    обрабатываться в других процессах: их удаляет release_unused, когда
+    ни один кадр в работе на них больше не ссылается.
+    """
+
+    def __init__(self, slots=3, channels=3, dtype=np.uint8):
+        self.blocks = []
+        self.block_shapes = {}  # Имя блока -> форма кадров в нем
+        super().__init__(slots, channels, dtype)
+
+    def _allocate(self, shape, count):
+        frame_bytes = int(np.prod(shape)) * np.dtype(self.dtype).itemsize
+        block = shared_memory.SharedMemory(create=True, size=frame_bytes * count)
+        self.blocks.append(block)
+        self.block_shapes[block.name] = shape
+        return [np.ndarray(shape, dtype=self.dtype, buffer=block.buf, offset=index * frame_bytes)
+                for index in range(count)]
+
+    def locate(self, frame):
+        """
+        Найти кадр в разделяемой памяти
+
+        Returns:
+            tuple | None: (имя блока, смещение в байтах) или None, если кадр
+                          лежит не в буферах кольца
+        """
+        if not frame.flags.c_contiguous:
+            return None
+        address = frame.__array_interface__["data"][0]
+        for block in self.blocks:
+            start = np.frombuffer(block.buf, dtype=np.uint8, count=1).__array_interface__["data"][0]
+            if start <= address and address + frame.nbytes <= start + block.size:
+                return block.name, address - start
+        return None
+
+    def release_unused(self, frames=()):
+        """
+        Удалить блоки прежнего размера, на которые не ссылается ни один кадр в работе
+
+        Args:
+            frames (iterable): Кадры, которые еще обрабатываются или ждут показа
+
+        Returns:
+            list: Имена удаленных блоков (обработчики должны отключиться от них)
+        """
+        if all(shape == self.shape for shape in self.block_shapes.values()):
+            return []
+        in_use = set()
+        for frame in frames:
+            location = self.locate(frame)
+            if location is not None:
+                in_use.add(location[0])
+        retired = [block for block in self.blocks
+                   if self.block_shapes[block.name] != self.shape and block.name not in in_use]
+        for block in retired:
+            self.blocks.remove(block)
+            del self.block_shapes[block.name]
+            self._unlink(block)
+        if retired:
+            logging.info(f"Удалено блоков разделяемой памяти прежнего размера: {len(retired)}")
+        return [block.name for block in retired]
+
+    @staticmethod
+    def _unlink(block):
+        try:
+            block.close()
+        except BufferError:
+            pass  # На буфер еще ссылаются кадры; память освободится вместе с ними
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Закрыть и удалить все блоки разделяемой памяти"""
+        self.buffers = []
+        self.shape = None
+        for block in self.blocks:
+            self._unlink(block)
+        self.blocks = []
+        self.block_shapes = {}
+
+
+def attach_frame(blocks, name, offset, shape, dtype=np.uint8):
+    """
+    Получить кадр из блока разделяемой памяти другого процесса
+
+    Args:
+        blocks (dict): Кэш подключенных блоков по именам (подключение - один раз на блок)
+        name (str): Имя блока
+        offset (int): Смещение кадра в байтах
+        shape (tuple): Форма кадра
+
+    Returns:
+        numpy.ndarray: Кадр - представление разделяемой памяти без копирования
+    """
+    block = blocks.get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        blocks[name] = block
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+
+
+if GDI_AVAILABLE:
+    class BITMAPINFOHEADER(ctypes.Structure):
+        _fields_ = [
+            ("biSize", ctypes.c_uint32),
+            ("biWidth", ctypes.c_int32),
+            ("biHeight", ctypes.c_int32),
+            ("biPlanes", ctypes.c_uint16),
+            ("biBitCount", ctypes.c_uint16),
+            ("biCompression", ctypes.c_uint32),
+            ("biSizeImage", ctypes.c_uint32),
+            ("biXPelsPerMeter", ctypes.c_int32),
+            ("biYPelsPerMeter", ctypes.c_int32),
+            ("biClrUsed", ctypes.c_uint32),
+            ("biClrImportant", ctypes.c_uint32),
+        ]
+
+
+class GDIScreenGrabber:
+    """
+    Захват области экрана через GDI с записью пикселей прямо в numpy-буфер
+
+    Контексты устройства и битмап создаются один раз и пересоздаются только
+    при изменении размера области. GetDIBits пишет BGRA-пиксели в
+    предвыделенный промежуточный буфер, без создания объектов PIL.
+    """
+
+    DIB_RGB_COLORS = 0
+
+    def __init__(self):
+        if not GDI_AVAILABLE:
+            raise RuntimeError("GDI-захват недоступен: модули pywin32 не найдены")
+        self.size = None
+        self.staging = None
+        self.desktop_dc = None
+        self.src_dc = None
+        self.mem_dc = None
+        self.bitmap = None
+        self.bitmap_info = None
+
+    def _allocate(self, width, height):
+        self.release()
+        self.size = (width, height)
+
+        desktop = win32gui.GetDesktopWindow()
+        self.desktop_dc = win32gui.GetWindowDC(desktop)
+        self.src_dc = win32ui.CreateDCFromHandle(self.desktop_dc)
+        self.mem_dc = self.src_dc.CreateCompatibleDC()
+        self.bitmap = win32ui.CreateBitmap()
+        self.bitmap.CreateCompatibleBitmap(self.src_dc, width, height)
+        self.mem_dc.SelectObject(self.bitmap)
+
+        # Отрицательная высота - строки идут сверху вниз, как в numpy
+        self.bitmap_info = BITMAPINFOHEADER()
+        self.bitmap_info.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        self.bitmap_info.biWidth = width
+        self.bitmap_info.biHeight = -height
+        self.bitmap_info.biPlanes = 1
+        self.bitmap_info.biBitCount = 32
+        self.bitmap_info.biCompression = 0  # BI_RGB
+
+        self.staging = np.empty((height, width, 4), dtype=np.uint8)
+
+    def grab(self, region):
+        """
+        Захватить регион экрана
+
+        Returns:
+            numpy.ndarray: Промежуточный буфер BGRA (перезаписывается при следующем захвате)
+        """
+        x, y, width, height = region
+        if self.size != (width, height):
+            self._allocate(width, height)
+
+        self.mem_dc.BitBlt((0, 0), (width, height), self.src_dc, (x, y), win32con.SRCCOPY)
+        lines = ctypes.windll.gdi32.GetDIBits(
+            self.mem_dc.GetSafeHdc(), self.bitmap.GetHandle(), 0, height,
+            ctypes.c_void_p(self.staging.ctypes.data), ctypes.byref(self.bitmap_info),
+            self.DIB_RGB_COLORS
+        )
+        if lines != height:
+            raise RuntimeError(f"GetDIBits вернул {lines} строк из {height}")
+        return self.staging
+
+    def release(self):
+        """Освободить GDI-объекты"""
+        try:
+            if self.bitmap is not None:
+                win32gui.DeleteObject(self.bitmap.GetHandle())
+            if self.mem_dc is not None:
+                self.mem_dc.DeleteDC()
+            if self.src_dc is not None:
+                self.src_dc.DeleteDC()
+            if self.desktop_dc is not None:
+                win32gui.ReleaseDC(win32gui.GetDesktopWindow(), self.desktop_dc)
+        except Exception as e:
+            logging.error(f"Ошибка при освобождении GDI-объектов: {e}")
+        self.bitmap = None
+        self.mem_dc = None
+        self.src_dc = None
+        self.desktop_dc = None
+        self.size = None
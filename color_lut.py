@@ -0,0 +1,383 @@
+"""
+Однопроходная классификация пикселей по цветовым диапазонам HSV.
+
+Все диапазоны из color_config.json компилируются в таблицу, которая
+сопоставляет каждому значению (H, S, V) битовую маску классов. Так как диапазоны
+являются прямоугольными областями в HSV, таблица хранится в разложенном виде:
+по одной таблице на 256 значений для каждого канала, а маска пикселя равна
+T_h[H] & T_s[S] & T_v[V]. Вместо отдельного прохода cv2.inRange на каждый класс
+кадр читается один раз, и стоимость кадра не растет с добавлением классов.
+
+Каждый диапазон получает свой бит, поэтому у класса может быть несколько
+диапазонов: его маска - это объединение их битов.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class ScratchBuffers:
+    """
+    Переиспользуемые рабочие буферы произвольной формы
+
+    Буфер выделяется с запасом и отдается как представление нужной формы,
+    поэтому кадры и области интереса разного размера не вызывают новых выделений,
+    пока размер не превысит уже выделенный.
+    """
+
+    def __init__(self):
+        self.storage = {}
+
+    def get(self, key, shape, dtype):
+        size = int(np.prod(shape))
+        buffer = self.storage.get(key)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            buffer = np.empty(size, dtype=dtype)
+            self.storage[key] = buffer
+        return buffer[:size].reshape(shape)
+
+
+class HSVClassifier:
+    """Классификатор пикселей HSV по набору диапазонов"""
+
+    # Максимальное число диапазонов (битов) и тип таблиц для него
+    MAX_RANGES = 31
+
+    def __init__(self, ranges=None):
+        """
+        Args:
+            ranges (list): Список (имя класса, нижняя граница HSV, верхняя граница HSV)
+        """
+        self.signature = None
+        self.class_bits = {}
+        self.channel_luts = []
+        self.dtype = np.uint8
+        self.scratch = ScratchBuffers()
+        self.rebuilds = 0
+        if ranges is not None:
+            self.build(ranges)
+
+    @staticmethod
+    def make_signature(ranges):
+        """Неизменяемый снимок диапазонов для обнаружения изменений"""
+        return tuple(
+            (name, tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+            for name, lower, upper in ranges
+        )
+
+    def build(self, ranges):
+        """Скомпилировать таблицы для набора диапазонов"""
+        signature = self.make_signature(ranges)
+        if len(signature) > self.MAX_RANGES:
+            raise ValueError(f"Слишком много цветовых диапазонов: {len(signature)} (максимум {self.MAX_RANGES})")
+
+        if len(signature) <= 8:
+            self.dtype = np.uint8
+        elif len(signature) <= 16:
+            self.dtype = np.uint16
+        else:
+            self.dtype = np.int32
+
+        self.channel_luts = [np.zeros(256, dtype=self.dtype) for _ in range(3)]
+        self.class_bits = {}
+        for index, (name, lower, upper) in enumerate(signature):
+            bit = 1 << index
+            self.class_bits[name] = self.class_bits.get(name, 0) | bit
+            for channel in range(3):
+                low = max(0, lower[channel])
+                high = min(255, upper[channel])
+                if low <= high:
+                    self.channel_luts[channel][low:high + 1] |= bit
+
+        self.signature = signature
+        self.rebuilds += 1
+
+    def update(self, ranges):
+        """
+        Перестроить таблицы, если диапазоны изменились
+
+        Returns:
+            bool: True, если таблицы были перестроены
+        """
+        if self.make_signature(ranges) == self.signature:
+            return False
+        self.build(ranges)
+        return True
+
+    def classify(self, hsv):
+        """
+        Разметить все пиксели кадра HSV за один проход
+
+        Returns:
+            numpy.ndarray: Битовые маски классов для каждого пикселя.
+                           Буфер переиспользуется при следующем вызове.
+        """
+        shape = hsv.shape[:2]
+        planes = [self.scratch.get(f"plane{channel}", shape, np.uint8) for channel in range(3)]
+        h, s, v = planes
+        cv2.split(hsv, planes)
+
+        labels = self.scratch.get("labels", shape, self.dtype)
+        bits_s = self.scratch.get("bits_s", shape, self.dtype)
+        bits_v = self.scratch.get("bits_v", shape, self.dtype)
+        cv2.LUT(h, self.channel_luts[0], dst=labels)
+        cv2.LUT(s, self.channel_luts[1], dst=bits_s)
+        cv2.LUT(v, self.channel_luts[2], dst=bits_v)
+        np.bitwise_and(labels, bits_s, out=labels)
+        np.bitwise_and(labels, bits_v, out=labels)
+        return labels
+
+    def mask(self, labels, name, out=None):
+        """
+        Маска одного класса по результату classify
+
+        Ненулевые пиксели принадлежат классу (значение равно биту класса),
+        чего достаточно для cv2.findContours и масок OpenCV.
+        """
+        bits = self.class_bits.get(name, 0)
+        if self.dtype != np.uint8:
+            return (np.bitwise_and(labels, bits) != 0).view(np.uint8)
+        return np.bitwise_and(labels, bits, out=out)
+
+
+class QuantizedRGBClassifier:
+    """
+    Классификатор пикселей прямо по значениям кадра, без перевода в HSV
+
+    Куб цветов кадра квантуется до bits бит на канал, и для каждой ячейки заранее
+    вычисляется битовая маска классов при текущих диапазонах HSV. Бит ячейки
+    выставляется, если ему соответствует большинство цветов ячейки, поэтому
+    при равномерном распределении цветов ошибка квантования минимальна.
+    Классификация кадра - один поиск в таблице на пиксель (через cv2.remap).
+    """
+
+    MIN_BITS = 4
+    MAX_BITS = 7
+
+    def __init__(self, hsv_classifier, bits=5):
+        """
+        Args:
+            hsv_classifier (HSVClassifier): Точный классификатор, по которому строится таблица
+            bits (int): Бит на канал в квантованном кубе (4-7)
+        """
+        if not self.MIN_BITS <= bits <= self.MAX_BITS:
+            raise ValueError(f"Допустимо от {self.MIN_BITS} до {self.MAX_BITS} бит на канал")
+        self.hsv_classifier = hsv_classifier
+        self.bits = bits
+        self.shift = 8 - bits
+        self.signature = None
+        self.table = None
+        self.scratch = ScratchBuffers()
+        self.rebuilds = 0
+
+        # Таблицы перевода значения канала в координаты ячейки для cv2.remap:
+        # строка - старший канал, столбец - два младших
+        levels = np.arange(256) >> self.shift
+        self.row_lut = levels.astype(np.int16)
+        self.col_high_lut = (levels << bits).astype(np.int16)
+        self.col_low_lut = levels.astype(np.int16)
+
+    @property
+    def class_bits(self):
+        return self.hsv_classifier.class_bits
+
+    def build(self):
+        """Построить таблицу квантованного куба по текущим таблицам HSV-классификатора"""
+        classifier = self.hsv_classifier
+        if classifier.dtype == np.int32:
+            raise ValueError("Квантованная таблица поддерживает не более 16 цветовых диапазонов")
+
+        # Отдельный экземпляр, чтобы не трогать буферы кадра основного классификатора
+        cube_classifier = HSVClassifier(classifier.signature)
+        bits, shift = self.bits, self.shift
+        cells = 1 << bits
+        ranges = len(classifier.signature)
+        counts = np.zeros((ranges, cells, cells, cells), dtype=np.int32)
+
+        # Перебираем весь куб 256^3 слоями по первому каналу
+        grid = np.empty((256, 256, 3), dtype=np.uint8)
+        grid[..., 1] = np.arange(256, dtype=np.uint8)[:, None]
+        grid[..., 2] = np.arange(256, dtype=np.uint8)[None, :]
+        for value in range(256):
+            grid[..., 0] = value
+            labels = cube_classifier.classify(cv2.cvtColor(grid, cv2.COLOR_BGR2HSV))
+            for index in range(ranges):
+                members = ((labels >> index) & 1).astype(np.int32)
+                counts[index, value >> shift] += members.reshape(cells, 1 << shift, cells, 1 << shift).sum(axis=(1, 3))
+
+        # Бит ячейки выставляется, если его имеет не меньше половины цветов ячейки
+        threshold = (1 << (3 * shift)) / 2
+        table = np.zeros((cells, cells, cells), dtype=classifier.dtype)
+        for index in range(ranges):
+            table[counts[index] >= threshold] |= 1 << index
+
+        self.table = table.reshape(cells, cells * cells)
+        self.signature = classifier.signature
+        self.rebuilds += 1
+
+    def update(self):
+        """
+        Перестроить таблицу, если изменились диапазоны HSV-классификатора
+
+        Returns:
+            bool: True, если таблица была перестроена
+        """
+        if self.table is not None and self.signature == self.hsv_classifier.signature:
+            return False
+        self.build()
+        return True
+
+    def classify(self, frame):
+        """
+        Разметить пиксели кадра (в порядке каналов захвата) по квантованной таблице
+
+        Returns:
+            numpy.ndarray: Битовые маски классов. Буфер переиспользуется при следующем вызове.
+        """
+        self.update()
+        shape = frame.shape[:2]
+        planes = [self.scratch.get(f"plane{channel}", shape, np.uint8) for channel in range(3)]
+        row = self.scratch.get("row", shape, np.int16)
+        col = self.scratch.get("col", shape, np.int16)
+        col_low = self.scratch.get("col_low", shape, np.int16)
+        cell_map = self.scratch.get("map", shape + (2,), np.int16)
+        labels = self.scratch.get("labels", shape, self.table.dtype)
+
+        cv2.split(frame, planes)
+        cv2.LUT(planes[0], self.row_lut, dst=row)
+        cv2.LUT(planes[1], self.col_high_lut, dst=col)
+        cv2.LUT(planes[2], self.col_low_lut, dst=col_low)
+        cv2.add(col, col_low, dst=col)
+        cv2.merge([col, row], cell_map)
+        cv2.remap(self.table, cell_map, None, cv2.INTER_NEAREST, dst=labels)
+        return labels
+
+    def mask(self, labels, name, out=None):
+        """Маска одного класса по результату classify"""
+        return self.hsv_classifier.mask(labels, name, out=out)
+
+
+def accuracy_report(hsv_classifier, frames, bits_options=(4, 5, 6)):
+    """
+    Сравнить квантованную классификацию с точной (через HSV) на наборе кадров
+
+    Args:
+        hsv_classifier (HSVClassifier): Точный классификатор с текущими диапазонами
+        frames (list): Кадры в порядке каналов захвата
+        bits_options (tuple): Проверяемые уровни квантования
+
+    Returns:
+        list: Для каждого уровня - словарь с временем построения, временем на кадр
+              обоих путей и метриками по классам (точность, полнота, IoU)
+    """
+    names = list(hsv_classifier.class_bits)
+
+    # Точная разметка и ее время
+    exact_labels = []
+    start = time.perf_counter()
+    for frame in frames:
+        exact_labels.append(hsv_classifier.classify(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)).copy())
+    exact_ms = 1000.0 * (time.perf_counter() - start) / max(1, len(frames))
+
+    report = []
+    for bits in bits_options:
+        quantized = QuantizedRGBClassifier(hsv_classifier, bits)
+        start = time.perf_counter()
+        quantized.build()
+        build_s = time.perf_counter() - start
+
+        tp = dict.fromkeys(names, 0)
+        fp = dict.fromkeys(names, 0)
+        fn = dict.fromkeys(names, 0)
+        mismatched = 0
+        total = 0
+        elapsed = 0.0
+        for frame, exact in zip(frames, exact_labels):
+            start = time.perf_counter()
+            labels = quantized.classify(frame)
+            elapsed += time.perf_counter() - start
+            for name in names:
+                approx_mask = hsv_classifier.mask(labels, name) != 0
+                exact_mask = hsv_classifier.mask(exact, name) != 0
+                tp[name] += int(np.count_nonzero(approx_mask & exact_mask))
+                fp[name] += int(np.count_nonzero(approx_mask & ~exact_mask))
+                fn[name] += int(np.count_nonzero(~approx_mask & exact_mask))
+            mismatched += int(np.count_nonzero(labels != exact))
+            total += labels.size
+
+        classes = {}
+        for name in names:
+            predicted = tp[name] + fp[name]
+            actual = tp[name] + fn[name]
+            union = tp[name] + fp[name] + fn[name]
+            classes[name] = {
+                "precision": tp[name] / predicted if predicted else 1.0,
+                "recall": tp[name] / actual if actual else 1.0,
+                "iou": tp[name] / union if union else 1.0,
+            }
+
+        report.append({
+            "bits": bits,
+            "table_bytes": int(quantized.table.nbytes),
+            "build_s": build_s,
+            "exact_ms": exact_ms,
+            "quantized_ms": 1000.0 * elapsed / max(1, len(frames)),
+            "pixel_mismatch": mismatched / total if total else 0.0,
+            "classes": classes,
+        })
+    return report
+
+
+def format_accuracy_report(report):
+    """Отчет о точности квантованной классификации в виде текста"""
+    lines = []
+    for entry in report:
+        lines.append(
+            f"{entry['bits']} бит/канал: таблица {entry['table_bytes'] / 1024:.0f} КБ, "
+            f"построение {entry['build_s']:.2f} с, кадр {entry['quantized_ms']:.2f} мс "
+            f"(точный путь {entry['exact_ms']:.2f} мс), "
+            f"несовпадение пикселей {100 * entry['pixel_mismatch']:.3f}%"
+        )
+        for name, metrics in entry["classes"].items():
+            lines.append(
+                f"    {name}: точность {100 * metrics['precision']:.2f}%, "
+                f"полнота {100 * metrics['recall']:.2f}%, IoU {100 * metrics['iou']:.2f}%"
+            )
+    return "\n".join(lines)
+
+
+# Отчет о точности на записанных кадрах
+if __name__ == "__main__":
+    import argparse
+
+    from frame_source import ImageFolderFrameSource, SyntheticFrameSource, VideoFrameSource
+
+    parser = argparse.ArgumentParser(description="Точность квантованной классификации цветов")
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument("--video", help="видеофайл с записанной сессией")
+    source_group.add_argument("--images", help="папка с кадрами PNG")
+    parser.add_argument("--frames", type=int, default=50, help="количество кадров для сравнения")
+    parser.add_argument("--bits", type=int, nargs="+", default=[4, 5, 6], help="проверяемые уровни квантования")
+    args = parser.parse_args()
+
+    if args.video:
+        source = VideoFrameSource(args.video)
+    elif args.images:
+        source = ImageFolderFrameSource(args.images)
+    else:
+        source = SyntheticFrameSource(frames=args.frames, noise=40)
+
+    frames = []
+    for frame in source:
+        frames.append(frame.copy())
+        if len(frames) >= args.frames:
+            break
+    source.close()
+
+    # Диапазоны берутся из color_config.json так же, как в детекторе
+    from game_detector import GameDetector
+    detector = GameDetector(frame_source=source)
+    classifier = HSVClassifier(detector.color_ranges())
+    print(format_accuracy_report(accuracy_report(classifier, frames, args.bits)))
@@ -5,6 +5,8 @@ import os
 import json
 import time
 
+from object_classes import default_classes
+
 class ColorPicker:
     def __init__(self):
         print("Инициализация инструмента выбора цветов...")
@@ -27,27 +29,14 @@ class ColorPicker:
         self.selected_hsv = None
         self.selected_type = None
         
-        # Настройки цветов для объектов
-        self.player_color_range = {
-            "lower": [140, 50, 50],
-            "upper": [170, 255, 255]
-        }
-        
-        self.target_color_range = {
-            "lower": [40, 50, 50],
-            "upper": [80, 255, 255]
-        }
-        
-        self.trap_color_range = {
-            "lower": [0, 50, 50],
-            "upper": [10, 255, 255]
-        }
+        # Классы объектов и их цвета (см. object_classes.py)
+        self.object_classes = default_classes()
         
         # Загрузка существующих настроек, если они есть
         self.load_config()
         
-        # Режим выбора (player, target, trap)
-        self.selection_mode = "player"
+        # Режим выбора - имя настраиваемого класса (клавиши 1-9)
+        self.selection_mode = self.object_classes.names[0]
         
         # Флаг для отслеживания, была ли изменена конфигурация
         self.config_changed = False
@@ -65,18 +54,8 @@ class ColorPicker:
                 with open(filename, 'r') as f:
                     config = json.load(f)
                 
-                # Загружаем настройки для каждого объекта
-                if "player_color_lower" in config and "player_color_upper" in config:
-                    self.player_color_range["lower"] = config["player_color_lower"]
-                    self.player_color_range["upper"] = config["player_color_upper"]
-                
-                if "target_color_lower" in config and "target_color_upper" in config:
-                    self.target_color_range["lower"] = config["target_color_lower"]
-                    self.target_color_range["upper"] = config["target_color_upper"]
-                
-                if "trap_color_lower" in config and "trap_color_upper" in config:
-                    self.trap_color_range["lower"] = config["trap_color_lower"]
-                    self.trap_color_range["upper"] = config["trap_color_upper"]
+                # Загружаем классы объектов (новый формат или старые ключи)
+                self.object_classes.update_from_config(config)
                 
                 print(f"Конфигурация загружена из {filename}")
                 return True
@@ -89,14 +68,7 @@ class ColorPicker:
     
     def save_config(self, filename="color_config.json"):
         """Сохранить настройки цветов в файл"""
-        config = {
-            "player_color_lower": self.player_color_range["lower"],
-            "player_color_upper": self.player_color_range["upper"],
-            "target_color_lower": self.target_color_range["lower"],
-            "target_color_upper": self.target_color_range["upper"],
-            "trap_color_lower": self.trap_color_range["lower"],
-            "trap_color_upper": self.trap_color_range["upper"]
-        }
+        config = self.object_classes.to_config()
         
         try:
             with open(filename, 'w') as f:
@@ -131,30 +103,16 @@ class ColorPicker:
                 self.selected_hsv = hsv[y, x]
                 self.selected_type = self.selection_mode
                 
-                # Обновляем диапазоны цветов для выбранного объекта
-                h, s, v = self.selected_hsv
-                
-                # Для каждого типа объекта устанавливаем разные диапазоны вокруг выбранного цвета
-                if self.selection_mode == "player":
-                    # Для персонажа (фиолетовый диапазон)
-                    h_range = 15  # допустимое отклонение оттенка
-                    self.player_color_range["lower"] = [max(0, h - h_range), max(0, s - 50), max(0, v - 50)]
-                    self.player_color_range["upper"] = [min(179, h + h_range), min(255, s + 50), min(255, v + 50)]
-                    print(f"Выбран цвет для персонажа: HSV={self.selected_hsv}")
-                
-                elif self.selection_mode == "target":
-                    # Для цели (зеленый диапазон)
-                    h_range = 20
-                    self.target_color_range["lower"] = [max(0, h - h_range), max(0, s - 50), max(0, v - 50)]
-                    self.target_color_range["upper"] = [min(179, h + h_range), min(255, s + 50), min(255, v + 50)]
-                    print(f"Выбран цвет для цели: HSV={self.selected_hsv}")
-                
-                elif self.selection_mode == "trap":
-                    # Для ловушек (красный диапазон)
-                    h_range = 10
-                    self.trap_color_range["lower"] = [max(0, h - h_range), max(0, s - 50), max(0, v - 50)]
-                    self.trap_color_range["upper"] = [min(179, h + h_range), min(255, s + 50), min(255, v + 50)]
-                    print(f"Выбран цвет для ловушки: HSV={self.selected_hsv}")
+                # Диапазон вокруг выбранного цвета с допустимым отклонением оттенка класса
+                # (заменяет первый диапазон класса)
+                object_class = self.object_classes.get(self.selection_mode)
+                h, s, v = (int(c) for c in self.selected_hsv)
+                h_range = object_class.hue_tolerance
+                object_class.ranges[0] = (
+                    np.array([max(0, h - h_range), max(0, s - 50), max(0, v - 50)]),
+                    np.array([min(179, h + h_range), min(255, s + 50), min(255, v + 50)])
+                )
+                print(f"Выбран цвет для класса {object_class.name}: HSV={self.selected_hsv}")
                 
                 # Отмечаем, что конфигурация была изменена
                 self.config_changed = True
@@ -164,9 +122,8 @@ class ColorPicker:
         print("=== Инструмент выбора цветов ===")
         print(f"Область захвата экрана: {self.region}")
         print("\nКлавиши управления:")
-        print("1 - выбор цвета персонажа (фиолетовый)")
-        print("2 - выбор цвета цели (зеленый)")
-        print("3 - выбор цвета ловушки (красный)")
+        for number, name in enumerate(self.object_classes.names[:9], start=1):
+            print(f"{number} - выбор цвета класса {name}")
         print("S - сохранить настройки")
         print("ESC - выход")
         print("\nЩелкните на нужном цвете на экране для его выбора.")
@@ -186,46 +143,15 @@ class ColorPicker:
             # Конвертируем в HSV для детекции цветов
             hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
             
-            # Создаем маски для каждого объекта
-            player_mask = cv2.inRange(
-                hsv, 
-                np.array(self.player_color_range["lower"]), 
-                np.array(self.player_color_range["upper"])
-            )
-            
-            target_mask = cv2.inRange(
-                hsv, 
-                np.array(self.target_color_range["lower"]), 
-                np.array(self.target_color_range["upper"])
-            )
-            
-            trap_mask = cv2.inRange(
-                hsv, 
-                np.array(self.trap_color_range["lower"]), 
-                np.array(self.trap_color_range["upper"])
-            )
-            
-            # Объединяем маски и исходное изображение
+            # Накладываем маски классов их цветами
             result = frame.copy()
-            
-            # Накладываем маски разных цветов
-            # Персонаж - фиолетовый
-            player_result = cv2.bitwise_and(frame, frame, mask=player_mask)
-            player_highlight = np.zeros_like(frame)
-            player_highlight[player_mask > 0] = [255, 0, 255]  # Фиолетовый
-            result = cv2.addWeighted(result, 1, player_highlight, 0.5, 0)
-            
-            # Цель - зеленый
-            target_result = cv2.bitwise_and(frame, frame, mask=target_mask)
-            target_highlight = np.zeros_like(frame)
-            target_highlight[target_mask > 0] = [0, 255, 0]  # Зеленый
-            result = cv2.addWeighted(result, 1, target_highlight, 0.5, 0)
-            
-            # Ловушки - красный
-            trap_result = cv2.bitwise_and(frame, frame, mask=trap_mask)
-            trap_highlight = np.zeros_like(frame)
-            trap_highlight[trap_mask > 0] = [0, 0, 255]  # Красный
-            result = cv2.addWeighted(result, 1, trap_highlight, 0.5, 0)
+            for object_class in self.object_classes:
+                mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+                for lower, upper in object_class.ranges:
+                    mask |= cv2.inRange(hsv, lower, upper)
+                highlight = np.zeros_like(frame)
+                highlight[mask > 0] = object_class.color
+                result = cv2.addWeighted(result, 1, highlight, 0.5, 0)
             
             # Отображаем текущий режим выбора
             mode_text = f"Режим: {self.selection_mode.upper()}"
@@ -233,16 +159,12 @@ class ColorPicker:
             
             # Показываем прямоугольник с выбранным цветом
             if self.selected_hsv is not None and self.selected_type is not None:
-                # Определяем цвет прямоугольника в зависимости от типа
-                if self.selected_type == "player":
-                    color = (255, 0, 255)  # Фиолетовый
-                    ranges_text = f"Персонаж: H[{self.player_color_range['lower'][0]}-{self.player_color_range['upper'][0]}] S[{self.player_color_range['lower'][1]}-{self.player_color_range['upper'][1]}] V[{self.player_color_range['lower'][2]}-{self.player_color_range['upper'][2]}]"
-                elif self.selected_type == "target":
-                    color = (0, 255, 0)    # Зеленый
-                    ranges_text = f"Цель: H[{self.target_color_range['lower'][0]}-{self.target_color_range['upper'][0]}] S[{self.target_color_range['lower'][1]}-{self.target_color_range['upper'][1]}] V[{self.target_color_range['lower'][2]}-{self.target_color_range['upper'][2]}]"
-                elif self.selected_type == "trap":
-                    color = (0, 0, 255)    # Красный
-                    ranges_text = f"Ловушка: H[{self.trap_color_range['lower'][0]}-{self.trap_color_range['upper'][0]}] S[{self.trap_color_range['lower'][1]}-{self.trap_color_range['upper'][1]}] V[{self.trap_color_range['lower'][2]}-{self.trap_color_range['upper'][2]}]"
+                # Цвет прямоугольника - цвет класса
+                object_class = self.object_classes.get(self.selected_type)
+                color = object_class.color
+                lower, upper = object_class.ranges[0]
+                ranges_text = (f"{object_class.name}: H[{lower[0]}-{upper[0]}] "
+                               f"S[{lower[1]}-{upper[1]}] V[{lower[2]}-{upper[2]}]")
                 
                 # Рисуем прямоугольник с выбранным цветом
                 cv2.rectangle(result, 
@@ -258,7 +180,8 @@ class ColorPicker:
                 cv2.putText(result, ranges_text, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
             # Отображаем инструкции
-            cv2.putText(result, "1: персонаж  2: цель  3: ловушка", (10, result.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            keys_text = "  ".join(f"{number}: {name}" for number, name in enumerate(self.object_classes.names[:9], start=1))
+            cv2.putText(result, keys_text, (10, result.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             cv2.putText(result, "S: сохранить  ESC: выход", (10, result.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
             # Показываем результат
@@ -273,15 +196,9 @@ class ColorPicker:
                     if save_key == ord('y'):
                         self.save_config()
                 break
-            elif key == ord('1'):  # Выбор персонажа
-                self.selection_mode = "player"
-                print("Выбран режим настройки цвета персонажа")
-            elif key == ord('2'):  # Выбор цели
-                self.selection_mode = "target"
-                print("Выбран режим настройки цвета цели")
-            elif key == ord('3'):  # Выбор ловушки
-                self.selection_mode = "trap"
-                print("Выбран режим настройки цвета ловушки")
+            elif ord('1') <= key <= ord('9') and key - ord('1') < len(self.object_classes):  # Выбор класса
+                self.selection_mode = self.object_classes.names[key - ord('1')]
+                print(f"Выбран режим настройки цвета класса {self.selection_mode}")
             elif key == ord('s'):  # Сохранение настроек
                 self.save_config()
         
@@ -0,0 +1,261 @@
+"""
+Двоичная запись результатов обнаружения по кадрам.
+
+Запись состоит из двух файлов, в которые данные только дописываются:
+
+- <путь> - заголовок и записи фиксированного размера (RECORD_DTYPE): номер
+  кадра, время, центры персонажа и цели, флаги, замеры времени и положение
+  ловушек кадра во втором файле;
+- <путь>.traps - заголовок и рамки ловушек всех кадров подряд (int32 x, y, w, h).
+
+Для чтения оба файла отображаются в память (numpy.memmap), поэтому
+многочасовая сессия открывается за миллисекунды, а поля доступны сразу
+как массивы NumPy. Недописанный хвост (например, после аварийного
+завершения) при чтении отбрасывается, а при дописывании обрезается.
+"""
+
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"GDREC\x00\x00\x01"
+TRAPS_MAGIC = b"GDTRP\x00\x00\x01"
+HEADER_SIZE = 64
+
+# Флаги записи
+HAS_PLAYER = 1
+HAS_TARGET = 2
+IN_TRAP = 4
+TARGET_REACHED = 8
+FULL_SCAN = 16
+REUSED = 32
+PREDICTED = 64
+
+# Замеры из DetectionResult.timings, сохраняемые в каждой записи (NaN, если замера нет)
+TIMINGS = ("scan_ms", "detect_ms")
+
+RECORD_DTYPE = np.dtype([
+    ("frame_index", "<u4"),
+    ("flags", "u1"),
+    ("timestamp", "<f8"),
+    ("player", "<i4", (2,)),
+    ("target", "<i4", (2,)),
+    ("trap_offset", "<u8"),
+    ("trap_count", "<u4"),
+    ("timings", "<f4", (len(TIMINGS),)),
+])
+
+TRAP_DTYPE = np.dtype("<i4")
+
+
+def _header(magic, item_size):
+    """Заголовок файла: сигнатура, размер элемента и описание полей"""
+    fields = ",".join(RECORD_DTYPE.names + TIMINGS).encode("ascii")
+    return (magic + struct.pack("<I", item_size) + fields).ljust(HEADER_SIZE, b"\x00")[:HEADER_SIZE]
+
+
+def _check_header(data, magic, item_size, path):
+    if len(data) < HEADER_SIZE or data[:8] != magic:
+        raise ValueError(f"{path}: не файл записи обнаружения")
+    if struct.unpack("<I", data[8:12])[0] != item_size:
+        raise ValueError(f"{path}: другая версия формата записи")
+
+
+class DetectionRecorder:
+    """Дописывание результатов обнаружения в двоичные файлы"""
+
+    def __init__(self, path, buffer_size=1 << 20):
+        """
+        Args:
+            path (str): Путь к файлу записей (рамки ловушек пишутся в path + ".traps");
+                        существующая запись продолжается
+            buffer_size (int): Размер буфера записи в байтах
+        """
+        self.path = path
+        self.traps_path = path + ".traps"
+        self.records_file = self._open(path, MAGIC, RECORD_DTYPE.itemsize, buffer_size)
+        self.traps_file = self._open(self.traps_path, TRAPS_MAGIC, 4 * TRAP_DTYPE.itemsize, buffer_size)
+        self.records = (self.records_file.tell() - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.trap_count = (self.traps_file.tell() - HEADER_SIZE) // (4 * TRAP_DTYPE.itemsize)
+        self.record = np.zeros(1, dtype=RECORD_DTYPE)
+        logging.info(f"Запись результатов обнаружения: {path} (уже записано кадров: {self.records})")
+
+    @staticmethod
+    def _open(path, magic, item_size, buffer_size):
+        """Открыть файл для дописывания, отрезав недописанный хвост"""
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                _check_header(f.read(HEADER_SIZE), magic, item_size, path)
+            size = os.path.getsize(path)
+            complete = HEADER_SIZE + (size - HEADER_SIZE) // item_size * item_size
+            if complete != size:
+                with open(path, "r+b") as f:
+                    f.truncate(complete)
+            f = open(path, "ab", buffering=buffer_size)
+        else:
+            f = open(path, "wb", buffering=buffer_size)
+            f.write(_header(magic, item_size))
+        return f
+
+    def append(self, result, timestamp=None):
+        """
+        Дописать результат кадра
+
+        Args:
+            result (DetectionResult): Результат обнаружения
+            timestamp (float | None): Время кадра на шкале источника (FrameSource.timestamp);
+                                      None - текущее time.time() (захват экрана)
+        """
+        traps = np.ascontiguousarray(result.trap_boxes, dtype=TRAP_DTYPE).reshape(-1, 4)
+
+        flags = 0
+        if result.player_position:
+            flags |= HAS_PLAYER
+        if result.target_position:
+            flags |= HAS_TARGET
+        if result.is_in_trap:
+            flags |= IN_TRAP
+        if result.target_reached:
+            flags |= TARGET_REACHED
+        if result.full_scan:
+            flags |= FULL_SCAN
+        if result.reused:
+            flags |= REUSED
+        if result.player_predicted:
+            flags |= PREDICTED
+
+        record = self.record[0]
+        record["frame_index"] = result.frame_index
+        record["flags"] = flags
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["player"] = result.player_position or (0, 0)
+        record["target"] = result.target_position or (0, 0)
+        record["trap_offset"] = self.trap_count
+        record["trap_count"] = len(traps)
+        record["timings"] = [result.timings.get(name, np.nan) for name in TIMINGS]
+
+        # Сначала ловушки: запись кадра не должна ссылаться на недописанные рамки
+        if len(traps):
+            self.traps_file.write(traps.tobytes())
+            self.trap_count += len(traps)
+        self.records_file.write(self.record.tobytes())
+        self.records += 1
+
+    def flush(self):
+        self.traps_file.flush()
+        self.records_file.flush()
+
+    def close(self):
+        if self.records_file.closed:
+            return
+        self.flush()
+        self.traps_file.close()
+        self.records_file.close()
+        logging.info(f"Запись результатов обнаружения завершена: {self.path}, кадров: {self.records}")
+
+
+class DetectionRecording:
+    """Запись результатов обнаружения, отображенная в память"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Путь к файлу записей (рядом должен лежать path + ".traps")
+        """
+        self.path = path
+        self.records = self._map(path, MAGIC, RECORD_DTYPE, RECORD_DTYPE.itemsize, ())
+        traps = self._map(path + ".traps", TRAPS_MAGIC, TRAP_DTYPE, 4 * TRAP_DTYPE.itemsize, (4,))
+        self.traps = traps.reshape(-1, 4)
+
+        # Кадры, чьи ловушки не успели записаться, отбрасываются
+        if len(self.records):
+            ends = self.records["trap_offset"] + self.records["trap_count"]
+            complete = np.flatnonzero(ends > len(self.traps))
+            if len(complete):
+                self.records = self.records[:complete[0]]
+
+    @staticmethod
+    def _map(path, magic, dtype, item_size, item_shape):
+        with open(path, "rb") as f:
+            _check_header(f.read(HEADER_SIZE), magic, item_size, path)
+        count = (os.path.getsize(path) - HEADER_SIZE) // item_size
+        if count == 0:
+            return np.empty((0,) + item_shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,) + item_shape)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def flags(self):
+        return self.records["flags"]
+
+    def has(self, flag):
+        """Маска кадров с флагом (HAS_PLAYER, IN_TRAP, ...)"""
+        return (self.records["flags"] & flag) != 0
+
+    def timing(self, name):
+        """Замер времени по всем кадрам, мс (NaN, если замера не было)"""
+        return self.records["timings"][:, TIMINGS.index(name)]
+
+    def positions(self, name):
+        """Центры "player" или "target" (N, 2); кадры без объекта - NaN"""
+        flag = HAS_PLAYER if name == "player" else HAS_TARGET
+        positions = self.records[name].astype(np.float64)
+        positions[~self.has(flag)] = np.nan
+        return positions
+
+    def traps_for(self, index):
+        """Рамки ловушек кадра (K, 4)"""
+        record = self.records[index]
+        offset = int(record["trap_offset"])
+        return self.traps[offset:offset + int(record["trap_count"])]
+
+    def summary(self):
+        """Сводка записи"""
+        count = len(self)
+        if not count:
+            return {"frames": 0}
+        timestamps = self.timestamps
+        detect_ms = self.timing("detect_ms")
+        return {
+            "frames": count,
+            "duration_s": float(timestamps[-1] - timestamps[0]),
+            "player_found": float(self.has(HAS_PLAYER).mean()),
+            "target_found": float(self.has(HAS_TARGET).mean()),
+            "in_trap_frames": int(self.has(IN_TRAP).sum()),
+            "trap_entries": int(np.count_nonzero(np.diff(self.has(IN_TRAP).astype(np.int8)) == 1)
+                                + bool(self.has(IN_TRAP)[0])),
+            "target_reached_frames": int(self.has(TARGET_REACHED).sum()),
+            "traps_mean": float(self.records["trap_count"].mean()),
+            "detect_ms_mean": float(np.nanmean(detect_ms)) if not np.isnan(detect_ms).all() else None,
+        }
+
+
+def load_recording(path):
+    """Открыть запись результатов обнаружения (см. DetectionRecording)"""
+    return DetectionRecording(path)
+
+
+# Сводка по записи
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сводка по двоичной записи результатов обнаружения")
+    parser.add_argument("path", help="файл записи (рядом должен лежать файл .traps)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recording = load_recording(args.path)
+    summary = recording.summary()
+    elapsed = 1000.0 * (time.perf_counter() - start)
+    print(f"Запись {args.path} открыта за {elapsed:.1f} мс")
+    for key, value in summary.items():
+        print(f"  {key}: {value}")
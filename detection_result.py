@@ -0,0 +1,89 @@
+"""
+Результат обнаружения на одном кадре.
+
+Ядро обнаружения (GameDetector.detect) не рисует на кадре и возвращает только
+этот компактный объект. Визуализация строится по нему отдельно (см. renderer.py)
+и только тогда, когда ее кто-то смотрит.
+"""
+
+import numpy as np
+
+
+class DetectionResult:
+    """Позиции, рамки, флаги и замеры времени для одного кадра"""
+
+    __slots__ = ("frame_index", "frame_shape", "player_box", "target_box",
+                 "player_position", "target_position", "trap_boxes", "trap_hits",
+                 "is_in_trap", "target_reached", "full_scan", "reused", "masks", "timings",
+                 "player_velocity", "player_predicted", "trap_ids", "trap_delta", "objects")
+
+    def __init__(self, frame_index, frame_shape):
+        """
+        Args:
+            frame_index (int): Порядковый номер кадра у детектора
+            frame_shape (tuple): Форма кадра (высота, ширина, каналы)
+        """
+        self.frame_index = frame_index
+        self.frame_shape = frame_shape
+        self.player_box = None          # Рамка (x, y, w, h) или None
+        self.target_box = None
+        self.player_position = None     # Центр (x, y) или None
+        self.target_position = None
+        self.trap_boxes = np.empty((0, 4), dtype=np.int32)
+        self.trap_hits = np.empty(0, dtype=np.intp)  # Индексы ловушек с персонажем
+        self.is_in_trap = False
+        self.target_reached = False
+        self.full_scan = False          # Кадр просмотрен целиком (а не только вокруг последних позиций)
+        self.reused = False             # Кадр не изменился, результат взят с предыдущего кадра
+        self.masks = None               # Маски (ловушки, цель, персонаж) - только для отладочной визуализации
+        self.timings = {}               # Замеры стадий, мс
+        self.player_velocity = None     # Скорость персонажа (vx, vy), пикс/с - только с моделью движения
+        self.player_predicted = False   # Рамка персонажа предсказана моделью движения, а не найдена
+        self.trap_ids = None            # Постоянные номера ловушек в порядке trap_boxes (см. trap_tracker.py)
+        self.trap_delta = None          # Изменения набора ловушек на этом кадре (TrapDelta) или None
+        self.objects = {}               # Объекты дополнительных классов: имя -> рамки (N, 4) (см. object_classes.py)
+
+    def reuse(self, frame_index):
+        """
+        Копия результата для неизменившегося кадра
+
+        Returns:
+            DetectionResult: Тот же результат с новым номером кадра и флагом reused
+        """
+        result = DetectionResult(frame_index, self.frame_shape)
+        for name in self.__slots__:
+            setattr(result, name, getattr(self, name))
+        result.frame_index = frame_index
+        result.full_scan = False
+        result.reused = True
+        result.trap_delta = None
+        result.timings = {}
+        return result
+
+    def to_dict(self):
+        """Результат в виде словаря из обычных типов Python (без масок)"""
+        return {
+            "frame_index": self.frame_index,
+            "frame_shape": list(self.frame_shape),
+            "player_box": list(self.player_box) if self.player_box else None,
+            "target_box": list(self.target_box) if self.target_box else None,
+            "player_position": list(self.player_position) if self.player_position else None,
+            "target_position": list(self.target_position) if self.target_position else None,
+            "trap_boxes": self.trap_boxes.tolist(),
+            "trap_hits": self.trap_hits.tolist(),
+            "is_in_trap": self.is_in_trap,
+            "target_reached": self.target_reached,
+            "full_scan": self.full_scan,
+            "reused": self.reused,
+            "timings": dict(self.timings),
+            "player_velocity": list(self.player_velocity) if self.player_velocity else None,
+            "player_predicted": self.player_predicted,
+            "trap_ids": self.trap_ids.tolist() if self.trap_ids is not None else None,
+            "trap_delta": self.trap_delta.to_dict() if self.trap_delta is not None else None,
+            "objects": {name: boxes.tolist() for name, boxes in self.objects.items()},
+        }
+
+    def __repr__(self):
+        return (f"DetectionResult(frame={self.frame_index}, player={self.player_position}, "
+                f"target={self.target_position}, traps={len(self.trap_boxes)}, "
+                f"in_trap={self.is_in_trap}, target_reached={self.target_reached})")
@@ -0,0 +1,195 @@
+"""
+Шина событий обнаружения.
+
+Переходы состояния (вход в ловушку, выход из нее, достижение цели и уход
+от нее) и изменения набора ловушек цикл обработки не обрабатывает сам,
+а публикует как события.
+Публикация только кладет событие в ограниченную очередь каждого подписчика
+и никогда не ждет. Каждый подписчик (уведомления, журнал, внешние
+потребители) обрабатывает свою очередь в собственном потоке, поэтому
+медленный подписчик (например, уведомление, которое ждет внутри show)
+не задерживает кадры. Если подписчик не успевает, самые старые события
+в его очереди вытесняются и учитываются в статистике.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from pipeline import LatestFrameQueue
+
+# Типы событий
+TRAP_ENTERED = "trap_entered"
+TRAP_EXITED = "trap_exited"
+TARGET_REACHED = "target_reached"
+TARGET_LEFT = "target_left"
+TRAPS_CHANGED = "traps_changed"
+
+EVENT_KINDS = (TRAP_ENTERED, TRAP_EXITED, TARGET_REACHED, TARGET_LEFT, TRAPS_CHANGED)
+
+
+class DetectionEvent:
+    """Переход состояния на кадре"""
+
+    __slots__ = ("kind", "frame_index", "timestamp", "player_position", "target_position", "traps", "delta")
+
+    def __init__(self, kind, frame_index, player_position=None, target_position=None, traps=(), delta=None):
+        """
+        Args:
+            kind (str): Тип события (TRAP_ENTERED, TRAP_EXITED, TARGET_REACHED, TARGET_LEFT)
+            frame_index (int): Номер кадра у детектора
+            player_position (tuple | None): Центр персонажа (x, y)
+            target_position (tuple | None): Центр цели (x, y)
+            traps (tuple): Рамки (x, y, w, h) ловушек, в которых находится персонаж
+            delta (TrapDelta | None): Изменения набора ловушек (для TRAPS_CHANGED)
+        """
+        self.kind = kind
+        self.frame_index = frame_index
+        self.timestamp = time.time()
+        self.player_position = player_position
+        self.target_position = target_position
+        self.traps = traps
+        self.delta = delta
+
+    def to_dict(self):
+        """Событие в виде словаря из обычных типов Python"""
+        return {
+            "kind": self.kind,
+            "frame_index": self.frame_index,
+            "timestamp": self.timestamp,
+            "player_position": list(self.player_position) if self.player_position else None,
+            "target_position": list(self.target_position) if self.target_position else None,
+            "traps": [list(trap) for trap in self.traps],
+            "delta": self.delta.to_dict() if self.delta is not None else None,
+        }
+
+    def __repr__(self):
+        return f"DetectionEvent({self.kind}, frame={self.frame_index}, player={self.player_position})"
+
+
+class Subscriber:
+    """Подписчик шины: своя ограниченная очередь и свой поток"""
+
+    def __init__(self, name, callback, kinds=None, queue_size=64):
+        """
+        Args:
+            name (str): Имя подписчика (для потока и статистики)
+            callback: Функция event -> None, вызывается в потоке подписчика
+            kinds (tuple | None): Типы событий подписчика (None - все)
+            queue_size (int): Глубина очереди; при переполнении вытесняются самые старые события
+        """
+        self.name = name
+        self.callback = callback
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.queue = LatestFrameQueue(name, queue_size, drop_oldest=True)
+        self.thread = None
+        self.handled = 0
+        self.errors = 0
+
+    def accepts(self, kind):
+        return self.kinds is None or kind in self.kinds
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name=f"events-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                if self.queue.is_drained():
+                    break
+                continue
+            try:
+                self.callback(event)
+                self.handled += 1
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Ошибка подписчика событий {self.name}: {e}")
+
+
+class EventBus:
+    """Публикация событий подписчикам без ожидания"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, callback, name=None, kinds=None, queue_size=64):
+        """
+        Подписаться на события
+
+        Поток подписчика запускается при первом событии, поэтому шина
+        без событий не создает потоков.
+
+        Returns:
+            Subscriber: Подписчик (для статистики и отписки)
+        """
+        subscriber = Subscriber(name or getattr(callback, "__name__", "subscriber"), callback, kinds, queue_size)
+        with self.lock:
+            self.subscribers = self.subscribers + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Отписать подписчика; уже полученные им события будут обработаны"""
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not subscriber]
+        subscriber.queue.close()
+
+    def publish(self, event):
+        """Отправить событие всем подписанным на его тип (без ожидания)"""
+        self.published += 1
+        for subscriber in self.subscribers:
+            if subscriber.accepts(event.kind):
+                if subscriber.thread is None:
+                    with self.lock:
+                        if subscriber.thread is None:
+                            subscriber.start()
+                subscriber.queue.put(event)
+
+    def close(self, timeout=2.0):
+        """Дождаться обработки оставшихся событий и остановить потоки подписчиков"""
+        subscribers = self.subscribers
+        for subscriber in subscribers:
+            subscriber.queue.close()
+        for subscriber in subscribers:
+            if subscriber.thread is not None:
+                subscriber.thread.join(timeout=timeout)
+
+    def stats(self):
+        """Статистика подписчиков: обработано, вытеснено из очереди, ошибок"""
+        return {
+            "published": self.published,
+            "subscribers": {
+                subscriber.name: {
+                    "handled": subscriber.handled,
+                    "dropped": subscriber.queue.dropped,
+                    "errors": subscriber.errors,
+                }
+                for subscriber in self.subscribers
+            },
+        }
+
+    def format_stats(self):
+        """Статистика одной строкой"""
+        stats = self.stats()
+        parts = [f"{name}: обработано {item['handled']}, вытеснено {item['dropped']}, ошибок {item['errors']}"
+                 for name, item in stats["subscribers"].items()]
+        return f"опубликовано: {stats['published']}" + "".join(f"; {part}" for part in parts)
+
+
+class EventFileWriter:
+    """Подписчик, дописывающий события в файл JSON Lines (для внешних потребителей)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,85 @@
+"""
+Отпечатки кадров для пропуска обнаружения на неизменившихся кадрах.
+
+Меню, паузы и экраны загрузки дают длинные серии одинаковых кадров. Отпечаток -
+крошечная уменьшенная копия кадра (среднее по блокам cell_size x cell_size).
+Если отпечаток нового кадра отличается от отпечатка последнего обработанного
+кадра не больше чем на tolerance в каждом блоке, кадр считается неизменным
+и детектор повторно использует последний результат.
+
+Сравнение идет с кадром, результат которого используется, а не с предыдущим
+кадром, поэтому медленные изменения накапливаются и не теряются.
+"""
+
+import cv2
+
+
+class FrameFingerprint:
+    """Сравнение кадров по уменьшенным копиям"""
+
+    def __init__(self, cell_size=8, tolerance=1):
+        """
+        Args:
+            cell_size (int): Сторона блока кадра, усредняемого в один пиксель отпечатка
+            tolerance (int): Допустимое отличие среднего значения блока (0 - точное совпадение)
+        """
+        self.cell_size = cell_size
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        """Забыть опорный кадр и обнулить статистику"""
+        self.reference = None
+        self.reference_key = None
+        self.reference_shape = None
+        self.checked = 0
+        self.unchanged = 0
+
+    def compute(self, frame):
+        """Отпечаток кадра: среднее значение каждого блока cell_size x cell_size"""
+        height, width = frame.shape[:2]
+        size = (max(1, width // self.cell_size), max(1, height // self.cell_size))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def is_unchanged(self, frame, key=None):
+        """
+        Проверить, совпадает ли кадр с опорным в пределах допуска
+
+        Args:
+            frame (numpy.ndarray): Новый кадр
+            key: Дополнительные условия совпадения (например, настройки цветов);
+                 при другом ключе кадр всегда считается изменившимся
+
+        Returns:
+            tuple: (неизменен ли кадр, отпечаток кадра для remember)
+        """
+        self.checked += 1
+        fingerprint = self.compute(frame)
+        reference = self.reference
+        unchanged = (reference is not None and key == self.reference_key
+                     and frame.shape == self.reference_shape
+                     and cv2.norm(fingerprint, reference, cv2.NORM_INF) <= self.tolerance)
+        if unchanged:
+            self.unchanged += 1
+        return unchanged, fingerprint
+
+    def remember(self, frame, fingerprint, key=None):
+        """Сделать кадр опорным (после полноценного обнаружения на нем)"""
+        self.reference = fingerprint
+        self.reference_key = key
+        self.reference_shape = frame.shape
+
+    def stats(self):
+        """Статистика проверок"""
+        return {
+            "checked": self.checked,
+            "unchanged": self.unchanged,
+            "detected": self.checked - self.unchanged,
+            "skip_ratio": self.unchanged / self.checked if self.checked else 0.0,
+        }
+
+    def format_stats(self):
+        """Статистика одной строкой"""
+        stats = self.stats()
+        return (f"проверено кадров: {stats['checked']}, без изменений (пропущено): {stats['unchanged']} "
+                f"({100 * stats['skip_ratio']:.1f}%), обработано: {stats['detected']}")
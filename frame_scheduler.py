@@ -0,0 +1,149 @@
+"""
+Планировщик кадров с дедлайнами.
+
+Вместо фиксированной паузы после каждого кадра планировщик отводит на кадр
+бюджет 1 / target_fps и спит только остаток этого бюджета. Если обработка не
+уложилась в бюджет, кадр считается пропустившим дедлайн. При target_fps = 0
+планировщик не спит вовсе (режим "как можно быстрее" для замеров).
+"""
+
+import logging
+import time
+
+
+class FrameScheduler:
+    """Планировщик кадров с целевым FPS и учетом пропущенных дедлайнов"""
+
+    def __init__(self, target_fps=30.0, max_retry_delay=1.0, report_interval=10.0):
+        """
+        Args:
+            target_fps (float): Целевая частота кадров (0 или None - как можно быстрее)
+            max_retry_delay (float): Максимальная пауза после неудачного захвата, с
+            report_interval (float): Период записи статистики в журнал, с (0 - не писать)
+        """
+        self.max_retry_delay = max_retry_delay
+        self.report_interval = report_interval
+        self.set_target_fps(target_fps)
+        self.reset()
+
+    def set_target_fps(self, target_fps):
+        """Изменить целевой FPS"""
+        self.target_fps = target_fps or 0
+        self.period = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+        self.deadline = None
+
+    @property
+    def unlimited(self):
+        """Режим "как можно быстрее" без ожидания между кадрами"""
+        return self.period <= 0
+
+    def reset(self):
+        """Сбросить статистику"""
+        self.start_time = time.perf_counter()
+        self.frame_start = None
+        self.deadline = None
+        self.frames = 0
+        self.missed = 0
+        self.failures = 0
+        self.retry_delay = 0.0
+        self.work_time = 0.0
+        self.sleep_time = 0.0
+        self.last_report_time = self.start_time
+        self.last_report_frames = 0
+        self.last_report_missed = 0
+
+    def begin_frame(self):
+        """Отметить начало обработки кадра"""
+        now = time.perf_counter()
+        self.frame_start = now
+        if self.unlimited:
+            return
+        # Дедлайны идут с шагом period; после большого отставания сетка
+        # сдвигается к текущему моменту, чтобы не было серии кадров без пауз
+        if self.deadline is None or now - self.deadline > self.period:
+            self.deadline = now + self.period
+        else:
+            self.deadline += self.period
+
+    def end_frame(self):
+        """
+        Отметить конец обработки кадра и проспать остаток бюджета
+
+        Returns:
+            bool: True, если кадр уложился в дедлайн
+        """
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.work_time += now - self.frame_start
+        self.frames += 1
+        self.retry_delay = 0.0
+
+        on_time = True
+        if not self.unlimited:
+            remaining = self.deadline - now
+            if remaining > 0:
+                time.sleep(remaining)
+                self.sleep_time += remaining
+            else:
+                on_time = False
+                self.missed += 1
+
+        self._maybe_report()
+        return on_time
+
+    def wait_after_failure(self):
+        """
+        Пауза после неудачного захвата
+
+        Пауза растет от одного периода кадра (или 50 мс) вдвое после каждой
+        неудачи подряд, но не больше max_retry_delay.
+        """
+        self.failures += 1
+        base = self.period if self.period > 0 else 0.05
+        self.retry_delay = min(self.max_retry_delay, max(base, self.retry_delay * 2))
+        time.sleep(self.retry_delay)
+        self.sleep_time += self.retry_delay
+        self.deadline = None
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.perf_counter()
+        elapsed = now - self.last_report_time
+        if elapsed < self.report_interval:
+            return
+
+        frames = self.frames - self.last_report_frames
+        missed = self.missed - self.last_report_missed
+        logging.info(f"Планировщик: {frames / elapsed:.1f} FPS (цель: {self.describe_target()}), "
+                     f"пропущено дедлайнов: {missed} из {frames}")
+        self.last_report_time = now
+        self.last_report_frames = self.frames
+        self.last_report_missed = self.missed
+
+    def describe_target(self):
+        """Целевой FPS в виде строки"""
+        return "без ограничения" if self.unlimited else f"{self.target_fps:g}"
+
+    def stats(self):
+        """Статистика планировщика"""
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "target_fps": self.target_fps,
+            "frames": self.frames,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "missed_deadlines": self.missed,
+            "missed_ratio": self.missed / self.frames if self.frames else 0.0,
+            "capture_failures": self.failures,
+            "avg_work_ms": 1000.0 * self.work_time / self.frames if self.frames else 0.0,
+            "busy_ratio": self.work_time / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def format_stats(self):
+        """Статистика планировщика одной строкой"""
+        stats = self.stats()
+        return (f"{stats['fps']:.1f} FPS (цель: {self.describe_target()}), "
+                f"пропущено дедлайнов: {stats['missed_deadlines']} из {stats['frames']} "
+                f"({100 * stats['missed_ratio']:.1f}%), "
+                f"среднее время кадра: {stats['avg_work_ms']:.1f} мс, "
+                f"загрузка: {100 * stats['busy_ratio']:.0f}%")
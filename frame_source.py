@@ -0,0 +1,377 @@
+"""
+Источники кадров для GameDetector.
+
+Детектор получает кадры через единый интерфейс FrameSource, поэтому один и тот же
+код обнаружения работает как с живым экраном, так и с записанными сессиями
+(видеофайл, папка с PNG) или синтетическим генератором. Офлайн-источники позволяют
+прогонять детектор на полной скорости на машинах без дисплея.
+
+Все источники отдают кадры в том же порядке каналов, что и захват экрана
+через pyautogui (RGB), чтобы откалиброванные диапазоны HSV совпадали.
+
+Экран, видео и генератор пишут кадры в кольцо предвыделенных буферов
+(см. capture_buffer.py): возвращаемый кадр - это сам буфер кольца, он остается
+действительным в течение slots - 1 следующих чтений.
+"""
+
+import glob
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from capture_buffer import FrameRingBuffer, GDIScreenGrabber, GDI_AVAILABLE
+
+# pyautogui нужен только для живого захвата экрана; на машинах без дисплея
+# его импорт завершается ошибкой, а офлайн-источники работают и без него
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except Exception:
+    PYAUTOGUI_AVAILABLE = False
+
+
+class FrameSource:
+    """Базовый класс источника кадров"""
+
+    # Живой источник (экран) требует поиска окна и пауз между кадрами
+    is_live = False
+
+    def __init__(self):
+        self.frames_read = 0
+        self.exhausted = False
+        # Время последнего прочитанного кадра на шкале самого источника, с
+        # (None - источник его не знает, и детектор берет момент обнаружения)
+        self.timestamp = None
+
+    def read(self):
+        """
+        Получить следующий кадр
+
+        Returns:
+            numpy.ndarray | None: Кадр HxWx3 (uint8) или None, если кадр получить не удалось.
+                                  Для офлайн-источников после последнего кадра выставляется exhausted.
+        """
+        raise NotImplementedError
+
+    def set_region(self, region):
+        """
+        Сообщить источнику область захвата
+
+        Args:
+            region (tuple): Регион (x, y, width, height)
+        """
+        pass
+
+    def close(self):
+        """Освободить ресурсы источника"""
+        pass
+
+    def describe(self):
+        """Краткое описание источника для вывода в консоль"""
+        return self.__class__.__name__
+
+    def __iter__(self):
+        while not self.exhausted:
+            frame = self.read()
+            if frame is None:
+                if self.exhausted:
+                    break
+                continue
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ScreenFrameSource(FrameSource):
+    """
+    Захват области экрана в кольцо предвыделенных буферов
+
+    С pywin32 пиксели читаются через GDI прямо в numpy-буфер; без него
+    используется pyautogui, и снимок копируется в буфер кольца.
+    """
+
+    is_live = True
+
+    def __init__(self, region=None, slots=3):
+        """
+        Args:
+            region (tuple): Регион (x, y, width, height)
+            slots (int): Количество буферов в кольце
+        """
+        super().__init__()
+        self.region = None
+        self.ring = FrameRingBuffer(slots)
+        self.grabber = None
+        if GDI_AVAILABLE:
+            try:
+                self.grabber = GDIScreenGrabber()
+            except Exception as e:
+                logging.warning(f"GDI-захват недоступен, используется pyautogui: {e}")
+        if region:
+            self.set_region(region)
+
+    def set_region(self, region):
+        # Буферы пересоздаются только при смене размера области
+        if region and region != self.region:
+            self.ring.resize_for_region(region)
+        self.region = region
+
+    def read(self):
+        if not self.region:
+            logging.error("Не удалось захватить экран: регион не определен")
+            return None
+
+        frame = self.ring.next()
+        if self.grabber is not None:
+            # BGRA из GDI переводим в порядок каналов pyautogui прямо в буфер кольца
+            cv2.cvtColor(self.grabber.grab(self.region), cv2.COLOR_BGRA2RGB, dst=frame)
+        elif PYAUTOGUI_AVAILABLE:
+            screenshot = pyautogui.screenshot(region=self.region)
+            np.copyto(frame, np.asarray(screenshot))
+        else:
+            logging.error("Модуль pyautogui недоступен, захват экрана невозможен")
+            return None
+
+        self.frames_read += 1
+        return frame
+
+    def close(self):
+        if self.grabber is not None:
+            self.grabber.release()
+
+    def describe(self):
+        return f"экран, область {self.region}"
+
+
+class VideoFrameSource(FrameSource):
+    """Чтение кадров из видеофайла"""
+
+    def __init__(self, path, loop=False, convert_to_rgb=True, slots=3):
+        """
+        Args:
+            path (str): Путь к видеофайлу
+            loop (bool): Начинать файл заново после последнего кадра
+            convert_to_rgb (bool): Переводить кадры OpenCV (BGR) в порядок каналов захвата экрана
+            slots (int): Количество буферов в кольце
+        """
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.convert_to_rgb = convert_to_rgb
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Не удалось открыть видеофайл: {path}")
+        self.ring = FrameRingBuffer(slots)
+        self.ring.resize(int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                         int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or None
+
+    def _decode(self):
+        # Декодер пишет кадр прямо в буфер кольца, если размер совпадает
+        buffer = self.ring.next()
+        ok, frame = self.capture.read(buffer)
+        if ok and frame is not buffer:
+            buffer = self.ring.next_like(frame)
+            np.copyto(buffer, frame)
+        return ok, buffer
+
+    def read(self):
+        if self.exhausted:
+            return None
+
+        ok, frame = self._decode()
+        if not ok and self.loop and self.frames_read > 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._decode()
+        if not ok:
+            self.exhausted = True
+            return None
+
+        self.frames_read += 1
+        if self.fps:
+            # Номер следующего кадра в файле, поэтому время верно и после перемотки
+            self.timestamp = (self.capture.get(cv2.CAP_PROP_POS_FRAMES) - 1) / self.fps
+        if self.convert_to_rgb:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        return frame
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def describe(self):
+        return f"видеофайл {self.path}"
+
+
+class ImageFolderFrameSource(FrameSource):
+    """Чтение кадров из папки с изображениями (по умолчанию PNG) в порядке имен файлов"""
+
+    def __init__(self, folder, pattern="*.png", loop=False, convert_to_rgb=True, fps=None):
+        """
+        Args:
+            folder (str): Папка с кадрами
+            pattern (str): Маска имен файлов
+            loop (bool): Начинать последовательность заново после последнего кадра
+            convert_to_rgb (bool): Переводить кадры OpenCV (BGR) в порядок каналов захвата экрана
+            fps (float | None): Частота, с которой записаны кадры (None - время кадров неизвестно)
+        """
+        super().__init__()
+        self.folder = folder
+        self.fps = fps
+        self.loop = loop
+        self.convert_to_rgb = convert_to_rgb
+        self.files = sorted(glob.glob(os.path.join(folder, pattern)))
+        self.index = 0
+        if not self.files:
+            raise IOError(f"В папке {folder} нет файлов {pattern}")
+
+    def read(self):
+        if self.exhausted:
+            return None
+
+        if self.index >= len(self.files):
+            if not self.loop:
+                self.exhausted = True
+                return None
+            self.index = 0
+
+        path = self.files[self.index]
+        self.index += 1
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            logging.error(f"Не удалось прочитать кадр: {path}")
+            return None
+
+        self.frames_read += 1
+        if self.fps:
+            self.timestamp = (self.index - 1) / self.fps
+        if self.convert_to_rgb:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        return frame
+
+    def describe(self):
+        return f"папка {self.folder} ({len(self.files)} кадров)"
+
+
+def hsv_to_frame_color(hsv):
+    """
+    Перевести цвет HSV (в шкале OpenCV) в значение пикселя кадра
+
+    Детектор переводит кадр в HSV через COLOR_BGR2HSV, поэтому обратное
+    преобразование дает пиксель, который попадет ровно в заданный цвет.
+    """
+    pixel = np.uint8([[hsv]])
+    return tuple(int(c) for c in cv2.cvtColor(pixel, cv2.COLOR_HSV2BGR)[0, 0])
+
+
+class SyntheticFrameSource(FrameSource):
+    """Генератор синтетических кадров с известным числом персонажей, целей и ловушек"""
+
+    # Цвета объектов подобраны в середине диапазонов HSV по умолчанию
+    PLAYER_HSV = (155, 200, 200)
+    TARGET_HSV = (60, 200, 200)
+    TRAP_HSV = (5, 200, 200)
+    BACKGROUND_HSV = (100, 30, 60)
+
+    def __init__(self, width=800, height=600, frames=None, players=1, targets=1, traps=3,
+                 object_size=30, speed=4, noise=0, seed=0, slots=3, fps=30.0):
+        """
+        Args:
+            width (int): Ширина кадра
+            height (int): Высота кадра
+            frames (int | None): Количество кадров (None - бесконечно)
+            players (int): Количество персонажей
+            targets (int): Количество целей
+            traps (int): Количество ловушек
+            object_size (int): Сторона квадрата объекта в пикселях
+            speed (int): Скорость движения персонажей в пикселях за кадр
+            noise (int): Амплитуда шума фона (0 - без шума)
+            seed (int): Зерно генератора случайных чисел для воспроизводимости
+            slots (int): Количество буферов в кольце
+            fps (float): Частота кадров, к которой относится скорость (время кадров source.timestamp)
+        """
+        super().__init__()
+        self.ring = FrameRingBuffer(slots)
+        self.ring.resize(width, height)
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.object_size = object_size
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+        self.player_color = hsv_to_frame_color(self.PLAYER_HSV)
+        self.target_color = hsv_to_frame_color(self.TARGET_HSV)
+        self.trap_color = hsv_to_frame_color(self.TRAP_HSV)
+
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = hsv_to_frame_color(self.BACKGROUND_HSV)
+
+        # Статичные цели и ловушки рисуются на фоне один раз
+        self.target_boxes = [self._random_box() for _ in range(targets)]
+        self.trap_boxes = [self._random_box() for _ in range(traps)]
+        for x, y, w, h in self.target_boxes:
+            cv2.rectangle(self.background, (x, y), (x + w - 1, y + h - 1), self.target_color, -1)
+        for x, y, w, h in self.trap_boxes:
+            cv2.rectangle(self.background, (x, y), (x + w - 1, y + h - 1), self.trap_color, -1)
+
+        # Персонажи двигаются по кадру и отражаются от краев
+        self.player_positions = [list(self._random_box()[:2]) for _ in range(players)]
+        self.player_velocities = [
+            [int(v) for v in self.rng.choice([-speed, speed], size=2)] for _ in range(players)
+        ]
+        self.player_boxes = []
+
+    def _random_box(self):
+        size = self.object_size
+        x = int(self.rng.integers(0, max(1, self.width - size)))
+        y = int(self.rng.integers(0, max(1, self.height - size)))
+        return (x, y, size, size)
+
+    def _move_players(self):
+        size = self.object_size
+        for position, velocity in zip(self.player_positions, self.player_velocities):
+            for axis, limit in ((0, self.width - size), (1, self.height - size)):
+                position[axis] += velocity[axis]
+                if position[axis] < 0 or position[axis] > limit:
+                    velocity[axis] = -velocity[axis]
+                    position[axis] = min(max(position[axis], 0), max(limit, 0))
+
+    def read(self):
+        if self.exhausted:
+            return None
+        if self.frames is not None and self.frames_read >= self.frames:
+            self.exhausted = True
+            return None
+
+        frame = self.ring.next()
+        if self.noise:
+            noise = self.rng.integers(-self.noise, self.noise + 1, size=frame.shape, dtype=np.int16)
+            np.copyto(frame, np.clip(self.background.astype(np.int16) + noise, 0, 255), casting="unsafe")
+        else:
+            np.copyto(frame, self.background)
+
+        if self.frames_read:
+            self._move_players()
+        size = self.object_size
+        self.player_boxes = [(x, y, size, size) for x, y in self.player_positions]
+        for x, y, w, h in self.player_boxes:
+            cv2.rectangle(frame, (x, y), (x + w - 1, y + h - 1), self.player_color, -1)
+
+        self.timestamp = self.frames_read / self.fps
+        self.frames_read += 1
+        return frame
+
+    def describe(self):
+        total = "бесконечно" if self.frames is None else self.frames
+        return (f"синтетический генератор {self.width}x{self.height}, кадров: {total}, "
+                f"персонажей: {len(self.player_positions)}, целей: {len(self.target_boxes)}, "
+                f"ловушек: {len(self.trap_boxes)}")
@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import pyautogui
 import time
 import logging
 import os
@@ -8,7 +7,40 @@ from PIL import Image, ImageDraw, ImageFont, ImageGrab
 import threading
 import logging
 import json
-import msvcrt  # Для обработки нажатий клавиш в Windows
+import argparse
+
+from frame_source import (FrameSource, ScreenFrameSource, VideoFrameSource,
+                          ImageFolderFrameSource, SyntheticFrameSource, PYAUTOGUI_AVAILABLE)
+from pipeline import DetectionPipeline
+from frame_scheduler import FrameScheduler
+from color_lut import HSVClassifier, QuantizedRGBClassifier
+from blobs import BlobExtractor
+from trap_index import TrapIndex
+from detection_result import DetectionResult
+from frame_fingerprint import FrameFingerprint
+from tile_detection import IncrementalScanner
+from multi_window import MultiWindowDetector
+from process_pool import ProcessDetectionPool
+from renderer import DetectionRenderer
+from stage_timers import StageTimers
+from async_logging import ChangeLog, setup_logging
+from detection_recorder import DetectionRecorder
+from motion_tracker import KalmanTracker
+from trap_tracker import TrapTracker
+from object_classes import ClassRegistry, default_classes, find_class_blobs
+from event_bus import (EventBus, EventFileWriter, DetectionEvent,
+                       TRAP_ENTERED, TRAP_EXITED, TARGET_REACHED, TARGET_LEFT, TRAPS_CHANGED)
+
+# pyautogui и msvcrt нужны только для работы с живым экраном в Windows;
+# без них детектор может обрабатывать записанные сессии (например, на Linux без дисплея)
+if PYAUTOGUI_AVAILABLE:
+    import pyautogui
+
+try:
+    import msvcrt  # Для обработки нажатий клавиш в Windows
+    MSVCRT_AVAILABLE = True
+except ImportError:
+    MSVCRT_AVAILABLE = False
 
 # Попытка импорта win32 модулей с обработкой исключений
 try:
@@ -44,25 +76,67 @@ except ImportError:
             if self.is_showing:
                 self.is_showing = False
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='game_detector.log',
-    filemode='w'
-)
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console.setFormatter(formatter)
-logging.getLogger('').addHandler(console)
-
 # Путь к исполняемому файлу Tesseract OCR (если используется)
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+def class_range_property(name, bound):
+    """Граница первого диапазона класса как атрибут детектора (player_color_lower и т.п.)"""
+    index = 0 if bound == "lower" else 1
+
+    def getter(self):
+        return self.object_classes.get(name).ranges[0][index]
+
+    def setter(self, value):
+        ranges = self.object_classes.get(name).ranges
+        bounds = list(ranges[0])
+        bounds[index] = np.array(value)
+        ranges[0] = tuple(bounds)
+
+    return property(getter, setter)
+
+
 class GameDetector:
-    def __init__(self):
-        """Инициализация детектора"""
+    # Настройки обнаружения, которые переносит copy_settings_from
+    SETTINGS = (
+        "object_classes",
+        "color_engine", "rgb_lut_bits", "min_blob_area", "target_reach_radius",
+        "tracking_enabled", "tracking_padding", "full_scan_interval",
+        "motion_model", "max_coast_frames",
+        "pyramid_level", "pyramid_refine", "pyramid_candidates",
+        "incremental", "tile_size", "skip_unchanged", "show_visualization",
+    )
+    # Настройки из SETTINGS, от которых результат кадра не зависит
+    DISPLAY_SETTINGS = ("skip_unchanged", "show_visualization")
+
+    # Диапазоны персонажа, цели и ловушек хранятся в реестре классов (object_classes.py)
+    player_color_lower = class_range_property("player", "lower")
+    player_color_upper = class_range_property("player", "upper")
+    target_color_lower = class_range_property("target", "lower")
+    target_color_upper = class_range_property("target", "upper")
+    trap_color_lower = class_range_property("trap", "lower")
+    trap_color_upper = class_range_property("trap", "upper")
+
+    def __init__(self, frame_source=None):
+        """
+        Инициализация детектора
+
+        Args:
+            frame_source (FrameSource): Источник кадров (по умолчанию - захват экрана)
+        """
+        # Источник кадров: живой экран, видеофайл, папка с кадрами или генератор
+        self.frame_source = frame_source if frame_source is not None else ScreenFrameSource()
+        # Захват может вызываться и из потока конвейера, и из калибровки
+        self.capture_lock = threading.Lock()
+        
+        # Режим конвейера: захват, обнаружение и отображение в отдельных потоках
+        self.pipelined = False
+        # Число процессов-обработчиков с передачей кадров через разделяемую память
+        # (0 - обнаружение в главном процессе)
+        self.processes = 0
+        
+        # Целевой FPS (0 - как можно быстрее; None - 30 для экрана, без ограничения для записей)
+        self.target_fps = None
+        
         # Настройка окна и региона
         self.window_title = "BlueStacks"
         self.window_handle = None  # Хендл окна
@@ -75,9 +149,6 @@ class GameDetector:
         self.show_window_list = False
         self.window_list_last_update = 0
         
-        # Загрузка конфигурации цветов
-        self.load_color_config()
-        
         # Флаги состояния
         self.running = True
         self.notification = GameNotification(title="GameDetector")
@@ -85,23 +156,76 @@ class GameDetector:
         # Настройка экземпляра для выбора цветов
         self.color_picker = None
         
-        # Цветовые диапазоны для определения объектов
-        # Персонаж (фиолетовый)
-        self.player_color_lower = np.array([140, 50, 50])
-        self.player_color_upper = np.array([170, 255, 255])
+        # Классы объектов (значения по умолчанию): персонаж (фиолетовый), цель (зеленый)
+        # и ловушки (красный); дополнительные классы задаются в color_config.json
+        self.object_classes = default_classes()
+        # Найденные объекты дополнительных классов: имя -> рамки (N, 4)
+        self.extra_objects = {}
+        
+        # Загрузка конфигурации цветов поверх значений по умолчанию
+        self.load_color_config()
         
-        # Цель (зеленый)
-        self.target_color_lower = np.array([40, 50, 50])
-        self.target_color_upper = np.array([80, 255, 255])
+        # Классификатор пикселей: все диапазоны в одной таблице, один проход по кадру
+        self.classifier = HSVClassifier(self.color_ranges())
         
-        # Ловушка (красный)
-        self.trap_color_lower = np.array([0, 50, 50])
-        self.trap_color_upper = np.array([10, 255, 255])
+        # Способ разметки кадра: "hsv" - точный через cvtColor, "rgb" - по квантованной
+        # таблице прямо по значениям кадра (см. color_lut.py, отчет о точности)
+        self.color_engine = "hsv"
+        self.rgb_classifier = None
+        self.rgb_lut_bits = 5
+        
+        # Пятна на масках ищутся одним проходом connected components
+        self.blob_extractor = BlobExtractor()
         
         # Сохраняем последнее известное положение персонажа и цели
         self.player_position = None
         self.target_position = None
-        self.trap_areas = []
+        # Ловушки - массив рамок (N, 4) с векторными проверками столкновений
+        self.trap_areas = TrapIndex()
+        self.trap_hits = np.empty(0, dtype=np.intp)  # Индексы ловушек, в которых находится персонаж
+        # Ловушки сопоставляются между просмотрами: у каждой постоянный номер,
+        # а изменения набора публикуются в шину событий (TRAPS_CHANGED)
+        self.trap_tracker = TrapTracker()
+        self.trap_delta = None
+        
+        # Последние найденные рамки (x, y, w, h) - вокруг них ищет режим слежения
+        self.player_box = None
+        self.target_box = None
+        
+        # Режим слежения: поиск только в окрестности последних известных позиций,
+        # полный просмотр кадра - раз в full_scan_interval кадров или при потере объекта
+        self.tracking_enabled = False
+        self.tracking_padding = 80
+        self.full_scan_interval = 30
+        self.frames_since_full_scan = 0
+        self.tracking_stats = {"frames": 0, "full_scans": 0, "lost": 0, "coasted": 0,
+                               "pixels_scanned": 0, "pixels_total": 0}
+        
+        # Модель движения персонажа: область слежения строится вокруг предсказанной
+        # позиции, а если персонаж не найден, до max_coast_frames кадров подряд
+        # выдается предсказанная позиция (см. motion_tracker.py)
+        self.motion_model = False
+        self.max_coast_frames = 5
+        self.player_tracker = KalmanTracker()
+        self.player_predicted = False   # Рамка персонажа на этом кадре предсказана, а не найдена
+        self.player_size = (0, 0)       # Размер последней найденной рамки персонажа
+        self.frame_time = 0.0
+        self.frame_clock = 0.0
+        
+        # Пороги обнаружения в пикселях полного разрешения
+        self.min_blob_area = 100        # Минимальная площадь объекта
+        self.target_reach_radius = 50   # Радиус достижения цели
+        
+        # Пирамида: кандидаты ищутся на уменьшенном в 2^pyramid_level раз кадре
+        # и уточняются в полном разрешении (0 - поиск сразу в полном разрешении)
+        self.pyramid_level = 0
+        self.pyramid_refine = True
+        self.pyramid_candidates = 3  # Сколько крупнейших кандидатов уточнять для персонажа и цели
+        
+        # Инкрементальный просмотр: разметка и пятна пересчитываются только в изменившихся плитках
+        self.incremental = False
+        self.tile_size = 64
+        self.incremental_scanner = None
         
         # Для отслеживания столкновений
         self.is_in_trap = False
@@ -109,6 +233,16 @@ class GameDetector:
         # Время последнего уведомления для предотвращения спама
         self.last_notification_time = 0
         
+        # Переходы состояния публикуются в шину событий без ожидания; уведомления
+        # и журнал - подписчики со своими потоками, поэтому медленное уведомление
+        # не задерживает обработку кадров
+        self.events = EventBus()
+        self.events.subscribe(self.notify_event, name="notifications", kinds=(TRAP_ENTERED, TARGET_REACHED))
+        self.events.subscribe(self.log_event, name="log")
+        
+        # Двоичная запись результатов по кадрам (DetectionRecorder или None)
+        self.recorder = None
+        
         # Флаг для выполнения только при достижении цели
         self.target_reached = False
         
@@ -117,6 +251,109 @@ class GameDetector:
         
         # Флаг для отслеживания открытого окна визуализации
         self.vis_window_open = False
+        
+        # Рисование отделено от обнаружения и выполняется только при включенной визуализации
+        self.renderer = DetectionRenderer(self)
+        self.frames_detected = 0
+        
+        # Замеры времени стадий (выключены по умолчанию и тогда почти ничего не стоят)
+        self.stage_timers = StageTimers()
+        
+        # Позиции и число ловушек пишутся в журнал только при заметном изменении, а не каждый кадр
+        self.change_log = ChangeLog(threshold=5)
+        
+        # Пропуск обнаружения на неизменившихся кадрах (меню, паузы, загрузка)
+        self.skip_unchanged = False
+        self.fingerprint = FrameFingerprint()
+        self.last_result = None
+
+    def settings(self):
+        """Настройки обнаружения (цвета и режимы) в виде словаря копий"""
+        settings = {}
+        for name in self.SETTINGS:
+            value = getattr(self, name)
+            settings[name] = value.copy() if isinstance(value, (np.ndarray, ClassRegistry)) else value
+        return settings
+
+    def apply_settings(self, settings):
+        """Применить настройки, полученные из settings() другого детектора"""
+        for name, value in settings.items():
+            setattr(self, name, value.copy() if isinstance(value, (np.ndarray, ClassRegistry)) else value)
+
+    def copy_settings_from(self, other):
+        """Перенести настройки обнаружения (цвета и режимы) из другого детектора"""
+        self.apply_settings(other.settings())
+        self.fingerprint.tolerance = other.fingerprint.tolerance
+        self.renderer.show_masks = other.renderer.show_masks
+        self.change_log.threshold = other.change_log.threshold
+        self.change_log.enabled = other.change_log.enabled
+
+    def color_ranges(self):
+        """Текущие цветовые диапазоны всех классов в порядке битов классификатора"""
+        return self.object_classes.color_ranges()
+
+    def detection_settings_key(self):
+        """Настройки, от которых зависит результат кадра (ключ повторного использования результата)"""
+        return tuple(self.object_classes.signature() if name == "object_classes" else getattr(self, name)
+                     for name in self.SETTINGS if name not in self.DISPLAY_SETTINGS)
+
+    def class_min_area(self, name):
+        """Минимальная площадь пятна класса (своя у класса или общий порог min_blob_area)"""
+        min_area = self.object_classes.get(name).min_area
+        return self.min_blob_area if min_area is None else min_area
+
+    def find_extra_objects(self, labels, scale=1):
+        """
+        Найти объекты дополнительных классов по разметке кадра (одна разметка связных областей на все классы)
+
+        Args:
+            labels (numpy.ndarray): Разметка кадра
+            scale (int): Во сколько раз кадр разметки меньше исходного (пирамида)
+        """
+        classes = self.object_classes.extra()
+        if not classes:
+            self.extra_objects = {}
+            return
+        start = self.stage_timers.clock()
+        objects = find_class_blobs(labels, self.classifier, classes, self.blob_extractor,
+                                   self.min_blob_area, area_scale=scale * scale)
+        self.stage_timers.record("blobs", start)
+        if scale > 1:
+            objects = {name: boxes * scale for name, boxes in objects.items()}
+        self.extra_objects = objects
+
+    def classify_frame(self, hsv):
+        """
+        Разметить пиксели кадра HSV всеми классами за один проход
+        
+        Таблица классификатора перестраивается, только если диапазоны изменились
+        (загрузка конфигурации, калибровка, инструмент выбора цветов).
+        """
+        if self.classifier.update(self.color_ranges()):
+            logging.info("Таблица классификатора цветов перестроена")
+        return self.classifier.classify(hsv)
+
+    def label_frame(self, frame):
+        """Разметить пиксели кадра выбранным способом (HSV или квантованная RGB-таблица)"""
+        if self.color_engine == "rgb":
+            if self.rgb_classifier is None or self.rgb_classifier.bits != self.rgb_lut_bits:
+                self.rgb_classifier = QuantizedRGBClassifier(self.classifier, self.rgb_lut_bits)
+            # Сначала синхронизируем точные таблицы, квантованная перестроится по ним
+            self.classifier.update(self.color_ranges())
+            if self.rgb_classifier.update():
+                logging.info(f"Квантованная таблица цветов перестроена ({self.rgb_lut_bits} бит/канал)")
+            start = self.stage_timers.clock()
+            labels = self.rgb_classifier.classify(frame)
+            self.stage_timers.record("classify", start)
+            return labels
+        
+        # Конвертируем изображение в HSV для лучшего выделения цветов
+        start = self.stage_timers.clock()
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        start = self.stage_timers.record("color", start)
+        labels = self.classify_frame(hsv)
+        self.stage_timers.record("classify", start)
+        return labels
 
     def find_window(self):
         """Поиск окна эмулятора по заголовку"""
@@ -229,178 +466,558 @@ class GameDetector:
             return True
 
     def capture_screen(self):
-        """Захват экрана в области окна игры"""
+        """Получить следующий кадр из источника (для экрана - область окна игры)"""
         try:
-            if not self.game_region:
-                logging.error("Не удалось захватить экран: регион не определен")
-                return None
-            
-            # Захват области экрана
-            screenshot = pyautogui.screenshot(region=self.game_region)
-            return np.array(screenshot)
+            with self.capture_lock:
+                if self.frame_source.is_live:
+                    if not self.game_region:
+                        logging.error("Не удалось захватить экран: регион не определен")
+                        return None
+                    # Буферы захвата пересоздаются, только если find_window/switch_window
+                    # изменили размер региона
+                    self.frame_source.set_region(self.game_region)
+                
+                start = self.stage_timers.clock()
+                frame = self.frame_source.read()
+                self.stage_timers.record("capture", start)
+                return frame
         except Exception as e:
             logging.error(f"Ошибка при захвате экрана: {e}")
             print(f"Ошибка при захвате экрана: {e}")
             return None
     
-    def detect_objects(self, frame):
-        """Обнаружить персонажа, цель и ловушки на кадре"""
+    def detect(self, frame, timestamp=None):
+        """
+        Обнаружить персонажа, цель и ловушки на кадре (без рисования)
+        
+        Args:
+            frame (numpy.ndarray): Кадр из источника
+            timestamp (float | None): Время кадра на шкале источника (FrameSource.timestamp);
+                                      None - момент обнаружения
+            
+        Returns:
+            DetectionResult | None: Результат обнаружения или None, если кадра нет
+        """
         if frame is None:
             return None
         
-        # Создаем копию кадра для визуализации
-        visualization = frame.copy()
+        start_time = time.perf_counter()
+        frame_index = self.frames_detected
+        self.frames_detected += 1
+        self.set_frame_time(timestamp, start_time)
+        self.trap_delta = None
         
-        # Конвертируем изображение в HSV для лучшего выделения цветов
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        # Неизменившийся кадр не обрабатываем, а повторяем последний результат
+        fingerprint = None
+        if self.skip_unchanged:
+            # Смена любой настройки обнаружения делает старый результат недействительным
+            settings = self.detection_settings_key()
+            unchanged, fingerprint = self.fingerprint.is_unchanged(frame, settings)
+            if unchanged and self.last_result is not None:
+                result = self.last_result.reuse(frame_index)
+                result.timings["detect_ms"] = 1000.0 * (time.perf_counter() - start_time)
+                if self.recorder is not None:
+                    self.recorder.append(result, timestamp)
+                return result
         
-        # Обнаружение персонажа (фиолетовый цвет)
-        player_mask = cv2.inRange(hsv, self.player_color_lower, self.player_color_upper)
-        player_contours, _ = cv2.findContours(player_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        result = DetectionResult(frame_index, frame.shape)
         
-        # Обнаружение цели (зеленый цвет)
-        target_mask = cv2.inRange(hsv, self.target_color_lower, self.target_color_upper)
-        target_contours, _ = cv2.findContours(target_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # В режиме слежения ищем объекты только рядом с их последними позициями
+        masks = None
+        full_scan = self.needs_full_scan()
+        if not full_scan:
+            full_scan = not self.track_objects(frame)
         
-        # Обнаружение ловушек (красный цвет)
-        trap_mask = cv2.inRange(hsv, self.trap_color_lower, self.trap_color_upper)
-        trap_contours, _ = cv2.findContours(trap_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if full_scan:
+            if self.incremental:
+                masks = self.scan_incremental(frame)
+            elif self.pyramid_level > 0:
+                masks = self.scan_pyramid(frame)
+            else:
+                masks = self.scan_full_frame(frame)
+            
+            self.frames_since_full_scan = 0
+            self.tracking_stats["full_scans"] += 1
+            self.tracking_stats["pixels_scanned"] += frame.shape[0] * frame.shape[1]
+        else:
+            self.frames_since_full_scan += 1
+        self.tracking_stats["frames"] += 1
+        self.tracking_stats["pixels_total"] += frame.shape[0] * frame.shape[1]
+        scan_time = time.perf_counter()
+        collision_start = self.stage_timers.clock()
+        
+        self.player_predicted = False
+        if self.motion_model:
+            self.update_player_motion()
         
         # Обработка персонажа
-        if player_contours:
-            # Находим самый большой контур (предполагаем, что это персонаж)
-            player_contour = max(player_contours, key=cv2.contourArea)
-            player_area = cv2.contourArea(player_contour)
-            
-            if player_area > 100:  # Минимальная площадь для обнаружения
-                x, y, w, h = cv2.boundingRect(player_contour)
-                self.player_position = (x + w//2, y + h//2)  # Центр персонажа
-                cv2.rectangle(visualization, (x, y), (x + w, y + h), (255, 0, 255), 2)
-                cv2.putText(visualization, "Player", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 2)
+        if self.player_box:
+            x, y, w, h = self.player_box
+            self.player_position = (x + w//2, y + h//2)  # Центр персонажа
+            if self.change_log.moved("player", self.player_position):
                 logging.info(f"Персонаж обнаружен на позиции: {self.player_position}")
             
         # Обработка цели
-        if target_contours:
-            # Находим самый большой контур (предполагаем, что это цель)
-            target_contour = max(target_contours, key=cv2.contourArea)
-            target_area = cv2.contourArea(target_contour)
-            
-            if target_area > 100:  # Минимальная площадь для обнаружения
-                x, y, w, h = cv2.boundingRect(target_contour)
-                self.target_position = (x + w//2, y + h//2)  # Центр цели
-                cv2.rectangle(visualization, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(visualization, "Target", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        if self.target_box:
+            x, y, w, h = self.target_box
+            self.target_position = (x + w//2, y + h//2)  # Центр цели
+            if self.change_log.moved("target", self.target_position):
                 logging.info(f"Цель обнаружена на позиции: {self.target_position}")
-                
-                # Проверка достижения цели
-                self.check_target_reached()
-        
-        # Обработка ловушек
-        self.trap_areas = []
-        for contour in trap_contours:
-            area = cv2.contourArea(contour)
-            if area > 100:  # Минимальная площадь для обнаружения
-                x, y, w, h = cv2.boundingRect(contour)
-                self.trap_areas.append((x, y, w, h))
-                cv2.rectangle(visualization, (x, y), (x + w, y + h), (0, 0, 255), 2)
-                cv2.putText(visualization, "Trap", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-        
-        if self.trap_areas:
+            
+            # Проверка достижения цели
+            self.check_target_reached()
+        
+        # Между полными просмотрами используются ловушки последнего просмотра
+        if self.trap_areas and self.change_log.changed("traps", len(self.trap_areas)):
             logging.info(f"Обнаружено ловушек: {len(self.trap_areas)}")
         
         # Проверяем, находится ли персонаж в ловушке
         self.check_trap_collision()
+        self.stage_timers.record("collision", collision_start)
         
-        # Добавим дополнительную информацию на экран
-        info_text = f"Игрок: {self.player_position}, Цель: {self.target_position}, Ловушек: {len(self.trap_areas)}"
-        cv2.putText(visualization, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        result.player_box = self.player_box
+        result.target_box = self.target_box
+        result.player_position = self.player_position
+        result.target_position = self.target_position
+        result.trap_boxes = self.trap_areas.boxes
+        result.trap_ids = self.trap_tracker.detected_ids
+        result.trap_delta = self.trap_delta
+        result.trap_hits = self.trap_hits
+        result.objects = self.extra_objects
+        result.is_in_trap = self.is_in_trap
+        result.target_reached = self.target_reached
+        result.full_scan = full_scan
+        self.fill_motion(result)
+        # Маски всего кадра есть только после полного просмотра и нужны только отладочной визуализации
+        if masks is not None and self.show_visualization and self.renderer.wants_masks():
+            result.masks = masks
         
-        if self.is_in_trap:
-            warning_text = "ВНИМАНИЕ: ИГРОК В ЛОВУШКЕ!"
-            cv2.putText(visualization, warning_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        if fingerprint is not None:
+            self.fingerprint.remember(frame, fingerprint, settings)
+        self.last_result = result
         
-        if self.target_reached:
-            success_text = "ЦЕЛЬ ДОСТИГНУТА!"
-            cv2.putText(visualization, success_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        end_time = time.perf_counter()
+        result.timings["scan_ms"] = 1000.0 * (scan_time - start_time)
+        result.timings["detect_ms"] = 1000.0 * (end_time - start_time)
+        self.stage_timers.add("detect", end_time - start_time)
+        if self.recorder is not None:
+            self.recorder.append(result, timestamp)
+        return result
+
+    def apply_result(self, result, timestamp=None):
+        """
+        Принять результат, найденный другим детектором (например, в процессе-обработчике)
+
+        Позиции, ловушки и флаги столкновений обновляются в этом детекторе
+        в порядке кадров, поэтому уведомления о входе в ловушку и достижении
+        цели срабатывают так же, как при обнаружении на месте.
+
+        Args:
+            result (DetectionResult): Результат обнаружения кадра
+            timestamp (float | None): Время кадра на шкале источника (None - момент приема результата)
+
+        Returns:
+            DetectionResult: Тот же результат с позициями и флагами этого детектора
+        """
+        result.frame_index = self.frames_detected
+        self.frames_detected += 1
+        self.set_frame_time(timestamp, time.perf_counter())
+        self.player_box = result.player_box
+        self.target_box = result.target_box
+        # Модель движения хранит состояние между кадрами, поэтому ведется в этом детекторе
+        self.player_predicted = False
+        if self.motion_model:
+            self.update_player_motion()
+        result.player_box = self.player_box
+        if self.player_box:
+            x, y, w, h = self.player_box
+            self.player_position = (x + w//2, y + h//2)
+        if self.target_box:
+            x, y, w, h = self.target_box
+            self.target_position = (x + w//2, y + h//2)
+            self.check_target_reached()
+        self.trap_delta = None
+        self.update_traps(result.trap_boxes)
+        self.extra_objects = result.objects
+        self.check_trap_collision()
+
+        result.player_position = self.player_position
+        result.target_position = self.target_position
+        result.trap_boxes = self.trap_areas.boxes
+        result.trap_ids = self.trap_tracker.detected_ids
+        result.trap_delta = self.trap_delta
+        result.trap_hits = self.trap_hits
+        result.is_in_trap = self.is_in_trap
+        result.target_reached = self.target_reached
+        self.fill_motion(result)
+        self.last_result = result
+        if self.recorder is not None:
+            self.recorder.append(result, timestamp)
+        return result
+
+    def render(self, frame, result, draw_in_place=False):
+        """
+        Нарисовать визуализацию результата обнаружения (см. DetectionRenderer.render)
         
-        # Отобразить текущее окно
-        window_title = f"Окно: {self.window_title}"
-        cv2.putText(visualization, window_title, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        Returns:
+            numpy.ndarray | None: Кадр визуализации или None, если результата нет
+        """
+        if frame is None or result is None:
+            return None
+        start = self.stage_timers.clock()
+        visualization = self.renderer.render(frame, result, draw_in_place)
+        self.stage_timers.record("render", start)
+        return visualization
+
+    def detect_objects(self, frame, draw_in_place=False):
+        """
+        Обнаружить объекты и нарисовать визуализацию
         
-        # Отобразить маски и контуры если нужна дополнительная отладка
-        if self.show_visualization:
-            # Создадим объединенное изображение масок для отображения
-            combined_mask = cv2.merge([trap_mask, target_mask, player_mask])
-            
-            # Изменим размер для лучшего отображения
-            vis_height, vis_width = visualization.shape[:2]
-            mask_resized = cv2.resize(combined_mask, (vis_width // 3, vis_height // 3))
+        Args:
+            frame (numpy.ndarray): Кадр из источника
+            draw_in_place (bool): Рисовать визуализацию прямо на кадре, без копирования
             
-            # Вставим маску в правый нижний угол основного изображения
-            roi = visualization[vis_height - mask_resized.shape[0]:vis_height, 
-                                vis_width - mask_resized.shape[1]:vis_width]
-            
-            # Наложение масок в углу (опционально)
-            # visualization[vis_height - mask_resized.shape[0]:vis_height, 
-            #               vis_width - mask_resized.shape[1]:vis_width] = mask_resized
+        Returns:
+            numpy.ndarray | None: Кадр визуализации
+        """
+        return self.render(frame, self.detect(frame), draw_in_place)
+    
+    def scan_full_frame(self, frame):
+        """
+        Полный просмотр кадра в исходном разрешении
+        
+        Returns:
+            tuple: Маски (ловушки, цель, персонаж) для отладочной визуализации
+        """
+        # Один проход по кадру размечает пиксели всех классов
+        labels = self.label_frame(frame)
+        
+        # Обнаружение персонажа (фиолетовый цвет), цели (зеленый цвет) и ловушек (красный цвет)
+        player_mask = self.classifier.mask(labels, "player")
+        target_mask = self.classifier.mask(labels, "target")
+        trap_mask = self.classifier.mask(labels, "trap")
+        
+        # Самые большие пятна считаем персонажем и целью
+        self.player_box = self.find_largest_blob(player_mask, self.class_min_area("player"))
+        self.target_box = self.find_largest_blob(target_mask, self.class_min_area("target"))
+        self.update_traps(self.find_blob_stats(trap_mask, self.class_min_area("trap"))[1])
+        self.find_extra_objects(labels)
+        return (trap_mask, target_mask, player_mask)
+
+    def scan_incremental(self, frame):
+        """
+        Полный просмотр кадра с пересчетом только изменившихся плиток
+        
+        Результат совпадает с scan_full_frame, но разметка и поиск пятен
+        выполняются только там, где кадр изменился (см. tile_detection.py).
+        
+        Returns:
+            tuple | None: Маски (ловушки, цель, персонаж), если их просит отладочная визуализация
+        """
+        scanner = self.incremental_scanner
+        if scanner is None or scanner.tile_size != self.tile_size:
+            scanner = IncrementalScanner(self.label_frame, self.classifier, self.blob_extractor, self.tile_size)
+            self.incremental_scanner = scanner
+        
+        # Смена цветов или способа разметки требует разметить кадр заново
+        settings = (HSVClassifier.make_signature(self.color_ranges()), self.color_engine, self.rgb_lut_bits)
+        blobs = scanner.scan(frame, ("player", "target", "trap"), settings)
+        
+        # Отбор по площади - тот же, что и при просмотре всего кадра
+        for name in ("player", "target"):
+            areas, boxes = blobs[name]
+            keep = areas > self.class_min_area(name)
+            setattr(self, f"{name}_box", self.blob_extractor.largest_box(areas[keep], boxes[keep]))
+        areas, boxes = blobs["trap"]
+        self.update_traps(boxes[areas > self.class_min_area("trap")])
+        self.find_extra_objects(scanner.labels)
+        
+        if self.show_visualization and self.renderer.wants_masks():
+            return tuple(self.classifier.mask(scanner.labels, name) for name in ("trap", "target", "player"))
+        return None
+
+    def scan_pyramid(self, frame):
+        """
+        Полный просмотр кадра от грубого к точному
+        
+        Кандидаты ищутся на кадре, уменьшенном в 2^pyramid_level раз, а затем
+        (если включен pyramid_refine) уточняются в полном разрешении только
+        в своих окрестностях. Порог площади на грубом уровне уменьшается
+        пропорционально площади кадра.
+        
+        Returns:
+            tuple: Маски грубого уровня (ловушки, цель, персонаж) для отладочной визуализации
+        """
+        scale = 1 << self.pyramid_level
+        frame_height, frame_width = frame.shape[:2]
+        
+        # Ближайший сосед не смешивает цвета на границах объектов, поэтому классы не искажаются
+        small = cv2.resize(frame, (max(1, frame_width // scale), max(1, frame_height // scale)),
+                           interpolation=cv2.INTER_NEAREST)
+        labels = self.label_frame(small)
+        masks = {name: self.classifier.mask(labels, name) for name in ("player", "target", "trap")}
+        
+        # Порог площади пересчитывается на грубый уровень с запасом в 2 раза,
+        # окончательная проверка - в полном разрешении
+        for name in ("player", "target"):
+            coarse_area = self.class_min_area(name) / (scale * scale) / 2
+            areas, boxes = self.find_blob_stats(masks[name], coarse_area)
+            best = None
+            for index in np.argsort(-areas)[:self.pyramid_candidates]:
+                for area, box in self.refine_candidate(frame, name, boxes[index], scale):
+                    if best is None or area > best[0]:
+                        best = (area, box)
+            setattr(self, f"{name}_box", best[1] if best else None)
+        
+        traps = set()
+        coarse_area = self.class_min_area("trap") / (scale * scale) / 2
+        for coarse_box in self.find_blob_stats(masks["trap"], coarse_area)[1]:
+            traps.update(box for _, box in self.refine_candidate(frame, "trap", coarse_box, scale))
+        self.update_traps(sorted(traps))
+        # Дополнительные классы - только с грубого уровня, без уточнения
+        self.find_extra_objects(labels, scale)
+        
+        self.tracking_stats["pixels_scanned"] += small.shape[0] * small.shape[1]
+        return (masks["trap"], masks["target"], masks["player"])
+
+    def refine_candidate(self, frame, name, coarse_box, scale):
+        """
+        Уточнить кандидата с грубого уровня пирамиды в полном разрешении
+        
+        Returns:
+            list: Пары (площадь, рамка) в координатах полного кадра
+        """
+        x, y, w, h = (int(value) * scale for value in coarse_box)
+        if not self.pyramid_refine:
+            # Без уточнения рамка грубого уровня просто масштабируется
+            return [(w * h, (x, y, w, h))]
+        
+        # Прореживание могло пропустить до scale - 1 пикселей с каждой стороны
+        frame_height, frame_width = frame.shape[:2]
+        x0, y0 = max(0, x - scale), max(0, y - scale)
+        x1, y1 = min(frame_width, x + w + scale), min(frame_height, y + h + scale)
+        labels = self.label_frame(frame[y0:y1, x0:x1])
+        self.tracking_stats["pixels_scanned"] += (x1 - x0) * (y1 - y0)
+        
+        areas, boxes = self.find_blob_stats(self.classifier.mask(labels, name), self.class_min_area(name))
+        boxes[:, 0] += x0
+        boxes[:, 1] += y0
+        
+        # Соседние объекты, попавшие в окрестность краем, отбрасываем по положению центра
+        center_x = boxes[:, 0] + boxes[:, 2] // 2
+        center_y = boxes[:, 1] + boxes[:, 3] // 2
+        inside = ((center_x >= x - scale) & (center_x < x + w + scale) &
+                  (center_y >= y - scale) & (center_y < y + h + scale))
+        return list(zip(areas[inside].tolist(), map(tuple, boxes[inside].tolist())))
+
+    def find_blob_stats(self, mask, min_area=100):
+        """
+        Найти все пятна маски с площадью больше min_area
+        
+        Returns:
+            tuple: Массивы площадей (N,) и рамок (N, 4) как (x, y, w, h)
+        """
+        start = self.stage_timers.clock()
+        stats = self.blob_extractor.stats(mask, min_area)
+        self.stage_timers.record("blobs", start)
+        return stats
+
+    def find_largest_blob(self, mask, min_area=100):
+        """
+        Найти самое большое пятно маски
+        
+        Returns:
+            tuple | None: Рамка (x, y, w, h) или None, если пятна с площадью больше min_area нет
+        """
+        start = self.stage_timers.clock()
+        box = self.blob_extractor.largest(mask, min_area)
+        self.stage_timers.record("blobs", start)
+        return box
+
+    def needs_full_scan(self):
+        """Нужен ли на этом кадре полный просмотр вместо поиска вокруг последних позиций"""
+        if not self.tracking_enabled:
+            return True
+        if self.frames_since_full_scan >= self.full_scan_interval:
+            return True
+        return self.player_box is None and self.target_box is None
+
+    def padded_roi(self, box, frame_shape, padding=None):
+        """Область (x0, y0, x1, y1) вокруг рамки с отступом (по умолчанию tracking_padding) в пределах кадра"""
+        x, y, w, h = box
+        pad = self.tracking_padding if padding is None else padding
+        frame_height, frame_width = frame_shape[:2]
+        return (max(0, x - pad), max(0, y - pad),
+                min(frame_width, x + w + pad), min(frame_height, y + h + pad))
+
+    def track_objects(self, frame):
+        """
+        Найти персонажа и цель только в окрестностях их последних рамок
+        
+        Returns:
+            bool: False, если известный объект потерян и нужен полный просмотр кадра
+        """
+        for name in ("player", "target"):
+            box = getattr(self, f"{name}_box")
+            if box is None:
+                # Объект еще не найден - он появится после очередного полного просмотра
+                continue
             
-            # Добавим подсказки по управлению
-            controls_text = "ESC: выход | V: вкл/выкл визуализацию | C: калибровка | S: сохранить"
-            cv2.putText(visualization, controls_text, (10, vis_height - 40), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            padding = self.tracking_padding
+            if name == "player" and self.motion_model and self.player_tracker.initialized:
+                # Ищем вокруг предсказанной позиции; после пропусков область шире
+                box = self.predicted_player_box(self.frame_time)
+                padding *= 1 + self.player_tracker.missed
             
-            # Добавляем подсказку о переключении окон
-            window_controls_text = "W: следующее окно | Q: предыдущее окно | L: список окон"
-            cv2.putText(visualization, window_controls_text, (10, vis_height - 20), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            x0, y0, x1, y1 = self.padded_roi(box, frame.shape, padding)
+            found = None
+            # Предсказанная позиция может уйти за край кадра
+            if x1 > x0 and y1 > y0:
+                labels = self.label_frame(frame[y0:y1, x0:x1])
+                self.tracking_stats["pixels_scanned"] += (x1 - x0) * (y1 - y0)
+                found = self.find_largest_blob(self.classifier.mask(labels, name), self.class_min_area(name))
+            if found is None and name == "player" and self.can_coast():
+                # Персонажа заменит предсказание модели движения (update_player_motion)
+                self.player_box = None
+                continue
+            if found is None:
+                logging.info(f"Объект {name} потерян в области слежения, выполняется полный просмотр")
+                self.tracking_stats["lost"] += 1
+                return False
             
-            # Если включен режим отображения списка окон
-            if self.show_window_list:
-                # Создаем полупрозрачный фон для списка окон
-                overlay = visualization.copy()
-                cv2.rectangle(overlay, (0, 0), (400, len(self.available_windows) * 20 + 40), (0, 0, 0), -1)
-                alpha = 0.7  # Прозрачность
-                cv2.addWeighted(overlay, alpha, visualization, 1 - alpha, 0, visualization)
-                
-                # Заголовок списка
-                cv2.putText(visualization, "Доступные окна (Q/W для выбора):", (10, 20), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                
-                # Выводим список окон
-                for i, (_, title) in enumerate(self.available_windows):
-                    # Укорачиваем слишком длинные заголовки
-                    display_title = title[:40] + "..." if len(title) > 40 else title
-                    color = (0, 255, 0) if i == self.current_window_index else (200, 200, 200)
-                    cv2.putText(visualization, f"{i+1}. {display_title}", (10, 40 + i * 20), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-        
-        return visualization
-    
+            x, y, w, h = found
+            setattr(self, f"{name}_box", (x + x0, y + y0, w, h))
+        return True
+
+    def set_frame_time(self, timestamp, clock):
+        """
+        Запомнить время текущего кадра для модели движения
+
+        Скорость персонажа считается по времени кадров источника, поэтому
+        при обработке записи быстрее реального времени она остается верной.
+
+        Args:
+            timestamp (float | None): Время кадра на шкале источника (None - момент обнаружения)
+            clock (float): Момент обнаружения (time.perf_counter())
+        """
+        frame_time = clock if timestamp is None else timestamp
+        # Время пошло назад (видео по кругу): прежняя скорость к новому отрезку не относится
+        if frame_time < self.frame_time and self.player_tracker.initialized:
+            self.player_tracker.reset()
+        self.frame_time = frame_time
+        self.frame_clock = clock
+
+    def can_coast(self):
+        """Можно ли еще выдавать предсказанную позицию персонажа вместо найденной"""
+        tracker = self.player_tracker
+        return self.motion_model and tracker.initialized and tracker.missed < self.max_coast_frames
+
+    def predicted_player_box(self, timestamp):
+        """Последняя рамка персонажа, перенесенная в предсказанную на момент timestamp позицию"""
+        x, y, w, h = self.player_box
+        predicted = self.player_tracker.predict(timestamp)
+        return (int(round(predicted[0] - w / 2)), int(round(predicted[1] - h / 2)), w, h)
+
+    def update_player_motion(self):
+        """
+        Учесть найденную рамку персонажа в модели движения
+
+        Если персонаж на кадре не найден, но модель еще может его вести,
+        рамка персонажа заменяется предсказанной (player_predicted).
+        """
+        tracker = self.player_tracker
+        if self.player_box is not None:
+            x, y, w, h = self.player_box
+            tracker.update(self.frame_time, (x + w / 2, y + h / 2))
+            self.player_size = (w, h)
+        elif self.can_coast():
+            x, y = tracker.coast(self.frame_time)
+            w, h = self.player_size
+            self.player_box = (int(round(x - w / 2)), int(round(y - h / 2)), w, h)
+            self.player_predicted = True
+            self.tracking_stats["coasted"] += 1
+        elif tracker.initialized:
+            tracker.reset()
+
+    def fill_motion(self, result):
+        """Записать в результат скорость персонажа и признак предсказанной позиции"""
+        result.player_predicted = self.player_predicted
+        if self.motion_model and self.player_tracker.initialized:
+            result.player_velocity = self.player_tracker.velocity
+
+    def predicted_player_position(self, timestamp=None):
+        """
+        Позиция персонажа на момент timestamp (по умолчанию - сейчас)
+
+        С моделью движения позиция интерполируется между обнаружениями,
+        поэтому ее можно запрашивать с частотой отображения, даже если
+        обнаружение выполняется реже (см. DetectionRenderer.draw_objects).
+
+        Args:
+            timestamp (float | None): Время на шкале кадров источника; None - текущий момент,
+                                      то есть время последнего кадра плюс прошедшее с его обнаружения
+
+        Returns:
+            tuple | None: Центр (x, y)
+        """
+        if not (self.motion_model and self.player_tracker.initialized):
+            return self.player_position
+        if timestamp is None:
+            timestamp = self.frame_time + (time.perf_counter() - self.frame_clock)
+        x, y = self.player_tracker.predict(timestamp)
+        return (int(round(x)), int(round(y)))
+
+    def tracking_summary(self):
+        """Статистика режима слежения одной строкой"""
+        stats = self.tracking_stats
+        frames = max(1, stats["frames"])
+        share = stats["pixels_scanned"] / stats["pixels_total"] if stats["pixels_total"] else 1.0
+        return (f"полных просмотров: {stats['full_scans']} из {stats['frames']} кадров, "
+                f"потерь объекта: {stats['lost']}, кадров по модели движения: {stats['coasted']}, "
+                f"просмотрено пикселей: {100 * share:.1f}% (в среднем {stats['pixels_scanned'] / frames:.0f} на кадр)")
+
     def check_trap_collision(self):
-        """Проверить, находится ли персонаж в ловушке"""
+        """
+        Проверить, находится ли персонаж в ловушке
+        
+        Returns:
+            numpy.ndarray: Индексы ловушек из trap_areas, в которых находится персонаж
+        """
         if not self.player_position:
-            return
+            return self.trap_hits
         
         player_x, player_y = self.player_position
         was_in_trap = self.is_in_trap
-        self.is_in_trap = False
+        self.trap_hits = self.trap_areas.hits_point(player_x, player_y)
+        self.is_in_trap = len(self.trap_hits) > 0
         
-        for trap_x, trap_y, trap_w, trap_h in self.trap_areas:
-            if (trap_x <= player_x <= trap_x + trap_w and 
-                trap_y <= player_y <= trap_y + trap_h):
-                self.is_in_trap = True
-                if not was_in_trap:  # Чтобы выводить сообщение только при входе в ловушку
-                    logging.warning("ИГРА ОКОНЧЕНА: Персонаж попал в ловушку!")
-                    
-                    # Проверяем, не слишком ли часто отправляем уведомления
-                    current_time = time.time()
-                    if current_time - self.last_notification_time > 5.0:  # Минимум 5 секунд между уведомлениями
-                        self.notification.show("ИГРА ОКОНЧЕНА!\nВы попали в ловушку!")
-                        self.last_notification_time = current_time
-                break
+        if self.is_in_trap and not was_in_trap:  # Событие только при входе в ловушку
+            self.trap_tracker.record_entry(self.trap_hits)
+            self.events.publish(DetectionEvent(TRAP_ENTERED, self.frames_detected - 1, self.player_position,
+                                               traps=tuple(self.trap_areas[i] for i in self.trap_hits)))
         
         if was_in_trap and not self.is_in_trap:
-            logging.info("Персонаж вышел из ловушки.")
+            self.events.publish(DetectionEvent(TRAP_EXITED, self.frames_detected - 1, self.player_position))
+        return self.trap_hits
+
+    def update_traps(self, boxes):
+        """
+        Обновить ловушки по рамкам, найденным при просмотре кадра
+
+        Ловушками кадра (столкновения, результат) остаются найденные рамки;
+        индекс ловушек перестраивается, только если они изменились. Рамки
+        сопоставляются с известными ловушками (trap_tracker.py) ради
+        постоянных номеров, а изменения публикуются, только если набор
+        ловушек изменился.
+        """
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        if not np.array_equal(boxes, self.trap_areas.boxes):
+            self.trap_areas.update(boxes)
+        delta = self.trap_tracker.update(boxes, self.frames_detected - 1)
+        if not delta:
+            return
+        self.trap_delta = delta
+        self.events.publish(DetectionEvent(TRAPS_CHANGED, delta.frame_index, self.player_position, delta=delta))
 
     def check_target_reached(self):
         """Проверить, достиг ли персонаж цели"""
@@ -414,70 +1031,82 @@ class GameDetector:
         distance = np.sqrt((player_x - target_x)**2 + (player_y - target_y)**2)
         
         # Определяем, достаточно ли близко персонаж к цели
-        if distance < 50 and not self.target_reached:  # Радиус 50 пикселей
-            logging.info("Персонаж достиг цели!")
+        if distance < self.target_reach_radius and not self.target_reached:
             self.target_reached = True
-            
-            # Показываем уведомление о достижении цели
-            current_time = time.time()
-            if current_time - self.last_notification_time > 5.0:
-                self.notification.show("Поздравляем!\nВы достигли цели!", bg_color="#33CC33", fg_color="black")
-                self.last_notification_time = current_time
-        elif distance >= 50 and self.target_reached:
+            self.events.publish(DetectionEvent(TARGET_REACHED, self.frames_detected - 1,
+                                               self.player_position, self.target_position))
+        elif distance >= self.target_reach_radius and self.target_reached:
             # Сбрасываем флаг, если персонаж отошел от цели
             self.target_reached = False
+            self.events.publish(DetectionEvent(TARGET_LEFT, self.frames_detected - 1,
+                                               self.player_position, self.target_position))
+
+    def notify_event(self, event):
+        """Подписчик шины: уведомления о входе в ловушку и достижении цели (не чаще раза в 5 секунд)"""
+        current_time = time.time()
+        if current_time - self.last_notification_time <= 5.0:
+            return
+        self.last_notification_time = current_time
+        if event.kind == TRAP_ENTERED:
+            self.notification.show("ИГРА ОКОНЧЕНА!\nВы попали в ловушку!")
+        elif event.kind == TARGET_REACHED:
+            self.notification.show("Поздравляем!\nВы достигли цели!", bg_color="#33CC33", fg_color="black")
+
+    def log_event(self, event):
+        """Подписчик шины: запись переходов состояния в журнал"""
+        if event.kind == TRAP_ENTERED:
+            logging.warning(f"ИГРА ОКОНЧЕНА: Персонаж попал в ловушку! Ловушки: {list(event.traps)}")
+        elif event.kind == TRAP_EXITED:
+            logging.info("Персонаж вышел из ловушки.")
+        elif event.kind == TARGET_REACHED:
+            logging.info("Персонаж достиг цели!")
+        elif event.kind == TARGET_LEFT:
+            logging.info("Персонаж отошел от цели.")
+        elif event.kind == TRAPS_CHANGED:
+            for trap_id, box in event.delta.added:
+                logging.info(f"Новая ловушка #{trap_id}: {box}")
+            for trap_id, old, new in event.delta.moved:
+                logging.info(f"Ловушка #{trap_id} сдвинулась: {old} -> {new}")
+            for trap_id, box in event.delta.removed:
+                logging.info(f"Ловушка #{trap_id} исчезла: {box}")
     
     def calibrate_colors(self):
         """Открыть окно для калибровки цветов объектов"""
+        classes = self.object_classes.classes
+        # Трекбары границ HSV: (имя, граница, компонента, максимум)
+        bounds = (("Hue Min", 0, 0, 179), ("Hue Max", 1, 0, 179),
+                  ("Sat Min", 0, 1, 255), ("Sat Max", 1, 1, 255),
+                  ("Val Min", 0, 2, 255), ("Val Max", 1, 2, 255))
+        # Трекбары настраивают первый диапазон выбранного класса
+        state = {"class": 0, "switching": False}
+
+        def on_class_change(val):
+            # Переключение класса: выставляем трекбары по его диапазону
+            val = min(val, len(classes) - 1)
+            state["class"] = val
+            state["switching"] = True
+            selected = classes[val].ranges[0]
+            for name, bound, channel, _ in bounds:
+                cv2.setTrackbarPos(name, 'Calibration', int(selected[bound][channel]))
+            state["switching"] = False
+            logging.info(f"Калибровка класса: {classes[val].name}")
+
         def on_trackbar_change(val):
-            # Обновляем HSV значения при изменении трекбара
-            self.player_color_lower[0] = cv2.getTrackbarPos('P Hue Min', 'Calibration')
-            self.player_color_upper[0] = cv2.getTrackbarPos('P Hue Max', 'Calibration')
-            self.player_color_lower[1] = cv2.getTrackbarPos('P Sat Min', 'Calibration')
-            self.player_color_upper[1] = cv2.getTrackbarPos('P Sat Max', 'Calibration')
-            self.player_color_lower[2] = cv2.getTrackbarPos('P Val Min', 'Calibration')
-            self.player_color_upper[2] = cv2.getTrackbarPos('P Val Max', 'Calibration')
-            
-            self.target_color_lower[0] = cv2.getTrackbarPos('T Hue Min', 'Calibration')
-            self.target_color_upper[0] = cv2.getTrackbarPos('T Hue Max', 'Calibration')
-            self.target_color_lower[1] = cv2.getTrackbarPos('T Sat Min', 'Calibration')
-            self.target_color_upper[1] = cv2.getTrackbarPos('T Sat Max', 'Calibration')
-            self.target_color_lower[2] = cv2.getTrackbarPos('T Val Min', 'Calibration')
-            self.target_color_upper[2] = cv2.getTrackbarPos('T Val Max', 'Calibration')
-            
-            self.trap_color_lower[0] = cv2.getTrackbarPos('R Hue Min', 'Calibration')
-            self.trap_color_upper[0] = cv2.getTrackbarPos('R Hue Max', 'Calibration')
-            self.trap_color_lower[1] = cv2.getTrackbarPos('R Sat Min', 'Calibration')
-            self.trap_color_upper[1] = cv2.getTrackbarPos('R Sat Max', 'Calibration')
-            self.trap_color_lower[2] = cv2.getTrackbarPos('R Val Min', 'Calibration')
-            self.trap_color_upper[2] = cv2.getTrackbarPos('R Val Max', 'Calibration')
+            # Обновляем HSV значения выбранного класса при изменении трекбара
+            if state["switching"]:
+                return
+            selected = classes[state["class"]].ranges[0]
+            for name, bound, channel, _ in bounds:
+                selected[bound][channel] = cv2.getTrackbarPos(name, 'Calibration')
         
         cv2.namedWindow('Calibration')
         
-        # Создаем трекбары для настройки границ HSV
-        # Для персонажа (фиолетовый)
-        cv2.createTrackbar('P Hue Min', 'Calibration', int(self.player_color_lower[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('P Hue Max', 'Calibration', int(self.player_color_upper[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('P Sat Min', 'Calibration', int(self.player_color_lower[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('P Sat Max', 'Calibration', int(self.player_color_upper[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('P Val Min', 'Calibration', int(self.player_color_lower[2]), 255, on_trackbar_change)
-        cv2.createTrackbar('P Val Max', 'Calibration', int(self.player_color_upper[2]), 255, on_trackbar_change)
-        
-        # Для цели (зеленый)
-        cv2.createTrackbar('T Hue Min', 'Calibration', int(self.target_color_lower[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('T Hue Max', 'Calibration', int(self.target_color_upper[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('T Sat Min', 'Calibration', int(self.target_color_lower[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('T Sat Max', 'Calibration', int(self.target_color_upper[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('T Val Min', 'Calibration', int(self.target_color_lower[2]), 255, on_trackbar_change)
-        cv2.createTrackbar('T Val Max', 'Calibration', int(self.target_color_upper[2]), 255, on_trackbar_change)
-        
-        # Для ловушек (красный)
-        cv2.createTrackbar('R Hue Min', 'Calibration', int(self.trap_color_lower[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('R Hue Max', 'Calibration', int(self.trap_color_upper[0]), 179, on_trackbar_change)
-        cv2.createTrackbar('R Sat Min', 'Calibration', int(self.trap_color_lower[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('R Sat Max', 'Calibration', int(self.trap_color_upper[1]), 255, on_trackbar_change)
-        cv2.createTrackbar('R Val Min', 'Calibration', int(self.trap_color_lower[2]), 255, on_trackbar_change)
-        cv2.createTrackbar('R Val Max', 'Calibration', int(self.trap_color_upper[2]), 255, on_trackbar_change)
+        # Создаем трекбары для выбора класса и настройки границ HSV
+        first = classes[0].ranges[0]
+        for name, bound, channel, maximum in bounds:
+            cv2.createTrackbar(name, 'Calibration', int(first[bound][channel]), maximum, on_trackbar_change)
+        cv2.createTrackbar('Class', 'Calibration', 0, max(1, len(classes) - 1), on_class_change)
+        logging.info(f"Калибровка класса: {classes[0].name} (классы: {', '.join(self.object_classes.names)})")
         
         while True:
             new_frame = self.capture_screen()
@@ -487,13 +1116,11 @@ class GameDetector:
             # Конвертируем в HSV
             hsv = cv2.cvtColor(new_frame, cv2.COLOR_BGR2HSV)
             
-            # Создаем маски для всех объектов
-            player_mask = cv2.inRange(hsv, self.player_color_lower, self.player_color_upper)
-            target_mask = cv2.inRange(hsv, self.target_color_lower, self.target_color_upper)
-            trap_mask = cv2.inRange(hsv, self.trap_color_lower, self.trap_color_upper)
+            # Размечаем пиксели всех объектов за один проход: ненулевая метка - пиксель какого-либо класса
+            labels = self.classify_frame(hsv)
             
             # Объединяем маски
-            result = cv2.bitwise_and(new_frame, new_frame, mask=player_mask + target_mask + trap_mask)
+            result = cv2.bitwise_and(new_frame, new_frame, mask=(labels != 0).view(np.uint8))
             
             # Отображаем оригинальное и отфильтрованное изображения
             cv2.imshow('Original', new_frame)
@@ -508,22 +1135,15 @@ class GameDetector:
         logging.info("Калибровка завершена")
         
         # Вывести текущие настройки цветов
-        logging.info(f"Персонаж HSV: {self.player_color_lower} - {self.player_color_upper}")
-        logging.info(f"Цель HSV: {self.target_color_lower} - {self.target_color_upper}")
-        logging.info(f"Ловушка HSV: {self.trap_color_lower} - {self.trap_color_upper}")
+        for object_class in classes:
+            for lower, upper in object_class.ranges:
+                logging.info(f"{object_class.name} HSV: {lower} - {upper}")
         
         return True
     
     def save_config(self, filename="color_config.json"):
         """Сохранить настройки цветов в JSON файл"""
-        config = {
-            "player_color_lower": self.player_color_lower.tolist(),
-            "player_color_upper": self.player_color_upper.tolist(),
-            "target_color_lower": self.target_color_lower.tolist(),
-            "target_color_upper": self.target_color_upper.tolist(),
-            "trap_color_lower": self.trap_color_lower.tolist(),
-            "trap_color_upper": self.trap_color_upper.tolist()
-        }
+        config = self.object_classes.to_config()
         
         try:
             with open(filename, 'w') as f:
@@ -540,12 +1160,7 @@ class GameDetector:
             with open(filename, 'r') as f:
                 config = json.load(f)
                 
-            self.player_color_lower = np.array(config["player_color_lower"])
-            self.player_color_upper = np.array(config["player_color_upper"])
-            self.target_color_lower = np.array(config["target_color_lower"])
-            self.target_color_upper = np.array(config["target_color_upper"])
-            self.trap_color_lower = np.array(config["trap_color_lower"])
-            self.trap_color_upper = np.array(config["trap_color_upper"])
+            self.object_classes.update_from_config(config)
             
             logging.info(f"Конфигурация загружена из {filename}")
             return True
@@ -558,11 +1173,15 @@ class GameDetector:
     
     def run(self):
         """Основной цикл программы"""
-        if not self.find_window():
-            print(f"Не удалось найти окно игры. Убедитесь, что окно с названием '{self.window_title}' запущено.")
-            return
+        live = self.frame_source.is_live
+        if live:
+            if not self.find_window():
+                print(f"Не удалось найти окно игры. Убедитесь, что окно с названием '{self.window_title}' запущено.")
+                return
+            print(f"Поиск объектов запущен. Окно игры: {self.window_title}")
+        else:
+            print(f"Поиск объектов запущен. Источник кадров: {self.frame_source.describe()}")
 
-        print(f"Поиск объектов запущен. Окно игры: {self.window_title}")
         print("Управление программой:")
         print("- ESC: выход из программы")
         print("- V: включить/выключить визуализацию")
@@ -572,6 +1191,8 @@ class GameDetector:
         print("- W: переключиться на следующее окно")
         print("- Q: переключиться на предыдущее окно")
         print("- L: показать список доступных окон")
+        print("- T: включить/выключить таймеры стадий")
+        print("- D: выгрузить таймеры стадий в файл")
         
         # Установка флага запуска
         self.running = True
@@ -593,135 +1214,265 @@ class GameDetector:
                 self.show_visualization = False
                 self.vis_window_open = False
         
+        if self.processes:
+            self.run_process_pool()
+        elif self.pipelined:
+            self.run_pipeline()
+        else:
+            self.run_sequential()
+        
+        # Закрываем все окна OpenCV перед выходом
+        try:
+            cv2.destroyAllWindows()
+            self.vis_window_open = False
+        except:
+            pass
+        self.frame_source.close()
+        # Подписчики дообрабатывают оставшиеся события
+        self.events.close()
+        
+        if self.tracking_enabled or self.motion_model:
+            logging.info(f"Слежение: {self.tracking_summary()}")
+            print(f"Слежение: {self.tracking_summary()}")
+        if self.incremental_scanner is not None:
+            logging.info(f"Инкрементальный просмотр: {self.incremental_scanner.format_stats()}")
+            print(f"Инкрементальный просмотр: {self.incremental_scanner.format_stats()}")
+        if self.skip_unchanged:
+            logging.info(f"Пропуск неизменившихся кадров: {self.fingerprint.format_stats()}")
+            print(f"Пропуск неизменившихся кадров: {self.fingerprint.format_stats()}")
+        if self.trap_tracker.totals["scans"]:
+            logging.info(f"Ловушки: {self.trap_tracker.format_stats()}")
+            print(f"Ловушки: {self.trap_tracker.format_stats()}")
+        if self.stage_timers.histograms:
+            logging.info(f"Таймеры стадий: {self.stage_timers.format_stats()}")
+            print(f"Таймеры стадий: {self.stage_timers.format_stats()}")
+            self.dump_stage_timers()
+        logging.info(f"События: {self.events.format_stats()}")
+        print("Программа завершена.")
+
+    def create_scheduler(self):
+        """Создать планировщик кадров с целевым FPS детектора"""
+        target_fps = self.target_fps
+        if target_fps is None:
+            target_fps = 30 if self.frame_source.is_live else 0
+        return FrameScheduler(target_fps)
+
+    def run_pipeline(self):
+        """Цикл обработки в режиме конвейера (захват и обнаружение в отдельных потоках)"""
+        pipeline = DetectionPipeline(self, scheduler=self.create_scheduler())
+        pipeline.start()
+        try:
+            pipeline.run_ui()
+        finally:
+            pipeline.stop()
+        
+        stats = pipeline.format_stats()
+        logging.info(f"Конвейер: {stats}")
+        print(f"Конвейер: {stats}")
+        stats = pipeline.scheduler.format_stats()
+        logging.info(f"Планировщик захвата: {stats}")
+        print(f"Планировщик захвата: {stats}")
+
+    def run_process_pool(self):
+        """Цикл обработки с обнаружением в пуле процессов (кадры передаются через разделяемую память)"""
+        pool = ProcessDetectionPool(self, workers=self.processes, scheduler=self.create_scheduler())
+        pool.start()
+        try:
+            pool.run_ui()
+        finally:
+            pool.stop()
+        
+        stats = pool.format_stats()
+        logging.info(f"Процессы: {stats}")
+        print(f"Процессы: {stats}")
+        stats = pool.scheduler.format_stats()
+        logging.info(f"Планировщик захвата: {stats}")
+        print(f"Планировщик захвата: {stats}")
+
+    def run_sequential(self):
+        """Последовательный цикл обработки: захват, обнаружение и отображение по очереди"""
+        live = self.frame_source.is_live
+        scheduler = self.create_scheduler()
+        
         # Счетчик для проверки window_handle
         window_check_counter = 0
         
+        # Статистика пропускной способности
+        frames_processed = 0
+        start_time = time.time()
+        
         # Главный цикл
         while self.running:
             try:
+                scheduler.begin_frame()
+                frame_start = self.stage_timers.clock()
+                
                 # Периодически проверяем, существует ли еще окно
                 window_check_counter += 1
-                if window_check_counter >= 50:  # Каждые ~5 секунд
+                if live and window_check_counter >= 50:  # Каждые ~5 секунд
                     window_check_counter = 0
-                    if PYWIN32_AVAILABLE and self.window_handle:
-                        try:
-                            # Проверяем, существует ли еще окно
-                            if not win32gui.IsWindow(self.window_handle):
-                                logging.info("Окно больше не существует, ищем его снова")
-                                self.find_window()
-                        except:
-                            self.find_window()
+                    self.check_window_alive()
                 
                 # Захват экрана
                 screen = self.capture_screen()
                 if screen is None:
+                    if self.frame_source.exhausted:
+                        print("Источник кадров исчерпан.")
+                        break
                     print("Не удалось захватить экран. Повторная попытка...")
-                    time.sleep(1)
+                    scheduler.wait_after_failure()
                     continue
                 
                 # Анализ экрана и поиск объектов
-                visualization = self.detect_objects(screen)
+                result = self.detect(screen, self.frame_source.timestamp)
+                frames_processed += 1
                 
-                # Отображаем визуализацию, если включена
-                if self.show_visualization and visualization is not None:
-                    try:
-                        # Проверяем, существует ли окно визуализации
-                        if not self.vis_window_open:
-                            cv2.namedWindow("GameDetector - Визуализация", cv2.WINDOW_NORMAL)
-                            cv2.resizeWindow("GameDetector - Визуализация", 800, 600)
-                            self.vis_window_open = True
-                            
-                        cv2.imshow("GameDetector - Визуализация", visualization)
-                        key_pressed = cv2.waitKey(1)  # Необходимо для обновления окна OpenCV
-                        
-                        # Проверяем, было ли окно закрыто пользователем
-                        try:
-                            if cv2.getWindowProperty("GameDetector - Визуализация", cv2.WND_PROP_VISIBLE) < 1:
-                                print("Окно визуализации было закрыто. Выключаем визуализацию.")
-                                self.vis_window_open = False
-                        except:
-                            self.vis_window_open = False
-                        
-                        # Обработка клавиш через OpenCV
-                        if key_pressed == 27:  # ESC
-                            self.running = False
-                            print("ESC нажат. Выход из программы.")
-                        elif key_pressed == ord('v'):
-                            self.show_visualization = not self.show_visualization
-                            print(f"Визуализация {'включена' if self.show_visualization else 'выключена'}")
-                        elif key_pressed == ord('c'):
-                            self.calibrate_colors()
-                        elif key_pressed == ord('s'):
-                            self.save_config()
-                            self.notification.show("Настройки сохранены!", bg_color="#3366FF", fg_color="white")
-                        elif key_pressed == ord('p'):
-                            self.run_color_picker()
-                        elif key_pressed == ord('w'):  # Следующее окно
-                            self.switch_window(next_window=True)
-                        elif key_pressed == ord('q'):  # Предыдущее окно
-                            self.switch_window(next_window=False)
-                        elif key_pressed == ord('l'):  # Показать/скрыть список окон
-                            self.show_window_list = not self.show_window_list
-                            print(f"Список окон {'показан' if self.show_window_list else 'скрыт'}")
-                    except cv2.error as e:
-                        # Если окно было закрыто, отключаем визуализацию
-                        logging.error(f"Ошибка OpenCV: {e}. Выключаем визуализацию.")
-                        self.vis_window_open = False
+                # Рисуем визуализацию, только если ее показываем
+                if self.show_visualization:
+                    self.display_visualization(self.render(screen, result, draw_in_place=True))
+                self.poll_console_keys()
+                self.stage_timers.record("frame", frame_start)
+                self.stage_timers.end_frame()
                 
-                # Проверка нажатия клавиш (без использования модуля keyboard)
-                if msvcrt.kbhit():  # Проверяем, была ли нажата клавиша
-                    key = msvcrt.getch().decode('utf-8', errors='ignore').lower()
-                    if key == '\x1b':  # ESC
-                        self.running = False
-                        print("ESC нажат. Выход из программы.")
-                    elif key == 'c':
-                        self.calibrate_colors()
-                    elif key == 's':
-                        self.save_config()
-                        self.notification.show("Настройки сохранены!", bg_color="#3366FF", fg_color="white")
-                    elif key == 'p':
-                        self.run_color_picker()
-                    elif key == 'v':
-                        self.show_visualization = not self.show_visualization
-                        if self.show_visualization and not self.vis_window_open:
-                            print("Визуализация включена")
-                            try:
-                                cv2.namedWindow("GameDetector - Визуализация", cv2.WINDOW_NORMAL)
-                                cv2.resizeWindow("GameDetector - Визуализация", 800, 600)
-                                self.vis_window_open = True
-                            except Exception as e:
-                                logging.error(f"Не удалось создать окно визуализации: {e}")
-                                print(f"Не удалось создать окно визуализации: {e}")
-                        elif not self.show_visualization:
-                            print("Визуализация выключена")
-                            try:
-                                cv2.destroyWindow("GameDetector - Визуализация")
-                                self.vis_window_open = False
-                            except:
-                                pass  # Окно уже может быть закрыто
-                    elif key == 'w':  # Следующее окно
-                        self.switch_window(next_window=True)
-                    elif key == 'q':  # Предыдущее окно
-                        self.switch_window(next_window=False)
-                    elif key == 'l':  # Показать/скрыть список окон
-                        self.show_window_list = not self.show_window_list
-                        print(f"Список окон {'показан' if self.show_window_list else 'скрыт'}")
-                
-                # Небольшая пауза для снижения нагрузки на CPU
-                time.sleep(0.1)
+                # Спим только остаток бюджета кадра
+                scheduler.end_frame()
                 
             except Exception as e:
                 logging.error(f"Ошибка в главном цикле: {e}")
                 print(f"Ошибка: {e}")
-                time.sleep(1)
+                scheduler.wait_after_failure()
         
-        # Закрываем все окна OpenCV перед выходом
+        elapsed = time.time() - start_time
+        fps = frames_processed / elapsed if elapsed > 0 else 0.0
+        logging.info(f"Обработано кадров: {frames_processed} за {elapsed:.2f} с ({fps:.1f} FPS)")
+        print(f"Обработано кадров: {frames_processed} за {elapsed:.2f} с ({fps:.1f} FPS)")
+        logging.info(f"Планировщик: {scheduler.format_stats()}")
+        print(f"Планировщик: {scheduler.format_stats()}")
+
+    def check_window_alive(self):
+        """Проверить, существует ли еще окно игры, и при необходимости найти его снова"""
+        if PYWIN32_AVAILABLE and self.window_handle:
+            try:
+                # Проверяем, существует ли еще окно
+                if not win32gui.IsWindow(self.window_handle):
+                    logging.info("Окно больше не существует, ищем его снова")
+                    self.find_window()
+            except:
+                self.find_window()
+
+    def display_visualization(self, visualization):
+        """Показать кадр визуализации и обработать клавиши окна OpenCV"""
+        # Отображаем визуализацию, если включена
+        if self.show_visualization and visualization is not None:
+            try:
+                # Проверяем, существует ли окно визуализации
+                if not self.vis_window_open:
+                    cv2.namedWindow("GameDetector - Визуализация", cv2.WINDOW_NORMAL)
+                    cv2.resizeWindow("GameDetector - Визуализация", 800, 600)
+                    self.vis_window_open = True
+
+                start = self.stage_timers.clock()
+                cv2.imshow("GameDetector - Визуализация", visualization)
+                key_pressed = cv2.waitKey(1)  # Необходимо для обновления окна OpenCV
+                self.stage_timers.record("display", start)
+
+                # Проверяем, было ли окно закрыто пользователем
+                try:
+                    if cv2.getWindowProperty("GameDetector - Визуализация", cv2.WND_PROP_VISIBLE) < 1:
+                        print("Окно визуализации было закрыто. Выключаем визуализацию.")
+                        self.vis_window_open = False
+                except:
+                    self.vis_window_open = False
+
+                # Обработка клавиш через OpenCV
+                if key_pressed == 27:  # ESC
+                    self.running = False
+                    print("ESC нажат. Выход из программы.")
+                elif key_pressed == ord('v'):
+                    self.show_visualization = not self.show_visualization
+                    print(f"Визуализация {'включена' if self.show_visualization else 'выключена'}")
+                elif key_pressed == ord('c'):
+                    self.calibrate_colors()
+                elif key_pressed == ord('s'):
+                    self.save_config()
+                    self.notification.show("Настройки сохранены!", bg_color="#3366FF", fg_color="white")
+                elif key_pressed == ord('p'):
+                    self.run_color_picker()
+                elif key_pressed == ord('w'):  # Следующее окно
+                    self.switch_window(next_window=True)
+                elif key_pressed == ord('q'):  # Предыдущее окно
+                    self.switch_window(next_window=False)
+                elif key_pressed == ord('l'):  # Показать/скрыть список окон
+                    self.show_window_list = not self.show_window_list
+                    print(f"Список окон {'показан' if self.show_window_list else 'скрыт'}")
+                elif key_pressed == ord('t'):  # Таймеры стадий
+                    self.toggle_stage_timers()
+                elif key_pressed == ord('d'):  # Выгрузка таймеров в файл
+                    self.dump_stage_timers()
+            except cv2.error as e:
+                # Если окно было закрыто, отключаем визуализацию
+                logging.error(f"Ошибка OpenCV: {e}. Выключаем визуализацию.")
+                self.vis_window_open = False
+
+    def poll_console_keys(self):
+        """Обработать нажатия клавиш в консоли"""
+        # Проверка нажатия клавиш (без использования модуля keyboard)
+        if MSVCRT_AVAILABLE and msvcrt.kbhit():  # Проверяем, была ли нажата клавиша
+            key = msvcrt.getch().decode('utf-8', errors='ignore').lower()
+            if key == '\x1b':  # ESC
+                self.running = False
+                print("ESC нажат. Выход из программы.")
+            elif key == 'c':
+                self.calibrate_colors()
+            elif key == 's':
+                self.save_config()
+                self.notification.show("Настройки сохранены!", bg_color="#3366FF", fg_color="white")
+            elif key == 'p':
+                self.run_color_picker()
+            elif key == 'v':
+                self.show_visualization = not self.show_visualization
+                if self.show_visualization and not self.vis_window_open:
+                    print("Визуализация включена")
+                    try:
+                        cv2.namedWindow("GameDetector - Визуализация", cv2.WINDOW_NORMAL)
+                        cv2.resizeWindow("GameDetector - Визуализация", 800, 600)
+                        self.vis_window_open = True
+                    except Exception as e:
+                        logging.error(f"Не удалось создать окно визуализации: {e}")
+                        print(f"Не удалось создать окно визуализации: {e}")
+                elif not self.show_visualization:
+                    print("Визуализация выключена")
+                    try:
+                        cv2.destroyWindow("GameDetector - Визуализация")
+                        self.vis_window_open = False
+                    except:
+                        pass  # Окно уже может быть закрыто
+            elif key == 'w':  # Следующее окно
+                self.switch_window(next_window=True)
+            elif key == 'q':  # Предыдущее окно
+                self.switch_window(next_window=False)
+            elif key == 'l':  # Показать/скрыть список окон
+                self.show_window_list = not self.show_window_list
+                print(f"Список окон {'показан' if self.show_window_list else 'скрыт'}")
+            elif key == 't':  # Таймеры стадий
+                self.toggle_stage_timers()
+            elif key == 'd':  # Выгрузка таймеров в файл
+                self.dump_stage_timers()
+
+    def toggle_stage_timers(self):
+        """Включить или выключить замеры стадий вместе с их наложением на экран"""
+        timers = self.stage_timers
+        timers.enabled = not timers.enabled
+        self.renderer.show_timers = timers.enabled
+        print(f"Таймеры стадий {'включены' if timers.enabled else 'выключены'}")
+
+    def dump_stage_timers(self):
+        """Выгрузить гистограммы стадий в файл в формате экспозиции"""
         try:
-            cv2.destroyAllWindows()
-            self.vis_window_open = False
-        except:
-            pass
-        print("Программа завершена.")
+            path = self.stage_timers.dump()
+            print(f"Таймеры стадий выгружены в {path}")
+        except OSError as e:
+            logging.error(f"Не удалось выгрузить таймеры стадий: {e}")
 
     def load_color_config(self):
         """Загрузка настроек цветовых диапазонов из JSON-файла"""
@@ -731,13 +1482,8 @@ class GameDetector:
                 with open(config_file, 'r') as f:
                     config = json.load(f)
                     
-                # Загрузка цветовых диапазонов
-                self.player_color_lower = np.array(config.get("player_color_lower", self.player_color_lower))
-                self.player_color_upper = np.array(config.get("player_color_upper", self.player_color_upper))
-                self.target_color_lower = np.array(config.get("target_color_lower", self.target_color_lower))
-                self.target_color_upper = np.array(config.get("target_color_upper", self.target_color_upper))
-                self.trap_color_lower = np.array(config.get("trap_color_lower", self.trap_color_lower))
-                self.trap_color_upper = np.array(config.get("trap_color_upper", self.trap_color_upper))
+                # Загрузка классов объектов и их цветовых диапазонов
+                self.object_classes.update_from_config(config)
                 logging.info(f"Конфигурация загружена из {config_file}")
             else:
                 logging.warning(f"Файл конфигурации {config_file} не найден. Используются значения по умолчанию.")
@@ -749,14 +1495,7 @@ class GameDetector:
         """Сохранение настроек цветовых диапазонов в JSON-файл"""
         config_file = "color_config.json"
         try:
-            config = {
-                "player_color_lower": self.player_color_lower.tolist(),
-                "player_color_upper": self.player_color_upper.tolist(),
-                "target_color_lower": self.target_color_lower.tolist(),
-                "target_color_upper": self.target_color_upper.tolist(),
-                "trap_color_lower": self.trap_color_lower.tolist(),
-                "trap_color_upper": self.trap_color_upper.tolist()
-            }
+            config = self.object_classes.to_config()
             
             with open(config_file, 'w') as f:
                 json.dump(config, f, indent=4)
@@ -859,6 +1598,148 @@ class GameDetector:
         print(f"Переключено на окно: {title}")
         return True
 
+def create_frame_source(args, seed=0):
+    """Создать источник кадров по аргументам командной строки (seed - зерно синтетической сцены)"""
+    if args.video:
+        return VideoFrameSource(args.video, loop=args.loop)
+    if args.images:
+        return ImageFolderFrameSource(args.images, loop=args.loop)
+    if args.synthetic is not None:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        return SyntheticFrameSource(width=width, height=height, frames=args.synthetic, seed=seed)
+    return ScreenFrameSource()
+
+
+def run_all_windows(detector, args):
+    """Обнаружение во всех подходящих окнах (или в нескольких офлайн-источниках) одновременно"""
+    multi = MultiWindowDetector(detector, workers=args.workers, target_fps=args.fps,
+                                record_path=args.record, events_path=args.events_file)
+    if not detector.frame_source.is_live:
+        # Офлайн: первый источник уже создан, остальные - копии с другим зерном генератора
+        multi.add_session(0, f"{detector.frame_source.describe()} #1", detector.frame_source)
+        for index in range(1, args.windows):
+            multi.add_session(index, f"{detector.frame_source.describe()} #{index + 1}",
+                              create_frame_source(args, seed=index))
+    multi.run()
+
+
+def parse_args():
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="GameDetector - распознавание игровых объектов")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--video", help="воспроизвести записанную сессию из видеофайла")
+    source.add_argument("--images", help="воспроизвести папку с кадрами PNG")
+    source.add_argument("--synthetic", type=int, metavar="N", help="сгенерировать N синтетических кадров")
+    parser.add_argument("--size", default="800x600", help="размер синтетических кадров (ШxВ)")
+    parser.add_argument("--loop", action="store_true", help="повторять запись по кругу")
+    parser.add_argument("--no-vis", action="store_true",
+                        help="запуск без окна визуализации (кадры не рисуются вовсе)")
+    parser.add_argument("--show-masks", action="store_true",
+                        help="показывать маски классов в углу визуализации")
+    parser.add_argument("--fps", type=float,
+                        help="целевой FPS (0 - как можно быстрее; по умолчанию 30 для экрана)")
+    parser.add_argument("--color-engine", choices=["hsv", "rgb"], default="hsv",
+                        help="разметка цветов: точная через HSV или по квантованной RGB-таблице")
+    parser.add_argument("--rgb-bits", type=int, default=5,
+                        help="бит на канал для квантованной RGB-таблицы (4-7)")
+    parser.add_argument("--tracking", action="store_true",
+                        help="искать объекты только вокруг последних известных позиций")
+    parser.add_argument("--tracking-padding", type=int, default=80,
+                        help="отступ области слежения вокруг объекта, пикселей")
+    parser.add_argument("--full-scan-interval", type=int, default=30,
+                        help="полный просмотр кадра раз в N кадров в режиме слежения")
+    parser.add_argument("--motion-model", action="store_true",
+                        help="модель движения персонажа: поиск вокруг предсказанной позиции и предсказание при пропусках")
+    parser.add_argument("--max-coast-frames", type=int, default=5,
+                        help="сколько кадров подряд выдавать предсказанную позицию ненайденного персонажа")
+    parser.add_argument("--pyramid", type=int, choices=[0, 1, 2], default=0,
+                        help="уровень пирамиды: поиск кандидатов на кадре 1/2 (1) или 1/4 (2)")
+    parser.add_argument("--no-refine", action="store_true",
+                        help="не уточнять кандидатов пирамиды в полном разрешении")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="захват, обнаружение и отображение в отдельных потоках")
+    parser.add_argument("--incremental", action="store_true",
+                        help="пересчитывать разметку и пятна только в изменившихся плитках кадра")
+    parser.add_argument("--tile-size", type=int, default=64,
+                        help="сторона плитки для --incremental, пикселей")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="обнаружение в N процессах с передачей кадров через разделяемую память")
+    parser.add_argument("--timers", action="store_true",
+                        help="замерять время стадий и показывать его поверх визуализации")
+    parser.add_argument("--timers-file", default="stage_timers.prom",
+                        help="файл для выгрузки таймеров стадий (формат экспозиции Prometheus)")
+    parser.add_argument("--timers-interval", type=float, default=0.0,
+                        help="период автоматической выгрузки таймеров, с (0 - по клавише D и при выходе)")
+    parser.add_argument("--log-rate", type=float, default=10.0,
+                        help="не больше N сообщений журнала в секунду с одного места вызова (0 - без ограничения)")
+    parser.add_argument("--log-sample", type=int, default=1,
+                        help="писать в журнал только каждое N-е сообщение с одного места вызова")
+    parser.add_argument("--log-position-threshold", type=float, default=5,
+                        help="писать позицию в журнал, только если она сместилась больше чем на N пикселей")
+    parser.add_argument("--log-every-frame", action="store_true",
+                        help="писать позиции и число ловушек в журнал на каждом кадре")
+    parser.add_argument("--events-file",
+                        help="дописывать события (ловушки, цель) в файл JSON Lines")
+    parser.add_argument("--record",
+                        help="дописывать результаты каждого кадра в двоичную запись (см. detection_recorder.py)")
+    parser.add_argument("--all-windows", action="store_true",
+                        help="обнаружение одновременно во всех окнах, подходящих под заголовок")
+    parser.add_argument("--windows", type=int, default=1,
+                        help="число одновременных сессий для записей и генератора с --all-windows")
+    parser.add_argument("--workers", type=int,
+                        help="размер пула потоков для --all-windows (по умолчанию - число ядер)")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="не обрабатывать кадры, не изменившиеся с последнего обработанного")
+    parser.add_argument("--unchanged-tolerance", type=int, default=1,
+                        help="допустимое отличие среднего значения блока 8x8 для неизменившегося кадра")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    detector = GameDetector()
-    detector.run() 
\ No newline at end of file
+    args = parse_args()
+    # Журнал пишет фоновый поток; цикл обработки только ставит записи в очередь
+    async_log = setup_logging("game_detector.log", rate=args.log_rate, sample_every=args.log_sample)
+    detector = GameDetector(frame_source=create_frame_source(args))
+    if args.no_vis:
+        detector.show_visualization = False
+    detector.renderer.show_masks = args.show_masks
+    detector.pipelined = args.pipeline
+    detector.processes = args.processes
+    detector.stage_timers.enabled = args.timers
+    detector.stage_timers.dump_path = args.timers_file
+    detector.stage_timers.dump_interval = args.timers_interval
+    detector.renderer.show_timers = args.timers
+    detector.change_log.threshold = args.log_position_threshold
+    detector.change_log.enabled = not args.log_every_frame
+    events_writer = None
+    # В режиме нескольких окон файлы событий и записи свои у каждой сессии (multi_window.py)
+    if args.events_file and not args.all_windows:
+        events_writer = EventFileWriter(args.events_file)
+        detector.events.subscribe(events_writer, name="events-file")
+    if args.record and not args.all_windows:
+        detector.recorder = DetectionRecorder(args.record)
+    detector.skip_unchanged = args.skip_unchanged
+    detector.incremental = args.incremental
+    detector.tile_size = args.tile_size
+    detector.fingerprint.tolerance = args.unchanged_tolerance
+    detector.target_fps = args.fps
+    detector.color_engine = args.color_engine
+    detector.rgb_lut_bits = args.rgb_bits
+    detector.tracking_enabled = args.tracking
+    detector.tracking_padding = args.tracking_padding
+    detector.motion_model = args.motion_model
+    detector.max_coast_frames = args.max_coast_frames
+    detector.full_scan_interval = args.full_scan_interval
+    detector.pyramid_level = args.pyramid
+    detector.pyramid_refine = not args.no_refine
+    if args.all_windows:
+        run_all_windows(detector, args)
+    else:
+        detector.run()
+    if events_writer is not None:
+        detector.events.close()
+        events_writer.close()
+    if detector.recorder is not None:
+        detector.recorder.close()
+    print(f"Журнал: {async_log.format_stats()}")
+    async_log.stop()
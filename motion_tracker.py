@@ -0,0 +1,124 @@
+"""
+Модель движения персонажа с постоянной скоростью (фильтр Калмана).
+
+Состояние - позиция и скорость центра (x, y, vx, vy) в пикселях и пикселях
+в секунду. Каждое обнаружение уточняет состояние, а между обнаружениями
+модель предсказывает позицию на любой момент времени. Это позволяет:
+
+- искать персонажа в режиме слежения вокруг предсказанной позиции, а не
+  вокруг последней найденной (быстрый персонаж не выходит из области);
+- несколько кадров подряд выдавать предсказанную позицию, если персонаж
+  не найден (перекрытие, смазанный кадр), вместо устаревшей позиции
+  и немедленного полного просмотра кадра;
+- отдавать интерполированную позицию с частотой отображения, даже если
+  обнаружение выполняется реже.
+
+Ускорение персонажа считается белым шумом с плотностью motion_noise,
+ошибка обнаружения центра - шумом со среднеквадратичным отклонением
+measurement_noise пикселей.
+"""
+
+import numpy as np
+
+# Наблюдается только позиция
+H = np.array([[1.0, 0.0, 0.0, 0.0],
+              [0.0, 1.0, 0.0, 0.0]])
+
+
+class KalmanTracker:
+    """Фильтр Калмана с постоянной скоростью для одного объекта"""
+
+    def __init__(self, motion_noise=2000.0, measurement_noise=2.0, initial_speed=500.0):
+        """
+        Args:
+            motion_noise (float): Среднеквадратичное ускорение, пикс/с^2
+            measurement_noise (float): Ошибка обнаруженного центра, пикс
+            initial_speed (float): Неопределенность скорости при первом обнаружении, пикс/с
+        """
+        self.motion_noise = motion_noise
+        self.measurement_noise = measurement_noise
+        self.initial_speed = initial_speed
+        self.reset()
+
+    def reset(self):
+        """Забыть объект"""
+        self.state = np.zeros(4)
+        self.covariance = np.eye(4)
+        self.timestamp = None
+        self.missed = 0       # Кадров подряд без обнаружения
+        self.updates = 0
+
+    @property
+    def initialized(self):
+        return self.timestamp is not None
+
+    def _transition(self, dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # Белый шум ускорения, дискретизированный на интервале dt
+        q = self.motion_noise ** 2
+        Q = np.zeros((4, 4))
+        Q[0, 0] = Q[1, 1] = q * dt ** 3 / 3
+        Q[0, 2] = Q[2, 0] = Q[1, 3] = Q[3, 1] = q * dt ** 2 / 2
+        Q[2, 2] = Q[3, 3] = q * dt
+        return F, Q
+
+    def predict(self, timestamp):
+        """
+        Предсказанная позиция на момент timestamp (состояние не меняется)
+
+        Returns:
+            tuple | None: Позиция (x, y) или None, если объект еще не наблюдался
+        """
+        if self.timestamp is None:
+            return None
+        dt = max(0.0, timestamp - self.timestamp)
+        return (float(self.state[0] + self.state[2] * dt), float(self.state[1] + self.state[3] * dt))
+
+    def _advance(self, timestamp):
+        dt = max(0.0, timestamp - self.timestamp)
+        if dt > 0:
+            F, Q = self._transition(dt)
+            self.state = F @ self.state
+            self.covariance = F @ self.covariance @ F.T + Q
+            self.timestamp = timestamp
+
+    def update(self, timestamp, position):
+        """
+        Учесть обнаруженную позицию
+
+        Args:
+            timestamp (float): Время кадра, с
+            position (tuple): Обнаруженный центр (x, y)
+        """
+        self.missed = 0
+        self.updates += 1
+        if self.timestamp is None:
+            self.state = np.array([position[0], position[1], 0.0, 0.0], dtype=np.float64)
+            self.covariance = np.diag([self.measurement_noise ** 2] * 2 + [self.initial_speed ** 2] * 2)
+            self.timestamp = timestamp
+            return
+
+        self._advance(timestamp)
+        R = np.eye(2) * self.measurement_noise ** 2
+        innovation = np.asarray(position, dtype=np.float64) - H @ self.state
+        S = H @ self.covariance @ H.T + R
+        K = self.covariance @ H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.covariance = (np.eye(4) - K @ H) @ self.covariance
+
+    def coast(self, timestamp):
+        """
+        Кадр без обнаружения: продвинуть состояние по модели
+
+        Returns:
+            tuple: Предсказанная позиция (x, y)
+        """
+        self.missed += 1
+        self._advance(timestamp)
+        return (float(self.state[0]), float(self.state[1]))
+
+    @property
+    def velocity(self):
+        """Оценка скорости (vx, vy), пикс/с"""
+        return (float(self.state[2]), float(self.state[3]))
@@ -0,0 +1,336 @@
+"""
+Одновременное обнаружение во всех подходящих окнах.
+
+Для каждого окна эмулятора создается своя сессия: собственный GameDetector
+(позиции, флаги ловушек, ограничение частоты уведомлений) и собственный источник
+кадров с областью этого окна. Захват и обнаружение сессий выполняются в пуле
+потоков; одна сессия никогда не обрабатывается двумя потоками сразу, поэтому
+ее состояние не требует блокировок. Если сессия не успевает к следующему кадру,
+кадр для нее просто не запрашивается (побеждает последний кадр).
+
+Список окон периодически обновляется: новые окна получают сессии, закрытые
+окна удаляются, перемещенные окна получают новую область захвата.
+
+Запись результатов и файл событий у каждой сессии свои: к имени файла
+добавляется номер сессии (session.rec -> session.1.rec).
+"""
+
+import concurrent.futures
+import logging
+import os
+import time
+
+from detection_recorder import DetectionRecorder
+from event_bus import EventFileWriter
+from frame_source import ScreenFrameSource
+
+# Перечисление окон доступно только с pywin32
+try:
+    import win32gui
+    WIN32_AVAILABLE = True
+except ImportError:
+    WIN32_AVAILABLE = False
+
+
+def find_matching_windows(title_part):
+    """
+    Найти все видимые окна, в заголовке которых есть title_part
+
+    Returns:
+        list: Тройки (хендл, заголовок, регион (x, y, width, height))
+    """
+    if not WIN32_AVAILABLE:
+        logging.warning("Модуль win32gui недоступен, перечисление окон невозможно")
+        return []
+
+    windows = []
+
+    def callback(hwnd, ctx):
+        if win32gui.IsWindowVisible(hwnd):
+            title = win32gui.GetWindowText(hwnd)
+            if title and title_part.lower() in title.lower():
+                try:
+                    left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+                    if right - left > 50 and bottom - top > 50:
+                        ctx.append((hwnd, title, (left, top, right - left, bottom - top)))
+                except Exception:
+                    pass  # Окно могло закрыться во время перебора
+        return True
+
+    try:
+        win32gui.EnumWindows(callback, windows)
+    except Exception as e:
+        logging.error(f"Ошибка при перечислении окон: {e}")
+    return windows
+
+
+class WindowSession:
+    """Состояние обнаружения для одного окна"""
+
+    def __init__(self, key, name, detector):
+        """
+        Args:
+            key: Уникальный ключ окна (хендл для живых окон)
+            name (str): Заголовок окна для вывода
+            detector (GameDetector): Собственный детектор окна
+        """
+        self.key = key
+        self.name = name
+        self.detector = detector
+        self.future = None          # Текущая задача в пуле
+        self.next_due = 0.0         # Время, не раньше которого запрашивается следующий кадр
+        self.frames = 0
+        self.failures = 0
+        self.last_frame = None
+        self.last_result = None
+        self.events_writer = None
+        self.start_time = time.perf_counter()
+        self.busy_time = 0.0
+
+    def close(self):
+        """Закрыть источник кадров, шину событий, файл событий и запись результатов"""
+        detector = self.detector
+        detector.frame_source.close()
+        detector.events.close()
+        if self.events_writer is not None:
+            self.events_writer.close()
+        if detector.recorder is not None:
+            detector.recorder.close()
+
+    def process(self):
+        """Захватить кадр и выполнить обнаружение (выполняется в потоке пула)"""
+        start = time.perf_counter()
+        try:
+            frame = self.detector.capture_screen()
+            if frame is None:
+                if not self.exhausted:
+                    self.failures += 1
+                return None
+            result = self.detector.detect(frame, self.detector.frame_source.timestamp)
+            self.frames += 1
+            self.last_frame = frame
+            self.last_result = result
+            return result
+        finally:
+            self.busy_time += time.perf_counter() - start
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def exhausted(self):
+        return self.detector.frame_source.exhausted
+
+
+class MultiWindowDetector:
+    """Захват и обнаружение во всех окнах через пул потоков"""
+
+    def __init__(self, base_detector, workers=None, target_fps=None, refresh_interval=5.0,
+                 stats_interval=10.0, record_path=None, events_path=None):
+        """
+        Args:
+            base_detector (GameDetector): Детектор, чьи настройки (цвета, режимы) получают все сессии
+            workers (int | None): Размер пула (по умолчанию - по числу ядер)
+            target_fps (float | None): Целевой FPS каждого окна (0 - как можно быстрее;
+                                       None - как у base_detector, а если не задан -
+                                       30 для экрана и без ограничения для офлайн-источников)
+            refresh_interval (float): Период обновления списка окон, с
+            stats_interval (float): Период записи статистики в журнал, с
+            record_path (str | None): Запись результатов (detection_recorder.py), своя у каждой сессии
+            events_path (str | None): Файл событий JSON Lines, свой у каждой сессии
+        """
+        self.base_detector = base_detector
+        self.workers = workers or os.cpu_count() or 1
+        if target_fps is None:
+            target_fps = base_detector.target_fps
+        if target_fps is None:
+            # То же правило, что и в GameDetector.create_scheduler
+            target_fps = 30 if base_detector.frame_source.is_live else 0
+        self.period = 1.0 / target_fps if target_fps > 0 else 0.0
+        self.refresh_interval = refresh_interval
+        self.stats_interval = stats_interval
+        self.record_path = record_path
+        self.events_path = events_path
+        self.sessions_created = 0
+        self.sessions = {}
+        self.retired = []  # Сессии закрытых окон, чьи задачи еще выполняются
+        self.running = False
+        self.start_time = None
+
+    def add_session(self, key, name, frame_source):
+        """Создать сессию с собственным детектором для источника кадров"""
+        # Детектор того же класса, что и базовый, с его настройками
+        detector = type(self.base_detector)(frame_source=frame_source)
+        detector.copy_settings_from(self.base_detector)
+        detector.window_title = name
+        detector.notification.title = f"GameDetector: {name}"
+        session = WindowSession(key, name, detector)
+        self.sessions_created += 1
+        if self.events_path:
+            session.events_writer = EventFileWriter(self.session_path(self.events_path))
+            detector.events.subscribe(session.events_writer, name="events-file")
+        if self.record_path:
+            detector.recorder = DetectionRecorder(self.session_path(self.record_path))
+        self.sessions[key] = session
+        logging.info(f"Добавлено окно: {name}")
+        return session
+
+    def session_path(self, path):
+        """Имя файла сессии: к имени добавляется номер сессии"""
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.sessions_created}{ext}"
+
+    def refresh_windows(self):
+        """Синхронизировать сессии со списком окон, подходящих под заголовок"""
+        windows = find_matching_windows(self.base_detector.window_title)
+        found = set()
+        for hwnd, title, region in windows:
+            found.add(hwnd)
+            session = self.sessions.get(hwnd)
+            if session is None:
+                session = self.add_session(hwnd, title, ScreenFrameSource())
+                session.detector.window_handle = hwnd
+            # Захват берет регион из game_region под блокировкой детектора
+            session.detector.game_region = region
+
+        for key in [key for key, session in self.sessions.items()
+                    if key not in found and session.detector.frame_source.is_live]:
+            session = self.sessions.pop(key)
+            self.retired.append(session)
+            logging.info(f"Окно закрыто: {session.name}")
+
+    def run(self):
+        """Основной цикл: пока не остановлен и есть сессии с кадрами"""
+        # Без заранее добавленных источников сессии создаются по окнам на экране
+        live = not self.sessions
+        if live:
+            self.refresh_windows()
+        if not self.sessions:
+            print(f"Не найдено ни одного окна с названием '{self.base_detector.window_title}'.")
+            return
+
+        print(f"Одновременное обнаружение в {len(self.sessions)} окнах, потоков: {self.workers}")
+        self.running = True
+        self.start_time = time.perf_counter()
+        last_refresh = last_stats = time.perf_counter()
+
+        # Ctrl-C и ошибки тоже закрывают все сессии (выход из пула ждет их задачи)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                       thread_name_prefix="window") as pool:
+                while self.running:
+                    now = time.perf_counter()
+                    if live and now - last_refresh >= self.refresh_interval:
+                        last_refresh = now
+                        self.refresh_windows()
+                    if now - last_stats >= self.stats_interval:
+                        last_stats = now
+                        logging.info(f"Окна: {self.format_stats()}")
+
+                    self._collect_finished()
+                    if not live and all(session.exhausted and session.future is None
+                                        for session in self.sessions.values()):
+                        print("Источники кадров исчерпаны.")
+                        break
+
+                    # Раздаем кадры свободным сессиям, которым пора
+                    now = time.perf_counter()
+                    for session in self.sessions.values():
+                        if session.future is None and not session.exhausted and now >= session.next_due:
+                            session.next_due = max(now, session.next_due + self.period)
+                            session.future = pool.submit(session.process)
+
+                    # Ждем завершения любой задачи или ближайшего срока следующего кадра
+                    pending = [s.future for s in self.sessions.values() if s.future is not None]
+                    due = [s.next_due for s in self.sessions.values() if s.future is None and not s.exhausted]
+                    timeout = 0.05
+                    if due:
+                        timeout = min(timeout, max(0.0, min(due) - time.perf_counter()))
+                    if pending:
+                        concurrent.futures.wait(pending, timeout=timeout,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+                    elif timeout > 0:
+                        time.sleep(timeout)
+
+                    if self.base_detector.show_visualization:
+                        self._display()
+        finally:
+            self.running = False
+            for session in list(self.sessions.values()) + self.retired:
+                session.close()
+            self.retired.clear()
+
+        summary = self.format_stats()
+        logging.info(f"Окна: {summary}")
+        print(f"Окна: {summary}")
+        for line in self.format_session_stats():
+            logging.info(line)
+            print(line)
+
+    def stop(self):
+        self.running = False
+
+    def _collect_finished(self):
+        for session in [s for s in self.retired if s.future is None or s.future.done()]:
+            session.close()
+            self.retired.remove(session)
+
+        for session in self.sessions.values():
+            future = session.future
+            if future is not None and future.done():
+                session.future = None
+                error = future.exception()
+                if error is not None:
+                    session.failures += 1
+                    logging.error(f"Ошибка обнаружения в окне {session.name}: {error}")
+
+    def _display(self):
+        """Показать последний результат каждого окна в отдельном окне OpenCV"""
+        import cv2
+
+        for session in self.sessions.values():
+            # Кадр из кольца буферов можно читать, пока сессия не захватила следующий
+            if session.future is None and session.last_result is not None:
+                visualization = session.detector.render(session.last_frame, session.last_result)
+                cv2.imshow(f"GameDetector - {session.name}", visualization)
+                session.last_result = None
+        if cv2.waitKey(1) == 27:  # ESC
+            print("ESC нажат. Выход из программы.")
+            self.running = False
+
+    def stats(self):
+        """Общая и по-оконная статистика"""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        total = sum(session.frames for session in self.sessions.values())
+        return {
+            "elapsed": elapsed,
+            "windows": len(self.sessions),
+            "frames": total,
+            "fps": total / elapsed if elapsed > 0 else 0.0,
+            "sessions": {
+                session.name: {
+                    "frames": session.frames,
+                    "fps": session.fps(),
+                    "failures": session.failures,
+                    "avg_ms": 1000.0 * session.busy_time / session.frames if session.frames else 0.0,
+                    "in_trap": session.detector.is_in_trap,
+                    "target_reached": session.detector.target_reached,
+                }
+                for session in self.sessions.values()
+            },
+        }
+
+    def format_stats(self):
+        """Общая статистика одной строкой"""
+        stats = self.stats()
+        return (f"окон: {stats['windows']}, кадров: {stats['frames']} за {stats['elapsed']:.1f} с, "
+                f"всего {stats['fps']:.1f} FPS")
+
+    def format_session_stats(self):
+        """Статистика по окнам, по строке на окно"""
+        return [
+            f"  {name}: {item['fps']:.1f} FPS, кадров: {item['frames']}, "
+            f"среднее время кадра: {item['avg_ms']:.1f} мс, ошибок захвата: {item['failures']}"
+            for name, item in self.stats()["sessions"].items()
+        ]
@@ -0,0 +1,350 @@
+"""
+Реестр классов объектов, заданных в конфигурации.
+
+Класс объекта - это имя, один или несколько диапазонов HSV, минимальная
+площадь, признак "один объект или много" и цвет рамки на визуализации.
+Классы читаются из color_config.json:
+
+    {
+        "classes": [
+            {"name": "player", "ranges": [{"lower": [140, 50, 50], "upper": [170, 255, 255]}],
+             "color": [255, 0, 255]},
+            {"name": "coin", "ranges": [{"lower": [20, 100, 100], "upper": [35, 255, 255]}],
+             "min_area": 30, "multiple": true, "color": [0, 255, 255]}
+        ]
+    }
+
+Старый формат (player_color_lower, target_color_upper, ...) тоже читается.
+
+Классы player, target и trap участвуют в логике игры (столкновения,
+достижение цели) и обнаруживаются как раньше: их min_area учитывается,
+а multiple задан ролью (персонаж и цель - один объект, ловушек много),
+поэтому другое значение multiple в конфигурации отклоняется при загрузке.
+
+Все остальные классы обнаруживаются вместе: все диапазоны всех классов уже
+размечаются одним проходом классификатора (color_lut.py), поэтому новый
+класс не добавляет проходов классификации. Внутри общей рамки всех
+дополнительных классов строится изображение номеров классов и выполняется
+один проход связных областей; пиксели на стыке разных классов из него
+вырезаются и потом возвращаются своему классу, так что соприкасающиеся
+объекты разных классов (монета рядом с врагом) остаются отдельными.
+"""
+
+import cv2
+import numpy as np
+
+# Классы, у которых есть роль в логике игры
+BUILTIN_CLASSES = ("player", "target", "trap")
+
+# Один объект или много - для классов с ролью это задано логикой игры
+BUILTIN_MULTIPLE = {"player": False, "target": False, "trap": True}
+
+
+class ObjectClass:
+    """Описание одного класса объектов"""
+
+    def __init__(self, name, ranges, min_area=None, multiple=False, color=(255, 255, 255), hue_tolerance=10):
+        """
+        Args:
+            name (str): Имя класса
+            ranges (list): Пары (нижняя граница HSV, верхняя граница HSV)
+            min_area (float | None): Минимальная площадь пятна (None - общий порог детектора)
+            multiple (bool): Объектов класса может быть много (иначе берется самое большое пятно)
+            color (tuple): Цвет рамки на визуализации
+            hue_tolerance (int): Отклонение оттенка при выборе цвета щелчком (color_picker.py)
+        """
+        self.name = name
+        self.ranges = [(np.array(lower), np.array(upper)) for lower, upper in ranges]
+        self.min_area = min_area
+        self.multiple = multiple
+        self.color = tuple(int(c) for c in color)
+        self.hue_tolerance = hue_tolerance
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["name"],
+            [(item["lower"], item["upper"]) for item in data["ranges"]],
+            min_area=data.get("min_area"),
+            multiple=data.get("multiple", False),
+            color=data.get("color", (255, 255, 255)),
+            hue_tolerance=data.get("hue_tolerance", 10),
+        )
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "ranges": [{"lower": lower.tolist(), "upper": upper.tolist()} for lower, upper in self.ranges],
+            "multiple": self.multiple,
+            "color": list(self.color),
+            "hue_tolerance": self.hue_tolerance,
+        }
+        if self.min_area is not None:
+            data["min_area"] = self.min_area
+        return data
+
+    def copy(self):
+        return ObjectClass(self.name, [(lower.copy(), upper.copy()) for lower, upper in self.ranges],
+                           self.min_area, self.multiple, self.color, self.hue_tolerance)
+
+    def signature(self):
+        return (self.name, tuple((tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+                                 for lower, upper in self.ranges),
+                self.min_area, self.multiple, self.color, self.hue_tolerance)
+
+
+def default_classes():
+    """Классы по умолчанию: персонаж, цель и ловушки"""
+    return ClassRegistry([
+        ObjectClass("player", [([140, 50, 50], [170, 255, 255])], color=(255, 0, 255), hue_tolerance=15),
+        ObjectClass("target", [([40, 50, 50], [80, 255, 255])], color=(0, 255, 0), hue_tolerance=20),
+        ObjectClass("trap", [([0, 50, 50], [10, 255, 255])], multiple=True, color=(0, 0, 255), hue_tolerance=10),
+    ])
+
+
+class ClassRegistry:
+    """Упорядоченный набор классов объектов"""
+
+    def __init__(self, classes=()):
+        self.classes = list(classes)
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __contains__(self, name):
+        return any(item.name == name for item in self.classes)
+
+    def __eq__(self, other):
+        return isinstance(other, ClassRegistry) and self.signature() == other.signature()
+
+    def get(self, name):
+        """Класс по имени (KeyError, если его нет)"""
+        for item in self.classes:
+            if item.name == name:
+                return item
+        raise KeyError(f"Нет класса объектов: {name}")
+
+    @property
+    def names(self):
+        return [item.name for item in self.classes]
+
+    def extra(self):
+        """Классы без роли в логике игры (монеты, враги, двери, ...)"""
+        return [item for item in self.classes if item.name not in BUILTIN_CLASSES]
+
+    def add(self, object_class):
+        """Добавить класс или заменить класс с тем же именем"""
+        for index, item in enumerate(self.classes):
+            if item.name == object_class.name:
+                self.classes[index] = object_class
+                return
+        self.classes.append(object_class)
+
+    def color_ranges(self):
+        """Все диапазоны всех классов как (имя, нижняя граница, верхняя граница) для классификатора"""
+        return [(item.name, lower, upper) for item in self.classes for lower, upper in item.ranges]
+
+    def signature(self):
+        return tuple(item.signature() for item in self.classes)
+
+    def copy(self):
+        return ClassRegistry(item.copy() for item in self.classes)
+
+    def to_config(self):
+        """Классы для записи в color_config.json"""
+        return {"classes": [item.to_dict() for item in self.classes]}
+
+    def update_from_config(self, config):
+        """
+        Прочитать классы из конфигурации (новый формат или старые ключи <класс>_color_lower/upper)
+
+        Классы из конфигурации заменяют одноименные, остальные остаются.
+
+        Raises:
+            ValueError: Для player, target или trap задан multiple, не совпадающий с их ролью
+        """
+        if "classes" in config:
+            loaded = []
+            for data in config["classes"]:
+                item = ObjectClass.from_dict(data)
+                if item.name in BUILTIN_MULTIPLE:
+                    multiple = BUILTIN_MULTIPLE[item.name]
+                    if data.get("multiple", multiple) != multiple:
+                        raise ValueError(f"Класс {item.name}: multiple={data['multiple']} не поддерживается "
+                                         f"(для этого класса всегда multiple={multiple})")
+                    item.multiple = multiple
+                loaded.append(item)
+            # Классы добавляются только после проверки всех, чтобы ошибка не оставила половину файла
+            for item in loaded:
+                self.add(item)
+            return
+        for item in self.classes:
+            lower = config.get(f"{item.name}_color_lower")
+            upper = config.get(f"{item.name}_color_upper")
+            if lower is not None and upper is not None:
+                item.ranges[0] = (np.array(lower), np.array(upper))
+
+
+def find_class_blobs(labels, classifier, classes, blob_extractor, default_min_area=100, area_scale=1):
+    """
+    Найти пятна нескольких классов по одной разметке кадра
+
+    Args:
+        labels (numpy.ndarray): Разметка кадра (битовые маски классов, см. HSVClassifier.classify)
+        classifier (HSVClassifier): Классификатор, которым размечен кадр
+        classes (list): Классы ObjectClass
+        blob_extractor (BlobExtractor): Источник настроек связности и рабочих буферов
+        default_min_area (float): Порог площади для классов без своего min_area
+        area_scale (float): Во сколько раз площадь на разметке меньше площади на кадре
+                            (пирамида); делит пороги площади всех классов
+
+    Returns:
+        dict: Имя класса -> рамки (N, 4) как (x, y, w, h)
+    """
+    found = {item.name: np.empty((0, 4), dtype=np.int32) for item in classes}
+    if not classes:
+        return found
+
+    class_bits = [classifier.class_bits.get(item.name, 0) for item in classes]
+    union_bits = 0
+    for bits in class_bits:
+        union_bits |= bits
+    if not union_bits:
+        return found
+
+    # Общая рамка всех дополнительных классов: дальше работаем только внутри нее
+    values = np.bitwise_and(labels, union_bits)
+    x, y, w, h = cv2.boundingRect((values != 0).view(np.uint8))
+    if w == 0 or h == 0:
+        return found
+    values = values[y:y + h, x:x + w]
+
+    # Изображение номеров классов (1, 2, ...; 0 - фон). Биты выдаются классификатором
+    # по порядку классов, поэтому первый подходящий класс - класс младшего бита
+    bit_class = np.zeros(union_bits.bit_length(), dtype=np.uint8)
+    for index, bits in enumerate(class_bits, 1):
+        for bit in range(bits.bit_length()):
+            if bits >> bit & 1:
+                bit_class[bit] = index
+    class_image = blob_extractor.scratch.get("class_image", (h, w), np.uint8)
+    class_image.fill(0)
+    inside = np.flatnonzero(values)
+    lowest = values.reshape(-1)[inside].astype(np.int64)
+    lowest &= -lowest
+    class_image.reshape(-1)[inside] = bit_class[np.log2(lowest).astype(np.intp)]
+
+    # Пиксели на стыке разных классов вырезаются, чтобы единственный проход связных
+    # областей не сливал соприкасающиеся объекты (монету рядом с врагом)
+    if blob_extractor.connectivity == 4:
+        kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+        offsets = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    else:
+        kernel = np.ones((3, 3), dtype=np.uint8)
+        offsets = tuple((dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx)
+    foreground = class_image != 0
+    highest = cv2.dilate(class_image, kernel)
+    lowest_class = cv2.erode(np.where(foreground, class_image, np.uint8(255)), kernel)
+    seam = foreground & ((highest != class_image) | (lowest_class != class_image))
+    mask = foreground & ~seam
+
+    components = blob_extractor.scratch.get("class_components", (h, w), np.int32)
+    count, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(
+        mask.view(np.uint8), blob_extractor.connectivity, cv2.CV_32S, blob_extractor.algorithm,
+        labels=components
+    )
+    owner_class = np.zeros(count, dtype=np.uint8)
+    owner_class[components[mask]] = class_image[mask]
+
+    left = stats[1:, cv2.CC_STAT_LEFT]  # Нулевая компонента - фон
+    top = stats[1:, cv2.CC_STAT_TOP]
+    right = left + stats[1:, cv2.CC_STAT_WIDTH]
+    bottom = top + stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    owner_class = owner_class[1:]
+    if seam.any():
+        left, top, right, bottom, areas, owner_class = _join_seams(
+            seam, class_image, components, offsets, (left, top, right, bottom, areas), owner_class
+        )
+
+    # Статистика областей делится по классам
+    boxes = np.stack([left + x, top + y, right - left, bottom - top], axis=1).astype(np.int32)
+    for index, item in enumerate(classes, 1):
+        min_area = (item.min_area if item.min_area is not None else default_min_area) / area_scale
+        keep = np.flatnonzero((owner_class == index) & (areas > min_area))
+        if not item.multiple and len(keep) > 1:
+            keep = keep[[np.argmax(areas[keep])]]
+        found[item.name] = boxes[keep]
+    return found
+
+
+def _join_seams(seam, class_image, components, offsets, bounds, owner_class):
+    """
+    Вернуть вырезанные пиксели стыков в области своих классов
+
+    Пиксель стыка соединяет все соседние области (и соседние пиксели стыков)
+    своего класса, поэтому объект, который стык разрезал, снова становится
+    одним - результат совпадает с разметкой каждого класса отдельно.
+
+    Args:
+        seam (numpy.ndarray): Маска вырезанных пикселей
+        class_image (numpy.ndarray): Номера классов пикселей
+        components (numpy.ndarray): Разметка связных областей без стыков
+        offsets (tuple): Смещения соседей для выбранной связности
+        bounds (tuple): left, top, right, bottom и площади областей (без фона)
+        owner_class (numpy.ndarray): Номер класса каждой области
+
+    Returns:
+        tuple: left, top, right, bottom, площади и номера классов объединенных областей
+    """
+    h, w = class_image.shape
+    seam_y, seam_x = np.nonzero(seam)
+    seam_class = class_image[seam_y, seam_x]
+    seam_index = np.zeros((h, w), dtype=np.intp)
+    # Узлы графа: области (0 .. count-1) и пиксели стыков (count ..)
+    count = len(owner_class)
+    seam_index[seam_y, seam_x] = count + np.arange(len(seam_y))
+
+    starts, ends = [], []
+    for dy, dx in offsets:
+        near_y = seam_y + dy
+        near_x = seam_x + dx
+        valid = (near_y >= 0) & (near_y < h) & (near_x >= 0) & (near_x < w)
+        node = count + np.flatnonzero(valid)
+        near_y, near_x = near_y[valid], near_x[valid]
+        same = class_image[near_y, near_x] == seam_class[valid]
+        node, near_y, near_x = node[same], near_y[same], near_x[same]
+        starts.append(node)
+        ends.append(np.where(seam[near_y, near_x], seam_index[near_y, near_x],
+                             components[near_y, near_x] - 1))
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+
+    # Объединение узлов: корень - наименьший номер узла в группе
+    parent = np.arange(count + len(seam_y))
+    while True:
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        root_start, root_end = parent[starts], parent[ends]
+        if np.array_equal(root_start, root_end):
+            break
+        np.minimum.at(parent, root_start, root_end)
+        np.minimum.at(parent, root_end, root_start)
+
+    left, top, right, bottom, areas = (np.concatenate([values, extra]) for values, extra in zip(
+        bounds, (seam_x, seam_y, seam_x + 1, seam_y + 1, np.ones(len(seam_y), dtype=bounds[4].dtype))
+    ))
+    node_class = np.concatenate([owner_class, seam_class])
+    np.minimum.at(left, parent, left.copy())
+    np.minimum.at(top, parent, top.copy())
+    np.maximum.at(right, parent, right.copy())
+    np.maximum.at(bottom, parent, bottom.copy())
+    merged = np.zeros_like(areas)
+    np.add.at(merged, parent, areas)
+    roots = np.flatnonzero(parent == np.arange(len(parent)))
+    return left[roots], top[roots], right[roots], bottom[roots], merged[roots], node_class[roots]
@@ -0,0 +1,301 @@
+"""
+Конвейер обработки кадров: захват, обнаружение и отображение в отдельных потоках.
+
+Стадии связаны ограниченными очередями. Для живого экрана действует политика
+"побеждает последний кадр": если следующая стадия не успевает, старый кадр
+из очереди выбрасывается, и обнаружение всегда работает с самым свежим кадром.
+Для записанных сессий кадры по умолчанию не выбрасываются, чтобы был обработан каждый.
+
+Отображение (рисование визуализации, cv2.imshow, опрос клавиш) выполняется
+в вызывающем потоке, так как окна OpenCV должны обслуживаться потоком,
+который их создал. Поток обнаружения не рисует и передает дальше только
+кадр и DetectionResult.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from frame_scheduler import FrameScheduler
+
+
+class LatestFrameQueue:
+    """Ограниченная потокобезопасная очередь с вытеснением самых старых элементов"""
+
+    def __init__(self, name, maxsize=1, drop_oldest=True, on_drop=None):
+        """
+        Args:
+            name (str): Имя очереди для статистики
+            maxsize (int): Максимальная глубина очереди
+            drop_oldest (bool): Выбрасывать самый старый элемент при переполнении
+                                (иначе put ждет освобождения места)
+            on_drop (callable | None): Вызывается с выброшенным элементом
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+        self.items = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # Счетчики для статистики
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        """
+        Положить элемент в очередь
+
+        Returns:
+            bool: False, если очередь уже закрыта
+        """
+        with self.condition:
+            while not self.drop_oldest and len(self.items) >= self.maxsize and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return False
+            if len(self.items) >= self.maxsize:
+                dropped = self.items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped)
+            self.items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Взять самый старый элемент очереди
+
+        Returns:
+            Элемент очереди или None, если истек таймаут или очередь закрыта и пуста
+        """
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self.items:
+                if self.closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            item = self.items.popleft()
+            self.get_count += 1
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        """Закрыть очередь: новые элементы не принимаются, ожидающие потоки просыпаются"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def is_drained(self):
+        """Очередь закрыта и все элементы из нее забраны"""
+        with self.condition:
+            return self.closed and not self.items
+
+    def depth(self):
+        """Текущая глубина очереди"""
+        with self.condition:
+            return len(self.items)
+
+    def stats(self):
+        """Статистика очереди"""
+        with self.condition:
+            return {
+                "depth": len(self.items),
+                "max_depth": self.max_depth,
+                "put": self.put_count,
+                "get": self.get_count,
+                "dropped": self.dropped,
+            }
+
+
+class DetectionPipeline:
+    """Конвейер захват -> обнаружение -> отображение для GameDetector"""
+
+    def __init__(self, detector, queue_size=1, drop_frames=None, scheduler=None):
+        """
+        Args:
+            detector (GameDetector): Детектор, чьи методы выполняют стадии
+            queue_size (int): Глубина очередей между стадиями
+            drop_frames (bool | None): Политика "побеждает последний кадр"
+                                       (по умолчанию - только для живого экрана)
+            scheduler (FrameScheduler): Планировщик, задающий темп захвата
+                                        (по умолчанию - без ограничения)
+        """
+        self.detector = detector
+        self.scheduler = scheduler if scheduler is not None else FrameScheduler(0)
+        if drop_frames is None:
+            drop_frames = detector.frame_source.is_live
+
+        # Кадр из кольца буферов источника должен пережить все стадии:
+        # захват, очередь, обнаружение, очередь, отображение. Поток захвата удерживает
+        # буфер кадра, а отпускает его стадия отображения или очередь, выбросившая кадр;
+        # кольцо не пишет в удерживаемые буферы
+        self.ring = getattr(detector.frame_source, "ring", None)
+        if self.ring is not None:
+            self.ring.ensure_slots(2 * queue_size + 4)
+
+        self.capture_queue = LatestFrameQueue("capture", queue_size, drop_frames,
+                                              on_drop=lambda item: self.release(item[0]))
+        self.render_queue = LatestFrameQueue("render", queue_size, drop_frames,
+                                             on_drop=lambda item: self.release(item[0]))
+
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.start_time = None
+        self.captured = 0
+        self.detected = 0
+        self.rendered = 0
+        self.capture_failures = 0
+
+    def release(self, frame):
+        """Отпустить буфер кадра, прошедшего конвейер или выброшенного из очереди"""
+        if self.ring is not None:
+            self.ring.release(frame)
+
+    def start(self):
+        """Запустить потоки захвата и обнаружения"""
+        self.start_time = time.time()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._detect_loop, name="detect", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Остановить конвейер и дождаться завершения потоков"""
+        self.stop_event.set()
+        self.capture_queue.close()
+        self.render_queue.close()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+
+    def _capture_loop(self):
+        detector = self.detector
+        scheduler = self.scheduler
+        window_check_counter = 0
+        while not self.stop_event.is_set():
+            try:
+                scheduler.begin_frame()
+
+                # Периодически проверяем, существует ли еще окно
+                window_check_counter += 1
+                if detector.frame_source.is_live and window_check_counter >= 500:
+                    window_check_counter = 0
+                    detector.check_window_alive()
+
+                frame = detector.capture_screen()
+                if frame is None:
+                    if detector.frame_source.exhausted:
+                        break
+                    self.capture_failures += 1
+                    scheduler.wait_after_failure()
+                    continue
+
+                self.captured += 1
+                detector.stage_timers.end_frame()
+                if self.ring is not None:
+                    self.ring.hold(frame)
+                # Время кадра берется сразу: источник к обнаружению успеет прочитать следующий
+                if not self.capture_queue.put((frame, detector.frame_source.timestamp)):
+                    self.release(frame)
+                    break
+
+                # Темп захвата задает планировщик
+                scheduler.end_frame()
+            except Exception as e:
+                logging.error(f"Ошибка в потоке захвата: {e}")
+                scheduler.wait_after_failure()
+        self.capture_queue.close()
+
+    def _detect_loop(self):
+        detector = self.detector
+        while not self.stop_event.is_set():
+            item = self.capture_queue.get()
+            if item is None:
+                if self.capture_queue.is_drained():
+                    break
+                continue
+            frame, timestamp = item
+            try:
+                # Поток обнаружения не рисует: кадр и результат уходят стадии отображения
+                result = detector.detect(frame, timestamp)
+                self.detected += 1
+                detector.stage_timers.end_frame()
+                if not self.render_queue.put((frame, result)):
+                    self.release(frame)
+            except Exception as e:
+                self.release(frame)
+                logging.error(f"Ошибка в потоке обнаружения: {e}")
+        self.render_queue.close()
+
+    def run_ui(self, stats_interval=10.0):
+        """
+        Цикл стадии отображения (выполняется в вызывающем потоке)
+
+        Работает, пока детектор не остановлен и конвейер не исчерпал кадры.
+
+        Args:
+            stats_interval (float): Период записи статистики конвейера в журнал, с
+        """
+        detector = self.detector
+        last_stats_time = time.time()
+        while detector.running:
+            if time.time() - last_stats_time >= stats_interval:
+                last_stats_time = time.time()
+                logging.info(f"Конвейер: {self.format_stats()}")
+            item = self.render_queue.get(timeout=0.05)
+            try:
+                if item is not None:
+                    frame, result = item
+                    try:
+                        # Визуализация рисуется, только если ее показываем
+                        if detector.show_visualization:
+                            detector.display_visualization(detector.render(frame, result, draw_in_place=True))
+                            self.rendered += 1
+                            detector.stage_timers.end_frame()
+                    finally:
+                        self.release(frame)
+                elif self.render_queue.is_drained():
+                    print("Источник кадров исчерпан.")
+                    break
+                detector.poll_console_keys()
+            except Exception as e:
+                logging.error(f"Ошибка в потоке отображения: {e}")
+
+    def stats(self):
+        """Статистика стадий: счетчики кадров, глубина очередей и выброшенные кадры"""
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        fps = self.detected / elapsed if elapsed > 0 else 0.0
+        return {
+            "elapsed": elapsed,
+            "fps": fps,
+            "captured": self.captured,
+            "capture_failures": self.capture_failures,
+            "detected": self.detected,
+            "rendered": self.rendered,
+            "capture_queue": self.capture_queue.stats(),
+            "render_queue": self.render_queue.stats(),
+        }
+
+    def format_stats(self):
+        """Статистика конвейера одной строкой"""
+        stats = self.stats()
+        capture_queue = stats["capture_queue"]
+        render_queue = stats["render_queue"]
+        return (f"захвачено: {stats['captured']}, обработано: {stats['detected']}, "
+                f"показано: {stats['rendered']}, {stats['fps']:.1f} FPS | "
+                f"очередь захвата: глубина {capture_queue['depth']}/{capture_queue['max_depth']}, "
+                f"выброшено {capture_queue['dropped']} | "
+                f"очередь отображения: глубина {render_queue['depth']}/{render_queue['max_depth']}, "
+                f"выброшено {render_queue['dropped']}")
@@ -0,0 +1,374 @@
+"""
+Обнаружение в пуле процессов с передачей кадров через разделяемую память.
+
+Операции OpenCV частично отпускают GIL, но обвязка обнаружения на Python -
+нет, поэтому для загрузки нескольких ядер нужны процессы. Пересылать кадры
+размером в мегабайты через pickle слишком дорого, поэтому источник кадров
+пишет их прямо в кольцо буферов в разделяемой памяти (SharedFrameRing),
+а процессу-обработчику уходит только короткое описание: имя блока, смещение
+и форма кадра. Обработчик один раз подключается к блоку и читает кадр без
+копирования. Обратно возвращается только компактный DetectionResult.
+Когда размер кадра меняется, блоки прежнего размера удаляются, как только
+обработаны все их кадры, и обработчики отключаются от них.
+
+Кадры одного источника раздаются разным процессам, поэтому обработчики
+просматривают каждый кадр целиком и независимо: слежение, инкрементальный
+просмотр и пропуск неизменившихся кадров в них отключены. Позиции, флаги
+ловушек и уведомления обновляет главный процесс в порядке кадров
+(GameDetector.apply_result).
+"""
+
+import collections
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from capture_buffer import SharedFrameRing, attach_frame
+from event_bus import EventBus
+from frame_scheduler import FrameScheduler
+from frame_source import FrameSource
+
+# Режимы, которые хранят состояние между кадрами и поэтому не работают,
+# когда соседние кадры обрабатывают разные процессы
+WORKER_OVERRIDES = {
+    "tracking_enabled": False,
+    "incremental": False,
+    "skip_unchanged": False,
+    "motion_model": False,
+    "show_visualization": False,
+}
+
+# Эти режимы в процессах-обработчиках выключены, но выполняются в главном процессе
+MAIN_PROCESS_MODES = ("motion_model", "show_visualization")
+
+
+class SilentNotification:
+    """Уведомления процесса-обработчика не показываются: их показывает главный процесс"""
+
+    def __init__(self, title="GameDetector"):
+        self.title = title
+
+    def show(self, message, bg_color="#3366FF", fg_color="white"):
+        pass
+
+    def close(self):
+        pass
+
+
+def worker_main(detector_class, settings, tasks, results):
+    """
+    Цикл процесса-обработчика
+
+    Args:
+        detector_class: Класс детектора (GameDetector)
+        settings (dict): Начальные настройки обнаружения (GameDetector.settings())
+        tasks: Очередь заданий этого процесса
+        results: Общая очередь результатов
+    """
+    # Фоновый поток журнала работает только в главном процессе (после fork его очередь
+    # здесь никто не читает), поэтому обработчик пишет лишь предупреждения в stderr
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.WARNING)
+
+    detector = detector_class(frame_source=FrameSource())
+    detector.notification = SilentNotification()
+    # Переходы состояния публикует главный процесс (apply_result), у обработчика подписчиков нет
+    detector.events.close()
+    detector.events = EventBus()
+    detector.apply_settings(settings)
+    blocks = {}
+    frame = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if task[0] == "settings":
+                detector.apply_settings(task[1])
+                continue
+            if task[0] == "forget":
+                # Главный процесс удалил блоки прежнего размера: кадров из них больше не будет
+                for name in task[1]:
+                    block = blocks.pop(name, None)
+                    if block is not None:
+                        try:
+                            block.close()
+                        except BufferError:
+                            pass
+                continue
+
+            _, sequence, name, offset, shape = task
+            try:
+                frame = attach_frame(blocks, name, offset, shape)
+                result = detector.detect(frame)
+                results.put((sequence, result, None))
+            except Exception as e:
+                results.put((sequence, None, f"{type(e).__name__}: {e}"))
+            frame = None
+    finally:
+        frame = None
+        for block in blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                pass
+        detector.frame_source.close()
+        detector.events.close()
+
+
+class ProcessDetectionPool:
+    """Захват в главном процессе, обнаружение - в пуле процессов"""
+
+    def __init__(self, detector, workers=None, depth=2, scheduler=None):
+        """
+        Args:
+            detector (GameDetector): Детектор главного процесса (источник кадров,
+                                     настройки, состояние и отображение)
+            workers (int | None): Число процессов (по умолчанию - по числу ядер)
+            depth (int): Сколько кадров может ждать в очереди каждого процесса
+            scheduler (FrameScheduler): Планировщик, задающий темп захвата
+                                        (по умолчанию - без ограничения)
+        """
+        self.detector = detector
+        self.workers = workers or os.cpu_count() or 1
+        self.scheduler = scheduler if scheduler is not None else FrameScheduler(0)
+        self.max_in_flight = self.workers * depth
+
+        # Кадр остается в кольце, пока его обрабатывают и пока главный процесс
+        # его показывает: все кадры в работе плюс захватываемый и отображаемый
+        self.ring = SharedFrameRing(self.max_in_flight + 2)
+        self.source_ring = None
+
+        self.processes = []
+        self.task_queues = []
+        self.results = None
+        self.in_flight = []
+        self.pending = collections.deque()  # (номер кадра, кадр, процесс, время кадра) в порядке захвата
+        self.finished = {}                  # номер кадра -> (результат, ошибка)
+        self.settings_key = None
+
+        self.start_time = None
+        self.sequence = 0
+        self.captured = 0
+        self.copied = 0
+        self.detected = 0
+        self.rendered = 0
+        self.errors = 0
+        self.capture_failures = 0
+
+    def start(self):
+        """Подключить кольцо в разделяемой памяти к источнику и запустить процессы"""
+        source = self.detector.frame_source
+        ring = getattr(source, "ring", None)
+        if ring is not None:
+            # Источник пишет кадры сразу в разделяемую память
+            if ring.shape is not None:
+                self.ring.resize(ring.shape[1], ring.shape[0])
+            self.source_ring = ring
+            source.ring = self.ring
+
+        disabled = [name for name, value in WORKER_OVERRIDES.items()
+                    if name not in MAIN_PROCESS_MODES and getattr(self.detector, name) != value]
+        if disabled:
+            logging.warning(f"В режиме процессов кадры обрабатываются независимо, отключено: {', '.join(disabled)}")
+
+        settings = self.worker_settings()
+        self.results = multiprocessing.Queue()
+        for index in range(self.workers):
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=worker_main, name=f"detect-{index}", daemon=True,
+                args=(type(self.detector), settings, tasks, self.results),
+            )
+            process.start()
+            self.task_queues.append(tasks)
+            self.processes.append(process)
+            self.in_flight.append(0)
+        self.settings_key = self._settings_key(settings)
+        self.start_time = time.time()
+        logging.info(f"Запущено процессов обнаружения: {self.workers}")
+
+    def stop(self):
+        """Остановить процессы и освободить разделяемую память"""
+        for tasks in self.task_queues:
+            try:
+                tasks.put(None)
+            except Exception:
+                pass
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.task_queues = []
+        self.pending.clear()
+        self.finished.clear()
+        if self.source_ring is not None:
+            self.detector.frame_source.ring = self.source_ring
+            self.source_ring = None
+        self.ring.close()
+
+    def worker_settings(self):
+        """Настройки главного детектора для процессов-обработчиков"""
+        settings = self.detector.settings()
+        settings.update(WORKER_OVERRIDES)
+        return settings
+
+    @staticmethod
+    def _settings_key(settings):
+        return tuple((name, value.tobytes() if hasattr(value, "tobytes") else value)
+                     for name, value in sorted(settings.items()))
+
+    def sync_settings(self):
+        """Разослать процессам настройки, если они изменились (например, после калибровки)"""
+        settings = self.worker_settings()
+        key = self._settings_key(settings)
+        if key != self.settings_key:
+            self.settings_key = key
+            for tasks in self.task_queues:
+                tasks.put(("settings", settings))
+
+    def submit(self, frame):
+        """Отдать кадр наименее загруженному процессу"""
+        location = self.ring.locate(frame)
+        if location is None:
+            # Источник без кольца буферов (например, папка с кадрами): одна копия в разделяемую память
+            shared = self.ring.next_like(frame)
+            shared[...] = frame
+            frame = shared
+            location = self.ring.locate(frame)
+            self.copied += 1
+
+        worker = min(range(self.workers), key=self.in_flight.__getitem__)
+        self.in_flight[worker] += 1
+        self.pending.append((self.sequence, frame, worker, self.detector.frame_source.timestamp))
+        self.task_queues[worker].put(("frame", self.sequence, location[0], location[1], frame.shape))
+        self.sequence += 1
+
+    def collect(self, block):
+        """
+        Забрать готовые результаты из очереди
+
+        Args:
+            block (bool): Ждать хотя бы одного результата
+        """
+        while True:
+            try:
+                sequence, result, error = self.results.get(timeout=0.5 if block else 0)
+            except queue.Empty:
+                if not block:
+                    return
+                dead = [process.name for process in self.processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Процессы обнаружения завершились: {', '.join(dead)}")
+                continue
+            self.finished[sequence] = (result, error)
+            block = False
+
+    def run_ui(self, stats_interval=10.0):
+        """
+        Цикл захвата и отображения (выполняется в главном процессе)
+
+        Работает, пока детектор не остановлен и источник не исчерпан.
+
+        Args:
+            stats_interval (float): Период записи статистики в журнал, с
+        """
+        detector = self.detector
+        scheduler = self.scheduler
+        capturing = True
+        window_check_counter = 0
+        last_stats_time = time.time()
+        while detector.running:
+            if time.time() - last_stats_time >= stats_interval:
+                last_stats_time = time.time()
+                logging.info(f"Процессы: {self.format_stats()}")
+
+            captured = False
+            if capturing and len(self.pending) < self.max_in_flight:
+                scheduler.begin_frame()
+                window_check_counter += 1
+                if detector.frame_source.is_live and window_check_counter >= 500:
+                    window_check_counter = 0
+                    detector.check_window_alive()
+
+                frame = detector.capture_screen()
+                if frame is None:
+                    if detector.frame_source.exhausted:
+                        capturing = False
+                    else:
+                        self.capture_failures += 1
+                        scheduler.wait_after_failure()
+                else:
+                    self.sync_settings()
+                    self.submit(frame)
+                    self.captured += 1
+                    captured = True
+
+            if not capturing and not self.pending:
+                print("Источник кадров исчерпан.")
+                break
+
+            # Ждем результат, только если захватывать больше нечего или все процессы заняты
+            self.collect(block=not captured and (not capturing or len(self.pending) >= self.max_in_flight))
+            self.handle_finished()
+            self.release_retired_blocks()
+            detector.poll_console_keys()
+            detector.stage_timers.end_frame()
+            if captured:
+                scheduler.end_frame()
+
+    def handle_finished(self):
+        """Обработать готовые результаты в порядке кадров"""
+        detector = self.detector
+        while self.pending and self.pending[0][0] in self.finished:
+            sequence, frame, worker, timestamp = self.pending.popleft()
+            result, error = self.finished.pop(sequence)
+            self.in_flight[worker] -= 1
+            if error is not None:
+                self.errors += 1
+                logging.error(f"Ошибка в процессе обнаружения: {error}")
+                continue
+
+            result = detector.apply_result(result, timestamp)
+            self.detected += 1
+            # Стадии внутри обработчика не видны главному процессу, учитывается обнаружение целиком
+            detector.stage_timers.add("detect", result.timings.get("detect_ms", 0.0) / 1000.0)
+            if detector.show_visualization:
+                # Кадр еще лежит в кольце: после него захвачено не больше max_in_flight кадров
+                detector.display_visualization(detector.render(frame, result, draw_in_place=True))
+                self.rendered += 1
+
+    def release_retired_blocks(self):
+        """Удалить блоки кольца прежнего размера, когда их кадры обработаны, и отключить от них процессы"""
+        names = self.ring.release_unused(frame for _, frame, _, _ in self.pending)
+        if names:
+            for tasks in self.task_queues:
+                tasks.put(("forget", names))
+
+    def stats(self):
+        """Статистика пула: счетчики кадров и загрузка процессов"""
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        return {
+            "elapsed": elapsed,
+            "fps": self.detected / elapsed if elapsed > 0 else 0.0,
+            "workers": self.workers,
+            "captured": self.captured,
+            "copied": self.copied,
+            "capture_failures": self.capture_failures,
+            "detected": self.detected,
+            "rendered": self.rendered,
+            "errors": self.errors,
+            "in_flight": len(self.pending),
+        }
+
+    def format_stats(self):
+        """Статистика пула одной строкой"""
+        stats = self.stats()
+        return (f"процессов: {stats['workers']}, захвачено: {stats['captured']} "
+                f"(скопировано в общую память: {stats['copied']}), обработано: {stats['detected']}, "
+                f"показано: {stats['rendered']}, ошибок: {stats['errors']}, {stats['fps']:.1f} FPS")
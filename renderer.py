@@ -0,0 +1,268 @@
+"""
+Отрисовка визуализации по результату обнаружения.
+
+Стадия отображения отделена от ядра обнаружения: GameDetector.detect только
+находит объекты и возвращает DetectionResult, а рамки, подписи, подсказки и
+список окон рисует DetectionRenderer. Если визуализация выключена, рендерер
+не вызывается вовсе и рисование ничего не стоит.
+
+Неизменные элементы интерфейса (подсказки, заголовок окна, предупреждения,
+список окон) растеризуются один раз в небольшие слои с масками и пересоздаются
+только при изменении содержимого. На каждом кадре слои лишь накладываются
+на свои небольшие области кадра.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class OverlayLayer:
+    """
+    Заранее растеризованный слой интерфейса
+
+    Слой хранит небольшое изображение, маску прозрачности и положение в кадре.
+    Полупрозрачная подложка (если есть) затемняет свою область. Наложение
+    затрагивает только область слоя.
+    """
+
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+    def __init__(self, key, lines, backdrop=None, backdrop_alpha=0.0):
+        """
+        Args:
+            key: Содержимое слоя; слой пересоздается, когда ключ меняется
+            lines (list): Строки (текст, (x, y) в кадре, масштаб, цвет, толщина)
+            backdrop (tuple | None): Прямоугольник подложки (x0, y0, x1, y1) в кадре
+            backdrop_alpha (float): Непрозрачность черной подложки
+        """
+        self.key = key
+
+        # Область слоя - объединение рамок всех строк и подложки
+        rects = [backdrop] if backdrop else []
+        for text, (x, y), scale, _, thickness in lines:
+            (width, height), baseline = cv2.getTextSize(text, self.FONT, scale, thickness)
+            rects.append((x - thickness, y - height - thickness, x + width + thickness, y + baseline + thickness))
+        if not rects:
+            rects = [(0, 0, 0, 0)]
+        x0, y0 = min(r[0] for r in rects), min(r[1] for r in rects)
+        x1, y1 = max(r[2] for r in rects), max(r[3] for r in rects)
+        self.x, self.y = x0, y0
+
+        # Текст рисуется на черном фоне, поэтому изображение слоя уже умножено на его
+        # прозрачность (со сглаживанием краев), и наложение сводится к
+        # кадр * (1 - прозрачность) + изображение слоя
+        self.image = np.zeros((max(0, y1 - y0), max(0, x1 - x0), 3), dtype=np.uint8)
+        alpha = np.zeros(self.image.shape[:2], dtype=np.uint8)
+        for text, (x, y), scale, color, thickness in lines:
+            org = (x - x0, y - y0)
+            cv2.putText(self.image, text, org, self.FONT, scale, color, thickness)
+            cv2.putText(alpha, text, org, self.FONT, scale, 255, thickness)
+
+        # Доля кадра, остающаяся под слоем; подложка затемняет свою область
+        keep = 255.0 - alpha
+        if backdrop:
+            bx0, by0, bx1, by1 = backdrop
+            keep[max(0, by0 - y0):by1 - y0, max(0, bx0 - x0):bx1 - x0] *= 1.0 - backdrop_alpha
+        self.keep = cv2.merge([np.round(keep).astype(np.uint8)] * 3)
+
+    def composite(self, visualization):
+        """Наложить слой на кадр (с обрезкой по границам кадра)"""
+        height, width = self.image.shape[:2]
+        frame_height, frame_width = visualization.shape[:2]
+        x0, y0 = max(self.x, 0), max(self.y, 0)
+        x1, y1 = min(self.x + width, frame_width), min(self.y + height, frame_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        region = visualization[y0:y1, x0:x1]
+        layer_slice = (slice(y0 - self.y, y1 - self.y), slice(x0 - self.x, x1 - self.x))
+        cv2.multiply(region, self.keep[layer_slice], dst=region, scale=1 / 255.0)
+        cv2.add(region, self.image[layer_slice], dst=region)
+
+
+class DetectionRenderer:
+    """Рисование рамок объектов и интерфейса поверх кадра"""
+
+    PLAYER_COLOR = (255, 0, 255)
+    TARGET_COLOR = (0, 255, 0)
+    TRAP_COLOR = (0, 0, 255)
+    VELOCITY_ARROW_SECONDS = 0.25
+
+    def __init__(self, detector):
+        """
+        Args:
+            detector (GameDetector): Детектор, из которого берется состояние интерфейса
+                                     (заголовок окна, список окон, флаги отображения)
+        """
+        self.detector = detector
+        # Показывать уменьшенные маски классов в правом нижнем углу
+        self.show_masks = False
+        # Показывать таймеры стадий в правом верхнем углу
+        self.show_timers = False
+        # Кэш растеризованных слоев интерфейса по именам
+        self.layers = {}
+        self.layer_builds = 0
+
+    def wants_masks(self):
+        """Нужны ли рендереру маски классов (иначе детектор их не сохраняет)"""
+        return self.show_masks
+
+    def render(self, frame, result, draw_in_place=False):
+        """
+        Нарисовать визуализацию результата обнаружения
+
+        Args:
+            frame (numpy.ndarray): Кадр, на котором выполнялось обнаружение
+            result (DetectionResult): Результат обнаружения
+            draw_in_place (bool): Рисовать прямо на кадре, без копирования.
+                                  Подходит для кадров из кольца буферов источника, которые
+                                  после обнаружения больше никем не читаются.
+
+        Returns:
+            numpy.ndarray: Кадр визуализации
+        """
+        visualization = frame if draw_in_place else frame.copy()
+        vis_height = visualization.shape[0]
+        detector = self.detector
+
+        self.draw_objects(visualization, result)
+
+        # Строка с позициями меняется каждый кадр, остальной интерфейс берется из кэша слоев
+        info_text = (f"Игрок: {result.player_position}, Цель: {result.target_position}, "
+                     f"Ловушек: {len(result.trap_boxes)}")
+        cv2.putText(visualization, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        if result.is_in_trap:
+            self.layer("trap_warning", None, self.build_trap_warning).composite(visualization)
+        if result.target_reached:
+            self.layer("target_reached", None, self.build_target_reached).composite(visualization)
+        self.layer("window_title", detector.window_title, self.build_window_title).composite(visualization)
+        self.layer("controls", vis_height, self.build_controls).composite(visualization)
+
+        if self.show_masks and result.masks is not None:
+            self.draw_masks(visualization, result.masks)
+
+        if self.show_timers and detector.stage_timers.enabled:
+            # Перцентили меняются каждый кадр, поэтому слой пересоздается два раза в секунду
+            key = (int(time.monotonic() * 2), visualization.shape[1])
+            self.layer("stage_timers", key, self.build_stage_timers).composite(visualization)
+
+        if detector.show_window_list:
+            key = (tuple(title for _, title in detector.available_windows),
+                   detector.current_window_index, vis_height)
+            self.layer("window_list", key, self.build_window_list).composite(visualization)
+        return visualization
+
+    def layer(self, name, key, builder):
+        """
+        Получить слой из кэша, пересоздав его, если изменилось содержимое
+
+        Args:
+            name (str): Имя слоя
+            key: Содержимое слоя (заголовок, список окон, высота кадра и т.п.)
+            builder: Функция key -> OverlayLayer
+        """
+        layer = self.layers.get(name)
+        if layer is None or layer.key != key:
+            layer = builder(key)
+            self.layers[name] = layer
+            self.layer_builds += 1
+        return layer
+
+    def class_color(self, name, default):
+        """Цвет рамки класса из реестра классов детектора (object_classes.py)"""
+        classes = getattr(self.detector, "object_classes", None)
+        if classes is None or name not in classes:
+            return default
+        return classes.get(name).color
+
+    def draw_objects(self, visualization, result):
+        """Рамки и подписи персонажа, цели, ловушек и объектов дополнительных классов"""
+        player_color = self.class_color("player", self.PLAYER_COLOR)
+        trap_color = self.class_color("trap", self.TRAP_COLOR)
+        labelled = (("Player", result.player_box, player_color),
+                    ("Target", result.target_box, self.class_color("target", self.TARGET_COLOR)))
+        for label, box, color in labelled:
+            if box:
+                x, y, w, h = box
+                if label == "Player" and result.player_predicted:
+                    # Персонаж не найден, рамка предсказана моделью движения
+                    cv2.rectangle(visualization, (x, y), (x + w, y + h), color, 1)
+                    label = "Player (predicted)"
+                else:
+                    cv2.rectangle(visualization, (x, y), (x + w, y + h), color, 2)
+                cv2.putText(visualization, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        if result.player_velocity and result.player_position:
+            # Стрелка - куда персонаж сместится за VELOCITY_ARROW_SECONDS
+            x, y = result.player_position
+            vx, vy = result.player_velocity
+            end = (int(x + vx * self.VELOCITY_ARROW_SECONDS), int(y + vy * self.VELOCITY_ARROW_SECONDS))
+            cv2.arrowedLine(visualization, (int(x), int(y)), end, player_color, 2, tipLength=0.3)
+            # Точка - позиция персонажа на момент отрисовки по модели движения (между обнаружениями)
+            now = self.detector.predicted_player_position()
+            if now:
+                cv2.circle(visualization, now, 4, player_color, -1)
+
+        ids = result.trap_ids.tolist() if result.trap_ids is not None else [None] * len(result.trap_boxes)
+        for (x, y, w, h), trap_id in zip(result.trap_boxes.tolist(), ids):
+            label = f"Trap #{trap_id}" if trap_id is not None else "Trap"
+            cv2.rectangle(visualization, (x, y), (x + w, y + h), trap_color, 2)
+            cv2.putText(visualization, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, trap_color, 2)
+
+        for name, boxes in result.objects.items():
+            color = self.class_color(name, (255, 255, 255))
+            for x, y, w, h in boxes.tolist():
+                cv2.rectangle(visualization, (x, y), (x + w, y + h), color, 2)
+                cv2.putText(visualization, name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+    def draw_masks(self, visualization, masks):
+        """Уменьшенные маски (ловушки, цель, персонаж) в правом нижнем углу"""
+        vis_height, vis_width = visualization.shape[:2]
+        combined_mask = cv2.merge(masks)
+        mask_resized = cv2.resize(combined_mask, (vis_width // 3, vis_height // 3),
+                                  interpolation=cv2.INTER_NEAREST)
+        # Значения масок равны битам классов, для наглядности растягиваем их до 255
+        mask_resized[mask_resized > 0] = 255
+        visualization[vis_height - mask_resized.shape[0]:vis_height,
+                      vis_width - mask_resized.shape[1]:vis_width] = mask_resized
+
+    def build_trap_warning(self, key):
+        return OverlayLayer(key, [("ВНИМАНИЕ: ИГРОК В ЛОВУШКЕ!", (10, 60), 0.7, (0, 0, 255), 2)])
+
+    def build_target_reached(self, key):
+        return OverlayLayer(key, [("ЦЕЛЬ ДОСТИГНУТА!", (10, 90), 0.7, (0, 255, 0), 2)])
+
+    def build_window_title(self, window_title):
+        return OverlayLayer(window_title, [(f"Окно: {window_title}", (10, 120), 0.6, (255, 255, 255), 2)])
+
+    def build_controls(self, vis_height):
+        """Подсказки по управлению внизу кадра"""
+        return OverlayLayer(vis_height, [
+            ("ESC: выход | V: вкл/выкл визуализацию | C: калибровка | S: сохранить",
+             (10, vis_height - 40), 0.5, (255, 255, 255), 1),
+            ("W: следующее окно | Q: предыдущее окно | L: список окон | T: таймеры | D: выгрузка таймеров",
+             (10, vis_height - 20), 0.5, (255, 255, 255), 1),
+        ])
+
+    def build_stage_timers(self, key):
+        """Таймеры стадий (среднее, p95, p99) на полупрозрачной подложке у правого края"""
+        _, vis_width = key
+        lines = self.detector.stage_timers.format_lines() or ["нет замеров"]
+        x = max(0, vis_width - 330)
+        rows = [(line, (x + 10, 20 + i * 18), 0.45, (255, 255, 255), 1) for i, line in enumerate(lines)]
+        return OverlayLayer(key, rows, backdrop=(x, 0, vis_width, len(lines) * 18 + 12), backdrop_alpha=0.6)
+
+    def build_window_list(self, key):
+        """Полупрозрачный список доступных окон с выделением текущего"""
+        titles, current_index, _ = key
+        lines = [("Доступные окна (Q/W для выбора):", (10, 20), 0.5, (255, 255, 255), 1)]
+        for i, title in enumerate(titles):
+            # Укорачиваем слишком длинные заголовки
+            display_title = title[:40] + "..." if len(title) > 40 else title
+            color = (0, 255, 0) if i == current_index else (200, 200, 200)
+            lines.append((f"{i+1}. {display_title}", (10, 40 + i * 20), 0.5, color, 1))
+        # Прозрачность подложки 0.7, как у прежнего наложения через addWeighted
+        return OverlayLayer(key, lines, backdrop=(0, 0, 400, len(titles) * 20 + 40), backdrop_alpha=0.7)
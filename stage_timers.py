@@ -0,0 +1,227 @@
+"""
+Замеры времени стадий обработки кадра.
+
+Стадии (захват, перевод в HSV, разметка цветов, поиск пятен, проверки
+столкновений, отрисовка, показ окна) отмечают свое время через StageTimers.
+Время стадии суммируется в пределах кадра и в конце кадра попадает
+в гистограмму стадии:
+
+- скользящее окно последних значений - для перцентилей в наложении на экран;
+- накопительные корзины, сумма и количество - для выгрузки в текстовом
+  формате экспозиции Prometheus (его читают node_exporter textfile collector
+  и другие сборщики метрик).
+
+Выключенные таймеры почти ничего не стоят: clock() и record() сразу
+возвращают 0 без обращения к часам.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+# Границы корзин гистограмм, с
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class RollingHistogram:
+    """Гистограмма длительностей стадии: скользящее окно и накопительные корзины"""
+
+    def __init__(self, window=300, buckets=BUCKETS):
+        """
+        Args:
+            window (int): Сколько последних значений хранится для перцентилей
+            buckets (tuple): Границы корзин, с
+        """
+        self.buckets = np.asarray(buckets, dtype=np.float64)
+        self.bucket_counts = np.zeros(len(buckets) + 1, dtype=np.int64)  # Последняя - +Inf
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.index = 0
+        self.filled = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        """Добавить длительность, с"""
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        self.filled = min(self.filled + 1, len(self.samples))
+        self.bucket_counts[np.searchsorted(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def window(self):
+        """Значения скользящего окна"""
+        return self.samples[:self.filled]
+
+    def summary(self):
+        """
+        Сводка по скользящему окну
+
+        Returns:
+            dict: Количество, среднее, p50, p95, p99 и максимум в миллисекундах
+        """
+        values = self.window()
+        if not len(values):
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99))
+        return {
+            "count": int(len(values)),
+            "mean_ms": 1000.0 * float(values.mean()),
+            "p50_ms": 1000.0 * float(p50),
+            "p95_ms": 1000.0 * float(p95),
+            "p99_ms": 1000.0 * float(p99),
+            "max_ms": 1000.0 * float(values.max()),
+        }
+
+
+class StageTimers:
+    """Таймеры стадий обработки кадра с гистограммами"""
+
+    # Порядок стадий в наложении и выгрузке
+    STAGES = ("frame", "capture", "detect", "color", "classify", "blobs", "collision", "render", "display")
+
+    def __init__(self, enabled=False, window=300, dump_path="stage_timers.prom", dump_interval=0.0):
+        """
+        Args:
+            enabled (bool): Включить замеры
+            window (int): Размер скользящего окна гистограмм, кадров
+            dump_path (str): Файл для выгрузки в формате экспозиции
+            dump_interval (float): Период автоматической выгрузки, с (0 - только по запросу)
+        """
+        self.enabled = enabled
+        self.window = window
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.histograms = {}
+        self.lock = threading.Lock()
+        # Стадии одного кадра в потоках конвейера идут параллельно,
+        # поэтому время текущего кадра накапливается отдельно в каждом потоке
+        self.local = threading.local()
+        self.last_dump = time.monotonic()
+
+    def clock(self):
+        """Текущее время для начала замера (0, если таймеры выключены)"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def record(self, stage, start):
+        """
+        Добавить ко времени стадии в текущем кадре время с момента start
+
+        Returns:
+            float: Текущее время (начало следующей стадии) или 0, если таймеры выключены
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        current = self._current()
+        current[stage] = current.get(stage, 0.0) + (now - start)
+        return now
+
+    def add(self, stage, seconds):
+        """Добавить ко времени стадии в текущем кадре готовую длительность"""
+        if self.enabled:
+            current = self._current()
+            current[stage] = current.get(stage, 0.0) + seconds
+
+    def end_frame(self):
+        """Перенести время стадий текущего кадра (в этом потоке) в гистограммы"""
+        if not self.enabled:
+            return
+        current = self._current()
+        if current:
+            with self.lock:
+                for stage, seconds in current.items():
+                    histogram = self.histograms.get(stage)
+                    if histogram is None:
+                        histogram = self.histograms[stage] = RollingHistogram(self.window)
+                    histogram.add(seconds)
+            current.clear()
+        if self.dump_interval and time.monotonic() - self.last_dump >= self.dump_interval:
+            self.dump()
+
+    def _current(self):
+        current = getattr(self.local, "current", None)
+        if current is None:
+            current = self.local.current = {}
+        return current
+
+    def reset(self):
+        """Очистить гистограммы"""
+        with self.lock:
+            self.histograms = {}
+
+    def ordered_stages(self):
+        """Стадии с замерами: сначала известные по порядку, затем остальные"""
+        known = [stage for stage in self.STAGES if stage in self.histograms]
+        return known + sorted(stage for stage in self.histograms if stage not in self.STAGES)
+
+    def summary(self):
+        """Сводка по скользящему окну для каждой стадии"""
+        with self.lock:
+            return {stage: self.histograms[stage].summary() for stage in self.ordered_stages()}
+
+    def format_lines(self):
+        """Строки для наложения на экран: стадия, среднее, p95 и p99"""
+        lines = []
+        for stage, stats in self.summary().items():
+            lines.append(f"{stage:<9} {stats['mean_ms']:6.2f} мс  p95 {stats['p95_ms']:6.2f}  "
+                         f"p99 {stats['p99_ms']:6.2f}")
+        return lines
+
+    def format_stats(self):
+        """Сводка одной строкой"""
+        return ", ".join(f"{stage}: {stats['mean_ms']:.2f} мс (p95 {stats['p95_ms']:.2f})"
+                         for stage, stats in self.summary().items())
+
+    def exposition(self, prefix="gamedetector"):
+        """
+        Гистограммы в текстовом формате экспозиции Prometheus
+
+        Returns:
+            str: Накопительная гистограмма <prefix>_stage_seconds и перцентили
+                 скользящего окна <prefix>_stage_window_seconds по стадиям
+        """
+        name = f"{prefix}_stage_seconds"
+        window_name = f"{prefix}_stage_window_seconds"
+        lines = [
+            f"# HELP {name} Time spent in a frame processing stage.",
+            f"# TYPE {name} histogram",
+        ]
+        window_lines = [
+            f"# HELP {window_name} Stage time quantiles over the last {self.window} frames.",
+            f"# TYPE {window_name} gauge",
+        ]
+        with self.lock:
+            for stage in self.ordered_stages():
+                histogram = self.histograms[stage]
+                cumulative = np.cumsum(histogram.bucket_counts)
+                for bound, count in zip(histogram.buckets, cumulative):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+                values = histogram.window()
+                if len(values):
+                    for quantile, value in zip((0.5, 0.95, 0.99), np.percentile(values, (50, 95, 99))):
+                        window_lines.append(f'{window_name}{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+        return "\n".join(lines + window_lines) + "\n"
+
+    def dump(self, path=None):
+        """
+        Записать гистограммы в файл в формате экспозиции
+
+        Файл заменяется атомарно, чтобы сборщик метрик не прочитал его наполовину.
+
+        Returns:
+            str: Путь к файлу
+        """
+        path = path or self.dump_path
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.exposition())
+        os.replace(temporary, path)
+        self.last_dump = time.monotonic()
+        return path
@@ -0,0 +1,224 @@
+"""
+Инкрементальное обнаружение по плиткам.
+
+Кадр делится на плитки tile_size x tile_size. Каждая плитка сравнивается с тем
+же местом предыдущего кадра, и разметка классов пересчитывается только для
+изменившихся плиток. Пятна каждого класса тоже обновляются только там, где
+изменилась маска этого класса:
+
+1. Изменившиеся участки маски расширяются рамками старых пятен, которые их
+   касаются (с зазором в 1 пиксель), пока область не перестанет расти.
+   Соседние области объединяются.
+2. Старые пятна внутри областей удаляются, а connected components в каждой
+   области дают новые пятна.
+
+Пятно, пересекающее границу области, к моменту пересчета целиком входит в нее
+(иначе его рамка расширила бы область), поэтому пятна на стыках плиток
+склеиваются правильно, и результат совпадает с разметкой всего кадра.
+Стоимость зависит от размера изменений, а не от размера окна: проход по всему
+кадру остается только у сравнения с предыдущим кадром.
+"""
+
+import cv2
+import numpy as np
+
+
+class IncrementalScanner:
+    """Разметка кадра и поиск пятен только в изменившихся плитках"""
+
+    def __init__(self, label_frame, classifier, blob_extractor, tile_size=64):
+        """
+        Args:
+            label_frame: Функция разметки кадра (GameDetector.label_frame)
+            classifier (HSVClassifier): Классификатор, чьи биты возвращает label_frame
+            blob_extractor (BlobExtractor): Поиск пятен на маске
+            tile_size (int): Сторона плитки в пикселях
+        """
+        self.label_frame = label_frame
+        self.classifier = classifier
+        self.blob_extractor = blob_extractor
+        self.tile_size = tile_size
+        self.stats = {"frames": 0, "full": 0, "tiles_total": 0, "tiles_dirty": 0,
+                      "pixels_total": 0, "pixels_labelled": 0, "pixels_blobs": 0}
+        self.invalidate()
+
+    def invalidate(self):
+        """Забыть предыдущий кадр: следующий будет размечен целиком"""
+        self.previous = None
+        self.labels = None
+        self.key = None
+        self.blobs = {}
+        self.diff = None
+
+    def scan(self, frame, names, key=None):
+        """
+        Обновить разметку и пятна по новому кадру
+
+        Args:
+            frame (numpy.ndarray): Новый кадр
+            names (tuple): Имена классов, для которых нужны пятна
+            key: Настройки разметки; при их смене кадр размечается целиком
+
+        Returns:
+            dict: Для каждого класса - массивы площадей (N,) и рамок (N, 4) всех пятен
+                  (без отбора по площади)
+        """
+        height, width = frame.shape[:2]
+        self.stats["frames"] += 1
+        self.stats["pixels_total"] += height * width
+        self.stats["tiles_total"] += self._tile_count(height, width)
+
+        if (self.previous is None or self.previous.shape != frame.shape or key != self.key
+                or set(names) != set(self.blobs)):
+            self._full_scan(frame, names, key)
+            return self.blobs
+
+        spans = self._dirty_spans(frame)
+        class_regions = {name: [] for name in names}
+        for x0, y0, x1, y1 in spans:
+            old = self.labels[y0:y1, x0:x1]
+            new = self.label_frame(frame[y0:y1, x0:x1])
+            self.stats["pixels_labelled"] += (x1 - x0) * (y1 - y0)
+
+            # Пятна класса пересчитываются, только если изменилась его маска
+            changed = int(np.bitwise_or.reduce(np.bitwise_xor(old, new), axis=None))
+            if changed:
+                for name in names:
+                    if changed & self.classifier.class_bits.get(name, 0):
+                        class_regions[name].append([x0, y0, x1, y1])
+                old[...] = new
+            self.previous[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+
+        for name, regions in class_regions.items():
+            if regions:
+                self._update_blobs(name, regions, width, height)
+        return self.blobs
+
+    def _tile_count(self, height, width):
+        tile = self.tile_size
+        return -(-height // tile) * -(-width // tile)
+
+    def _full_scan(self, frame, names, key):
+        height, width = frame.shape[:2]
+        self.previous = frame.copy()
+        self.labels = np.array(self.label_frame(frame), copy=True)
+        self.key = key
+        self.blobs = {}
+        for name in names:
+            areas, boxes = self.blob_extractor.stats(self.classifier.mask(self.labels, name), 0)
+            self.blobs[name] = self._sorted(areas, boxes)
+        self.stats["full"] += 1
+        self.stats["tiles_dirty"] += self._tile_count(height, width)
+        self.stats["pixels_labelled"] += height * width
+        self.stats["pixels_blobs"] += height * width * len(names)
+
+    def _dirty_tiles(self, frame):
+        """Сетка флагов изменившихся плиток"""
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        if self.diff is None or self.diff.shape != frame.shape:
+            self.diff = np.empty_like(frame)
+        cv2.absdiff(frame, self.previous, self.diff)
+
+        # Максимум по полосам строк, затем по плиткам внутри полос
+        diff = self.diff.reshape(height, -1)
+        full_rows = height // tile * tile
+        bands = [diff[:full_rows].reshape(-1, tile, diff.shape[1]).max(axis=1)]
+        if full_rows < height:
+            bands.append(diff[full_rows:].max(axis=0, keepdims=True))
+        bands = np.vstack(bands)
+        channels = diff.shape[1] // width
+        return np.maximum.reduceat(bands, np.arange(0, width, tile) * channels, axis=1) > 0
+
+    def _dirty_spans(self, frame):
+        """Изменившиеся плитки, объединенные в горизонтальные отрезки (x0, y0, x1, y1)"""
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        dirty = self._dirty_tiles(frame)
+        self.stats["tiles_dirty"] += int(dirty.sum())
+
+        spans = []
+        for row in np.flatnonzero(dirty.any(axis=1)):
+            # Начала и концы серий подряд идущих изменившихся плиток в строке
+            flags = np.concatenate(([False], dirty[row], [False]))
+            edges = np.flatnonzero(flags[1:] != flags[:-1])
+            y0, y1 = row * tile, min(height, (row + 1) * tile)
+            for start, end in zip(edges[::2], edges[1::2]):
+                spans.append((start * tile, y0, min(width, end * tile), y1))
+        return spans
+
+    def _update_blobs(self, name, regions, width, height):
+        """Пересчитать пятна класса в изменившихся областях"""
+        areas, boxes = self.blobs[name]
+        left, top = boxes[:, 0], boxes[:, 1]
+        right, bottom = left + boxes[:, 2], top + boxes[:, 3]
+
+        # Расширяем области рамками касающихся их старых пятен и объединяем соседние
+        regions = np.array(regions, dtype=np.int64)
+        affected = np.zeros(len(boxes), dtype=bool)
+        while True:
+            touching = ((left[None, :] <= regions[:, 2:3]) & (right[None, :] >= regions[:, 0:1]) &
+                        (top[None, :] <= regions[:, 3:4]) & (bottom[None, :] >= regions[:, 1:2]))
+            grown = regions.copy()
+            for index, hits in enumerate(touching):
+                if hits.any():
+                    grown[index, 0] = min(grown[index, 0], left[hits].min())
+                    grown[index, 1] = min(grown[index, 1], top[hits].min())
+                    grown[index, 2] = max(grown[index, 2], right[hits].max())
+                    grown[index, 3] = max(grown[index, 3], bottom[hits].max())
+            affected |= touching.any(axis=0)
+            grown = self._merge_regions(grown)
+            if len(grown) == len(regions) and np.array_equal(grown, regions):
+                break
+            regions = grown
+
+        new_areas, new_boxes = [areas[~affected]], [boxes[~affected]]
+        for x0, y0, x1, y1 in regions.tolist():
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(width, x1), min(height, y1)
+            region_areas, region_boxes = self.blob_extractor.stats(
+                self.classifier.mask(self.labels[y0:y1, x0:x1], name), 0
+            )
+            region_boxes[:, 0] += x0
+            region_boxes[:, 1] += y0
+            new_areas.append(region_areas)
+            new_boxes.append(region_boxes)
+            self.stats["pixels_blobs"] += (x1 - x0) * (y1 - y0)
+
+        self.blobs[name] = self._sorted(np.concatenate(new_areas), np.concatenate(new_boxes))
+
+    @staticmethod
+    def _sorted(areas, boxes):
+        # Порядок пятен сверху вниз, слева направо не зависит от истории изменений
+        order = np.lexsort((boxes[:, 0], boxes[:, 1]))
+        return areas[order], boxes[order]
+
+    @staticmethod
+    def _merge_regions(regions):
+        """Объединить пересекающиеся или соприкасающиеся области (x0, y0, x1, y1)"""
+        regions = [list(region) for region in regions.tolist()]
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for region in regions:
+                for other in result:
+                    if (region[0] <= other[2] and other[0] <= region[2] and
+                            region[1] <= other[3] and other[1] <= region[3]):
+                        other[0], other[1] = min(other[0], region[0]), min(other[1], region[1])
+                        other[2], other[3] = max(other[2], region[2]), max(other[3], region[3])
+                        merged = True
+                        break
+                else:
+                    result.append(region)
+            regions = result
+        return np.array(regions, dtype=np.int64).reshape(-1, 4)
+
+    def format_stats(self):
+        """Статистика одной строкой"""
+        stats = self.stats
+        tiles = stats["tiles_total"] or 1
+        pixels = stats["pixels_total"] or 1
+        return (f"кадров: {stats['frames']} (целиком: {stats['full']}), "
+                f"изменившихся плиток: {100 * stats['tiles_dirty'] / tiles:.1f}%, "
+                f"размечено пикселей: {100 * stats['pixels_labelled'] / pixels:.1f}%")
@@ -0,0 +1,134 @@
+"""
+Хранение ловушек и векторные проверки столкновений.
+
+Ловушки хранятся как массив (N, 4) с рамками (x, y, w, h). Проверки "точка в
+рамке" и "пересечение рамок" выполняются одной векторной операцией над всем
+массивом. Для карт с большим числом ловушек строится равномерная сетка: запрос
+проверяет только ловушки из ячеек, которых касается точка или рамка.
+
+Границы рамок включаются, как и в исходных проверках GameDetector:
+точка на краю ловушки считается попавшей в нее.
+"""
+
+import numpy as np
+
+
+class TrapIndex:
+    """Набор рамок ловушек с векторными запросами и сеточным индексом"""
+
+    def __init__(self, boxes=None, cell_size=None, grid_threshold=256):
+        """
+        Args:
+            boxes: Рамки (x, y, w, h) - массив (N, 4) или список кортежей
+            cell_size (int | None): Сторона ячейки сетки в пикселях
+                                    (None - удвоенный медианный размер ловушки)
+            grid_threshold (int): С какого числа ловушек строить сетку
+        """
+        self.cell_size = cell_size
+        self.grid_threshold = grid_threshold
+        self.update(boxes)
+
+    def update(self, boxes):
+        """Заменить набор ловушек"""
+        if boxes is None:
+            boxes = np.empty((0, 4), dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.right = self.boxes[:, 0] + self.boxes[:, 2]
+        self.bottom = self.boxes[:, 1] + self.boxes[:, 3]
+        self.grid_cell = None
+        self.grid_keys = None
+        self.grid_traps = None
+        if len(self.boxes) >= self.grid_threshold:
+            self._build_grid()
+
+    def _build_grid(self):
+        boxes = self.boxes
+        cell = self.cell_size
+        if not cell:
+            cell = int(2 * max(1, np.median(np.maximum(boxes[:, 2], boxes[:, 3]))))
+        self.grid_cell = cell
+
+        # Диапазоны ячеек, которых касается каждая ловушка (с учетом включенных границ)
+        cx0 = boxes[:, 0] // cell
+        cy0 = boxes[:, 1] // cell
+        nx = self.right // cell - cx0 + 1
+        ny = self.bottom // cell - cy0 + 1
+        self.grid_width = int(self.right.max() // cell + 1)
+
+        # Разворачиваем пары (ловушка, ячейка) без цикла по ловушкам
+        counts = nx * ny
+        trap_ids = np.repeat(np.arange(len(boxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells_x = cx0[trap_ids] + local % nx[trap_ids]
+        cells_y = cy0[trap_ids] + local // nx[trap_ids]
+        keys = cells_y.astype(np.int64) * self.grid_width + cells_x
+
+        order = np.argsort(keys, kind="stable")
+        self.grid_keys = keys[order]
+        self.grid_traps = trap_ids[order]
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Индексы ловушек из ячеек, покрывающих область [x0, x1] x [y0, y1]"""
+        if self.grid_keys is None:
+            return None
+        cell = self.grid_cell
+        cx0, cx1 = max(0, int(x0) // cell), min(self.grid_width - 1, int(x1) // cell)
+        cy0, cy1 = max(0, int(y0) // cell), int(y1) // cell
+        if cx0 > cx1 or cy1 < 0:
+            return np.empty(0, dtype=np.intp)
+
+        # Ключи одной строки ячеек идут подряд, поэтому строка - один отрезок отсортированного массива
+        row_keys = np.arange(cy0, cy1 + 1, dtype=np.int64) * self.grid_width
+        starts = np.searchsorted(self.grid_keys, row_keys + cx0, side="left")
+        ends = np.searchsorted(self.grid_keys, row_keys + cx1, side="right")
+        parts = [self.grid_traps[start:end] for start, end in zip(starts, ends) if end > start]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        if len(parts) == 1 and cx0 == cx1:
+            return parts[0]
+        # Ловушка, занимающая несколько ячеек, встречается несколько раз
+        return np.unique(np.concatenate(parts))
+
+    def hits_point(self, x, y):
+        """
+        Найти ловушки, содержащие точку
+
+        Returns:
+            numpy.ndarray: Индексы ловушек в порядке возрастания
+        """
+        candidates = self._candidates(x, y, x, y)
+        if candidates is None:
+            inside = ((self.boxes[:, 0] <= x) & (x <= self.right) &
+                      (self.boxes[:, 1] <= y) & (y <= self.bottom))
+            return np.flatnonzero(inside)
+        inside = ((self.boxes[candidates, 0] <= x) & (x <= self.right[candidates]) &
+                  (self.boxes[candidates, 1] <= y) & (y <= self.bottom[candidates]))
+        return np.sort(candidates[inside])
+
+    def hits_box(self, box):
+        """
+        Найти ловушки, пересекающиеся с рамкой (x, y, w, h)
+
+        Returns:
+            numpy.ndarray: Индексы ловушек в порядке возрастания
+        """
+        x, y, w, h = box
+        right, bottom = x + w, y + h
+        candidates = self._candidates(x, y, right, bottom)
+        if candidates is None:
+            candidates = slice(None)
+        overlap = ~((self.right[candidates] < x) | (self.boxes[candidates, 0] > right) |
+                    (self.bottom[candidates] < y) | (self.boxes[candidates, 1] > bottom))
+        if isinstance(candidates, slice):
+            return np.flatnonzero(overlap)
+        return np.sort(candidates[overlap])
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        # Рамки отдаются обычными кортежами int для отрисовки средствами OpenCV
+        return iter(map(tuple, self.boxes.tolist()))
+
+    def __getitem__(self, index):
+        return tuple(self.boxes[index].tolist())
@@ -0,0 +1,277 @@
+"""
+Сопровождение ловушек между кадрами с постоянными номерами.
+
+Каждый полный просмотр кадра дает новый список рамок ловушек. TrapTracker
+сопоставляет его с уже известными ловушками по перекрытию (IoU), поэтому
+у каждой ловушки сохраняется свой номер, и вместо полного списка
+потребители получают изменения: добавленные, сдвинутые и удаленные ловушки.
+
+- Рамка, сдвинувшаяся не больше чем на move_tolerance пикселей, считается
+  неподвижной: дрожание границ на соседних кадрах не дает изменений.
+- Ловушка подтверждается после confirm_scans просмотров подряд. Подтвержденная
+  ловушка, не найденная на очередном просмотре (например, ее закрыл собой
+  персонаж), сохраняет свой номер и удаляется только после max_missed
+  просмотров подряд без нее. Неподтвержденная ловушка удаляется сразу.
+  Это касается только номеров, изменений и статистики: ловушками кадра
+  (столкновения, результат) остаются рамки, найденные на этом просмотре,
+  а их номера - в detected_ids.
+- Если список рамок совпадает с прошлым, сопоставление не выполняется,
+  а рамки, в точности совпавшие с прошлыми, сопоставляются по словарю;
+  перекрытия считаются только для оставшихся.
+
+Для каждой ловушки копится статистика: когда появилась, сколько раз найдена,
+сколько раз сдвигалась и сколько раз в нее входил персонаж.
+"""
+
+import numpy as np
+
+
+class TrapDelta:
+    """Изменения набора ловушек за один просмотр"""
+
+    __slots__ = ("frame_index", "added", "moved", "removed")
+
+    def __init__(self, frame_index):
+        self.frame_index = frame_index
+        self.added = []     # (номер, рамка)
+        self.moved = []     # (номер, прежняя рамка, новая рамка)
+        self.removed = []   # (номер, последняя рамка)
+
+    def __bool__(self):
+        return bool(self.added or self.moved or self.removed)
+
+    def to_dict(self):
+        """Изменения в виде словаря из обычных типов Python"""
+        return {
+            "frame_index": self.frame_index,
+            "added": [{"id": trap_id, "box": list(box)} for trap_id, box in self.added],
+            "moved": [{"id": trap_id, "from": list(old), "box": list(new)} for trap_id, old, new in self.moved],
+            "removed": [{"id": trap_id, "box": list(box)} for trap_id, box in self.removed],
+        }
+
+    def __repr__(self):
+        return f"TrapDelta(+{len(self.added)} ~{len(self.moved)} -{len(self.removed)})"
+
+
+class TrapTrack:
+    """Одна сопровождаемая ловушка"""
+
+    __slots__ = ("id", "box", "detected", "first_seen", "last_seen", "seen", "missed", "moves", "entries",
+                 "confirmed")
+
+    def __init__(self, trap_id, box, frame_index):
+        self.id = trap_id
+        self.box = box
+        self.detected = box     # Рамка с последнего просмотра (box не меняется при дрожании)
+        self.first_seen = frame_index
+        self.last_seen = frame_index
+        self.seen = 1
+        self.missed = 0
+        self.moves = 0
+        self.entries = 0
+        self.confirmed = False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "box": list(self.box),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "seen": self.seen,
+            "moves": self.moves,
+            "entries": self.entries,
+        }
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Попарное отношение площади пересечения к площади объединения
+
+    Args:
+        boxes_a (numpy.ndarray): Рамки (N, 4) как (x, y, w, h)
+        boxes_b (numpy.ndarray): Рамки (M, 4)
+
+    Returns:
+        numpy.ndarray: Матрица (N, M)
+    """
+    a = boxes_a.astype(np.float64)[:, None, :]
+    b = boxes_b.astype(np.float64)[None, :, :]
+    width = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    height = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+class TrapTracker:
+    """Сопоставление ловушек между просмотрами кадра"""
+
+    def __init__(self, iou_threshold=0.3, move_tolerance=2, confirm_scans=2, max_missed=3):
+        """
+        Args:
+            iou_threshold (float): Минимальное перекрытие (IoU) для той же ловушки
+            move_tolerance (int): Сдвиг сторон рамки в пикселях, который не считается движением
+            confirm_scans (int): Сколько просмотров подряд нужно для подтверждения ловушки
+            max_missed (int): После скольких просмотров подряд без нее подтвержденная ловушка удаляется
+        """
+        self.iou_threshold = iou_threshold
+        self.move_tolerance = move_tolerance
+        self.confirm_scans = confirm_scans
+        self.max_missed = max_missed
+        self.tracks = []
+        self.next_id = 1
+        self.last_detected = np.empty((0, 4), dtype=np.int32)
+        # Номера ловушек в порядке рамок последнего просмотра
+        self.detected_ids = np.empty(0, dtype=np.int64)
+        self.totals = {"scans": 0, "unchanged": 0, "added": 0, "moved": 0, "removed": 0}
+        self.history = {}   # номер -> статистика удаленной ловушки
+        self._refresh()
+
+    def _refresh(self):
+        if self.tracks:
+            self.boxes = np.array([track.box for track in self.tracks], dtype=np.int32).reshape(-1, 4)
+        else:
+            self.boxes = np.empty((0, 4), dtype=np.int32)
+        self.ids = np.array([track.id for track in self.tracks], dtype=np.int64)
+
+    def update(self, boxes, frame_index):
+        """
+        Учесть рамки ловушек, найденные на очередном просмотре кадра
+
+        Args:
+            boxes: Рамки (x, y, w, h) - массив (N, 4) или список кортежей
+            frame_index (int): Номер кадра
+
+        Returns:
+            TrapDelta: Изменения (пустой, если набор ловушек не изменился)
+        """
+        detected = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        delta = TrapDelta(frame_index)
+        self.totals["scans"] += 1
+
+        # Частый случай на статичном уровне: тот же список рамок, что и на прошлом просмотре
+        if (np.array_equal(detected, self.last_detected) and len(detected) == len(self.tracks)
+                and all(track.missed == 0 for track in self.tracks)):
+            for track in self.tracks:
+                track.last_seen = frame_index
+                track.seen += 1
+                if track.seen >= self.confirm_scans:
+                    track.confirmed = True
+            self.totals["unchanged"] += 1
+            return delta
+        self.last_detected = detected.copy()
+
+        matched_tracks, matched_boxes = self._match(detected)
+        detected_ids = np.zeros(len(detected), dtype=np.int64)
+        matched = set()
+        for track_index, box_index in zip(matched_tracks, matched_boxes):
+            track = self.tracks[track_index]
+            matched.add(track_index)
+            detected_ids[box_index] = track.id
+            box = tuple(detected[box_index].tolist())
+            track.detected = box
+            if max(abs(new - old) for new, old in zip(box, track.box)) > self.move_tolerance:
+                delta.moved.append((track.id, track.box, box))
+                track.box = box
+                track.moves += 1
+            track.last_seen = frame_index
+            track.seen += 1
+            track.missed = 0
+            if track.seen >= self.confirm_scans:
+                track.confirmed = True
+
+        kept = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched:
+                track.missed += 1
+                if not track.confirmed or track.missed >= self.max_missed:
+                    delta.removed.append((track.id, track.box))
+                    self.history[track.id] = track.to_dict()
+                    continue
+            kept.append(track)
+
+        new_boxes = np.setdiff1d(np.arange(len(detected)), matched_boxes)
+        for box_index in new_boxes:
+            track = TrapTrack(self.next_id, tuple(detected[box_index].tolist()), frame_index)
+            self.next_id += 1
+            detected_ids[box_index] = track.id
+            kept.append(track)
+            delta.added.append((track.id, track.box))
+
+        self.tracks = kept
+        self.detected_ids = detected_ids
+        self._refresh()
+        self.totals["added"] += len(delta.added)
+        self.totals["moved"] += len(delta.moved)
+        self.totals["removed"] += len(delta.removed)
+        if not delta:
+            self.totals["unchanged"] += 1
+        return delta
+
+    def _match(self, detected):
+        """
+        Жадное сопоставление известных ловушек и найденных рамок по убыванию IoU
+
+        Returns:
+            tuple: Индексы ловушек и соответствующие им индексы рамок
+        """
+        matched_rows = []
+        matched_cols = []
+        if self.tracks and len(detected):
+            # Рамки, не изменившиеся с прошлого просмотра, - без матрицы перекрытий
+            previous = {}
+            for index, track in enumerate(self.tracks):
+                previous.setdefault(track.detected, index)
+            rest_cols = []
+            for col, box in enumerate(map(tuple, detected.tolist())):
+                row = previous.pop(box, None)
+                if row is None:
+                    rest_cols.append(col)
+                else:
+                    matched_rows.append(row)
+                    matched_cols.append(col)
+
+            rest_rows = sorted(previous.values())
+            if rest_rows and rest_cols:
+                iou = iou_matrix(self.boxes[rest_rows], detected[rest_cols])
+                rows, cols = np.nonzero(iou >= self.iou_threshold)
+                order = np.argsort(-iou[rows, cols], kind="stable")
+                used_rows = set()
+                used_cols = set()
+                for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+                    if row in used_rows or col in used_cols:
+                        continue
+                    used_rows.add(row)
+                    used_cols.add(col)
+                    matched_rows.append(rest_rows[row])
+                    matched_cols.append(rest_cols[col])
+        return np.array(matched_rows, dtype=np.intp), np.array(matched_cols, dtype=np.intp)
+
+    def record_entry(self, indices):
+        """Отметить вход персонажа в ловушки с индексами indices (порядок рамок последнего просмотра)"""
+        # Индексы без номера (ловушки заданы в обход update) пропускаются
+        indices = np.asarray(indices, dtype=np.intp)
+        entered = set(self.detected_ids[indices[indices < len(self.detected_ids)]].tolist())
+        for track in self.tracks:
+            if track.id in entered:
+                track.entries += 1
+
+    def stats(self):
+        """Статистика по всем ловушкам, включая удаленные"""
+        traps = dict(self.history)
+        for track in self.tracks:
+            traps[track.id] = track.to_dict()
+        return {"totals": dict(self.totals), "active": len(self.tracks), "traps": traps}
+
+    def format_stats(self):
+        """Статистика одной строкой"""
+        totals = self.totals
+        stats = self.stats()
+        entered = sorted((trap for trap in stats["traps"].values() if trap["entries"]),
+                         key=lambda trap: -trap["entries"])[:3]
+        text = (f"ловушек сейчас: {len(self.tracks)}, всего: {self.next_id - 1}, "
+                f"просмотров без изменений: {totals['unchanged']} из {totals['scans']}, "
+                f"добавлено: {totals['added']}, сдвинуто: {totals['moved']}, удалено: {totals['removed']}")
+        if entered:
+            text += ", чаще всего входили: " + ", ".join(f"#{trap['id']} ({trap['entries']})" for trap in entered)
+        return text